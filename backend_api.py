@@ -1,12 +1,36 @@
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import AsyncIterator, Optional, Dict, Set
+import os
+import json
+import math
+import time
 import uuid
+import base64
+import binascii
+import asyncio
 from services.chat_handler import ChatHandler
-from services.message_service import MultiMessageBuffer
+from services.message_service import SessionMessageBuffer
+from services.session_store import create_session_store
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from services.faq_service import FAQService
+from helpers.blob_store import BlobStore, guess_content_type
+from helpers.admission_control import AdmissionController
+
+class CompressionMiddleware:
+    """GZip responses, except event streams whose events must reach the client unbuffered."""
+
+    def __init__(self, app, minimum_size: int = 1000):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] != "/events":
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
 
 app = FastAPI()
 
@@ -17,13 +41,100 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=1000)
 
-# In-memory session store: session_id -> {buffer, messages, region, base64_image}
-sessions: Dict[str, dict] = {}
+# Session state lives in the configured store (SESSION_STORE_DB for a store shared by workers)
+store = create_session_store()
+# This worker's debounce timers and event stream wake-ups, per session
+buffers: Dict[str, SessionMessageBuffer] = {}
+listeners: Dict[str, Set[asyncio.Event]] = {}
 DEBOUNCE_SECONDS = 5
+# Shorter wait after a message that looks finished, e.g. a question
+COMPLETE_DEBOUNCE_SECONDS = 1.5
+# Comment sent on idle event streams so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = 15
+# How often event streams check a shared store for messages stored by other workers
+SSE_POLL_SECONDS = 1.0
 
 faq_service = FAQService()
-chat_handler = ChatHandler(faq_service=faq_service)
+chat_handler = ChatHandler(faq_service=faq_service, session_store=store)
+# Uploaded images, referenced from messages by URL instead of inline base64
+blob_store = BlobStore()
+# Bounds this worker's concurrent turns and each client's message rate
+admission = AdmissionController(
+    max_concurrent_turns=int(os.getenv("MAX_CONCURRENT_TURNS", 8)),
+    max_queued_turns=int(os.getenv("MAX_QUEUED_TURNS", 32)),
+    client_messages_per_minute=float(os.getenv("CLIENT_MESSAGES_PER_MINUTE", 30))
+)
+
+def append_message(session_id: str, message: dict) -> dict:
+    """Store a message under the next id and wake this worker's event streams for the session."""
+    message = store.append_message(session_id, message)
+    for notify in listeners.get(session_id, ()):
+        notify.set()
+    return message
+
+def message_page(session_id: str, since: int) -> dict:
+    """Get the session's messages from `since` on, the cursor for the next call and the pending state."""
+    messages = store.get_messages(session_id, since)
+    return {
+        'messages': messages,
+        'next': messages[-1]['id'] + 1 if messages else since,
+        'pending': store.is_pending(session_id, time.time()),
+        'session_id': session_id
+    }
+
+def get_session(session_id: str) -> dict:
+    """Get an existing session or fail with 404."""
+    session = store.get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return session
+
+def format_sse(message: dict) -> str:
+    """Encode a message as a server-sent event whose id is the message id."""
+    return f"id: {message['id']}\nevent: message\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
+
+async def process_turn(session_id: str, combined_message: str, batch: dict):
+    """Answer a debounced batch of messages with the session's stored conversation."""
+    session = store.get_session(session_id)
+    context = {'region': session['region'], 'audio_data': batch['audio_data']}
+    # The session's latest image stays part of every turn
+    image_bytes = blob_store.get(session['image_blob']) if session['image_blob'] else None
+    if image_bytes:
+        context['image_data'] = base64.b64encode(image_bytes).decode()
+    async with admission.turn_slot():
+        conversation = store.load_context(session_id)
+        try:
+            response = await chat_handler.process_message(combined_message, context, conversation_context=conversation,
+                                                          session_id=session_id)
+            content = response.get('choices', [{}])[0].get('message', {}).get('content', 'Error')
+        except Exception as e:
+            content = f'Error: {e}'
+        store.save_context(session_id, conversation)
+    append_message(session_id, {'role': 'assistant', 'content': content})
+
+def busy_response(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    """Refuse a request, telling the client when to try again."""
+    return JSONResponse({'detail': detail}, status_code=status_code, headers={'Retry-After': str(max(1, math.ceil(retry_after)))})
+
+def get_buffer(session_id: str) -> SessionMessageBuffer:
+    """Get this worker's debounce buffer for a session; it is dropped again once its batch is answered."""
+    if session_id not in buffers:
+        def drop():
+            if buffers.get(session_id) is buffer:
+                del buffers[session_id]
+
+        buffer = SessionMessageBuffer(
+            store,
+            session_id,
+            process_callback=lambda combined_message, batch: process_turn(session_id, combined_message, batch),
+            debounce_seconds=DEBOUNCE_SECONDS,
+            complete_debounce_seconds=COMPLETE_DEBOUNCE_SECONDS,
+            on_idle=drop
+        )
+        buffers[session_id] = buffer
+    return buffers[session_id]
 
 class MessageIn(BaseModel):
     message: str
@@ -31,51 +142,104 @@ class MessageIn(BaseModel):
     audio_data: Optional[str] = None  # base64
     region: Optional[str] = None
     session_id: Optional[str] = None
+    since: Optional[int] = None  # Return messages from this id on; defaults to the ones this request adds
+
+@app.on_event("shutdown")
+async def close_scheduler():
+    """Stop the model request scheduler's refill timer before the event loop closes."""
+    chat_handler.ai_service.scheduler.close()
 
 @app.post("/message")
-async def post_message(msg: MessageIn):
+async def post_message(msg: MessageIn, request: Request):
+    has_content = bool(msg.message or msg.image or msg.audio_data)
+    if has_content:
+        # Capacity first, so a message refused with 503 does not use up the client's rate limit
+        retry_after = admission.check_capacity()
+        if retry_after is not None:
+            return busy_response(503, "Server is busy, try again shortly", retry_after)
+        # With uvicorn --proxy-headers the client address is taken from X-Forwarded-For
+        retry_after = admission.check_client(request.client.host if request.client else "unknown")
+        if retry_after is not None:
+            return busy_response(429, "Too many messages, slow down", retry_after)
+
     # Session management
     session_id = msg.session_id or str(uuid.uuid4())
-    if session_id not in sessions:
-        buffer = MultiMessageBuffer(debounce_seconds=DEBOUNCE_SECONDS, process_callback=None)
-        sessions[session_id] = {
-            'buffer': buffer,
-            'messages': [],
-            'region': msg.region or 'Europe',
-            'chat_handler': chat_handler,
-            'base64_image': None,
-            'pending': False,
-        }
-    session = sessions[session_id]
+    store.create_session(session_id, msg.region or 'Europe')
+    since = msg.since
     # Only add to buffer if message, image, or audio is present
-    if msg.message or msg.image or msg.audio_data:
+    if has_content:
         user_msg = {'role': 'user', 'content': msg.message}
         if msg.image:
-            user_msg['image'] = msg.image
-            session['base64_image'] = msg.image
+            try:
+                blob_id = blob_store.put(base64.b64decode(msg.image, validate=True))
+            except (binascii.Error, ValueError):
+                raise HTTPException(status_code=400, detail="Image is not valid base64")
+            user_msg['image'] = f"/blobs/{blob_id}"
+            store.set_image(session_id, blob_id)
         if msg.audio_data:
             user_msg['audio'] = True
-        session['messages'].append(user_msg)
-        # Add to buffer
-        async def process_combined_message(combined_message, context):
-            session['pending'] = True
-            try:
-                context['audio_data'] = msg.audio_data
-                response = await session['chat_handler'].process_message(combined_message, context)
-                assistant_msg = {
-                    'role': 'assistant',
-                    'content': response.get('choices', [{}])[0].get('message', {}).get('content', 'Error')
-                }
-                session['messages'].append(assistant_msg)
-            except Exception as e:
-                session['messages'].append({'role': 'assistant', 'content': f'Error: {e}'})
-            session['pending'] = False
-        session['buffer'].process_callback = process_combined_message
-        await session['buffer'].add_message(msg.message, region=session['region'], base64_image=session['base64_image'])
-    # Check if debounce timer is running
-    pending = session['pending'] or (session['buffer'].debounce_task and not session['buffer'].debounce_task.done())
-    return JSONResponse({
-        'messages': session['messages'],
-        'pending': pending,
-        'session_id': session_id
-    }) 
\ No newline at end of file
+        user_msg = append_message(session_id, user_msg)
+        if since is None:
+            since = user_msg['id']
+        await get_buffer(session_id).add_message(msg.message, audio_data=msg.audio_data)
+    return JSONResponse(message_page(session_id, since or 0))
+
+@app.get("/messages")
+async def get_messages(session_id: str, since: int = 0):
+    """Return the session's messages with an id of at least `since`."""
+    get_session(session_id)
+    return JSONResponse(message_page(session_id, since))
+
+@app.get("/blobs/{blob_id}")
+async def get_blob(blob_id: str):
+    """Serve an uploaded file; blob ids are content hashes, so responses never change."""
+    path = blob_store.get_path(blob_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Unknown blob")
+    with open(path, 'rb') as f:
+        content_type = guess_content_type(f.read(16))
+    return FileResponse(path, media_type=content_type, headers={'Cache-Control': 'public, max-age=31536000, immutable'})
+
+@app.get("/events")
+async def stream_events(request: Request, session_id: str, since: int = 0):
+    """
+    Push the session's messages as server-sent events as soon as they are stored.
+
+    Messages from `since` (or after the Last-Event-ID a reconnecting client sends)
+    are replayed first, so no message is lost between connections. With a shared
+    store, messages stored by other workers are picked up within SSE_POLL_SECONDS.
+    """
+    get_session(session_id)
+    last_event_id = request.headers.get('last-event-id')
+    if last_event_id is not None and last_event_id.isdigit():
+        since = int(last_event_id) + 1
+
+    async def events() -> AsyncIterator[str]:
+        notify = asyncio.Event()
+        listeners.setdefault(session_id, set()).add(notify)
+        cursor = since
+        last_sent = time.monotonic()
+        try:
+            while not await request.is_disconnected():
+                notify.clear()
+                for message in store.get_messages(session_id, cursor):
+                    cursor = message['id'] + 1
+                    last_sent = time.monotonic()
+                    yield format_sse(message)
+                try:
+                    await asyncio.wait_for(notify.wait(), timeout=SSE_POLL_SECONDS if store.shared else SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                        last_sent = time.monotonic()
+                        yield ": keepalive\n\n"
+        finally:
+            session_listeners = listeners[session_id]
+            session_listeners.discard(notify)
+            if not session_listeners:
+                del listeners[session_id]
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
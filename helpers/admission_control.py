@@ -0,0 +1,110 @@
+import math
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional
+from helpers.lru_cache import LRUCache
+from helpers.llm_scheduler import TokenBucket
+
+class AdmissionController:
+    def __init__(self,
+                 max_concurrent_turns: int = 8,
+                 max_queued_turns: int = 32,
+                 client_messages_per_minute: float = 30,
+                 client_burst: float = 10,
+                 max_tracked_clients: int = 10_000,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize admission control for chat turns.
+
+        At most max_concurrent_turns pipelines run at once and further turns wait in a
+        bounded queue. New messages are refused while the queue is full, and clients
+        sending faster than their rate limit are refused too, each with a Retry-After,
+        so overload turns into fast rejections instead of ever slower answers.
+
+        Args:
+            max_concurrent_turns (int): Turns processed at the same time
+            max_queued_turns (int): Turns waiting for a slot before new messages are refused
+            client_messages_per_minute (float): Sustained message rate allowed per client
+            client_burst (float): Messages a client may send at once
+            max_tracked_clients (int): Clients whose rate limit state is kept (least recent are dropped)
+            clock (Callable[[], float]): Time source in seconds
+        """
+        self.max_concurrent_turns = max_concurrent_turns
+        self.max_queued_turns = max_queued_turns
+        self.client_messages_per_minute = client_messages_per_minute
+        self.client_burst = client_burst
+        self.clock = clock
+        self.client_buckets = LRUCache(maxsize=max_tracked_clients)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.running = 0
+        self.queued = 0
+        self.average_turn_seconds = 5.0
+        self.stats = {
+            'admitted_turns': 0,
+            'rate_limited': 0,
+            'rejected_saturated': 0,
+        }
+
+    def check_client(self, client_id: str) -> Optional[float]:
+        """
+        Count a message against a client's rate limit.
+
+        Args:
+            client_id (str): Client identifier, e.g. the remote address
+
+        Returns:
+            Optional[float]: Seconds the client must wait, or None if the message is allowed
+        """
+        bucket = self.client_buckets.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(self.client_burst, self.client_messages_per_minute / 60, self.clock)
+            self.client_buckets.put(client_id, bucket)
+        wait = bucket.time_until_available(1)
+        if wait > 0:
+            self.stats['rate_limited'] += 1
+            return wait
+        bucket.consume(1)
+        return None
+
+    def check_capacity(self) -> Optional[float]:
+        """
+        Check whether new work can be accepted.
+
+        Returns:
+            Optional[float]: Estimated seconds until the queue drains, or None if there is room
+        """
+        if self.queued < self.max_queued_turns:
+            return None
+        self.stats['rejected_saturated'] += 1
+        return self.average_turn_seconds * math.ceil(self.queued / self.max_concurrent_turns)
+
+    @asynccontextmanager
+    async def turn_slot(self) -> AsyncIterator[None]:
+        """Wait for a processing slot and hold it for the duration of a turn."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent_turns)
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        self.stats['admitted_turns'] += 1
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._slots.release()
+            # Moving average used to estimate Retry-After
+            self.average_turn_seconds = 0.9 * self.average_turn_seconds + 0.1 * (self.clock() - start)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get rejection counters and current load."""
+        return {
+            **self.stats,
+            'running': self.running,
+            'queued': self.queued,
+            'average_turn_seconds': round(self.average_turn_seconds, 3),
+        }
@@ -0,0 +1,90 @@
+import os
+import re
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_BLOB_DIR = os.path.join(Path(__file__).parent.parent, "data", "uploads")
+
+# Leading bytes of the image formats browsers upload
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+_BLOB_ID = re.compile(r"^[0-9a-f]{64}$")
+
+def guess_content_type(data: bytes) -> str:
+    """Guess an image's MIME type from its leading bytes."""
+    for signature, content_type in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+def content_id(data: bytes) -> str:
+    """Get the id content is stored under: its hex SHA-256 digest."""
+    return hashlib.sha256(data).hexdigest()
+
+class BlobStore:
+    def __init__(self, blob_dir: str = DEFAULT_BLOB_DIR):
+        """
+        Initialize a content-addressed on-disk store for uploaded files.
+
+        Each distinct content is written once under its SHA-256 digest, so messages
+        can refer to an upload by id instead of carrying its bytes.
+
+        Args:
+            blob_dir (str): Directory blobs are stored in
+        """
+        self.blob_dir = Path(blob_dir)
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+
+    def _blob_path(self, blob_id: str) -> Path:
+        """Get the file path for a blob id."""
+        return self.blob_dir / blob_id[:2] / blob_id
+
+    def put(self, data: bytes) -> str:
+        """
+        Store content unless it is already stored.
+
+        Args:
+            data (bytes): Content to store
+
+        Returns:
+            str: The blob id (hex SHA-256 of the content)
+        """
+        blob_id = content_id(data)
+        path = self._blob_path(blob_id)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so readers never see a partial blob
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return blob_id
+
+    def get_path(self, blob_id: str) -> Optional[Path]:
+        """
+        Get the file a blob is stored in.
+
+        Args:
+            blob_id (str): Blob id returned by put
+
+        Returns:
+            Optional[Path]: The blob's path, or None for an unknown or malformed id
+        """
+        if not _BLOB_ID.match(blob_id):
+            return None
+        path = self._blob_path(blob_id)
+        return path if path.exists() else None
+
+    def get(self, blob_id: str) -> Optional[bytes]:
+        """Get a blob's content, or None for an unknown id."""
+        path = self.get_path(blob_id)
+        return path.read_bytes() if path else None
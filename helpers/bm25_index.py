@@ -0,0 +1,135 @@
+import re
+import math
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Optional
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Words that carry no product information in customer queries
+STOPWORDS = frozenset({
+    "a", "an", "and", "any", "are", "can", "do", "does", "for", "have", "i", "in", "is", "it",
+    "looking", "me", "my", "of", "on", "or", "please", "show", "some", "the", "this", "to",
+    "want", "we", "what", "with", "you", "your",
+})
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word tokens.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        List[str]: Tokens, e.g. "42847-blouse-green" -> ["42847", "blouse", "green"]
+    """
+    return TOKEN_PATTERN.findall(text.casefold())
+
+@dataclass
+class LexicalHit:
+    doc_id: str
+    score: float
+    coverage: float  # Fraction of the query's content terms found in the document
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an in-process BM25 inverted index.
+
+        Args:
+            k1 (float): Term frequency saturation
+            b (float): Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.doc_lengths: List[float] = []
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.idf: Dict[str, float] = {}
+        self.avg_doc_length = 0.0
+
+    def add(self, doc_id: str, fields: Dict[str, str], weights: Optional[Dict[str, float]] = None):
+        """
+        Add a document made of weighted text fields.
+
+        Args:
+            doc_id (str): Document identifier
+            fields (Dict[str, str]): Field name -> text
+            weights (Optional[Dict[str, float]]): Field name -> term frequency weight (default 1)
+        """
+        doc_index = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        length = 0.0
+        for field, text in fields.items():
+            weight = (weights or {}).get(field, 1.0)
+            for token in tokenize(text or ""):
+                postings = self.postings.setdefault(token, {})
+                postings[doc_index] = postings.get(doc_index, 0.0) + weight
+                length += weight
+        self.doc_lengths.append(length)
+
+    def finalize(self):
+        """Compute document statistics once all documents have been added."""
+        n_docs = len(self.doc_ids)
+        self.avg_doc_length = sum(self.doc_lengths) / n_docs if n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 10, allowed: Optional[int] = None) -> List[LexicalHit]:
+        """
+        Rank documents for a query with BM25.
+
+        Args:
+            query (str): Query text
+            k (int): Number of hits to return
+            allowed (Optional[int]): Bitmask of eligible documents (bit i = i-th added document); None allows all
+
+        Returns:
+            List[LexicalHit]: Hits ordered by descending score
+        """
+        terms = self.query_terms(query)
+        if not terms:
+            return []
+
+        scores: Dict[int, float] = {}
+        matched: Dict[int, int] = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc_index, tf in postings.items():
+                if allowed is not None and not (allowed >> doc_index) & 1:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_index] / self.avg_doc_length)
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[doc_index] = matched.get(doc_index, 0) + 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            LexicalHit(self.doc_ids[doc_index], round(score, 4), matched[doc_index] / len(terms))
+            for doc_index, score in ranked
+        ]
+
+    @staticmethod
+    def query_terms(query: str) -> List[str]:
+        """Get the distinct content terms of a query."""
+        return list(dict.fromkeys(t for t in tokenize(query) if t not in STOPWORDS))
+
+def reciprocal_rank_fusion(rankings: Iterable[List[Hashable]], k: int = 60) -> Dict[Hashable, float]:
+    """
+    Fuse several rankings with reciprocal rank fusion.
+
+    Args:
+        rankings (Iterable[List[Hashable]]): Ranked id lists, best first
+        k (int): Damping constant; larger values flatten the contribution of top ranks
+
+    Returns:
+        Dict[Hashable, float]: Fused score per id
+    """
+    fused: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    return fused
@@ -2,15 +2,55 @@ import os
 import chromadb
 from chromadb.config import Settings
 from pathlib import Path
+from functools import lru_cache
+from typing import Optional, Tuple
 
+@lru_cache(maxsize=None)
 def get_chroma_client():
     """Get a shared ChromaDB client instance with consistent settings."""
     # Create a persistent directory for ChromaDB
     persist_directory = os.path.join(Path(__file__).parent.parent, "data", "chroma")
     os.makedirs(persist_directory, exist_ok=True)
-    
+
     # Initialize ChromaDB with persistent storage
     return chromadb.Client(Settings(
+        chroma_db_impl="duckdb+parquet",
         persist_directory=persist_directory,
         anonymized_telemetry=False
-    )) 
\ No newline at end of file
+    ))
+
+def get_versioned_collection(name: str, index_version: Optional[str], embedding_function, metadata: Optional[dict] = None) -> Tuple[chromadb.api.models.Collection.Collection, bool]:
+    """
+    Get a collection whose contents match a published index version.
+
+    The collection is dropped and recreated when it was populated from a different
+    index version, so services never serve vectors from a stale build.
+
+    Args:
+        name (str): Collection name
+        index_version (Optional[str]): Version of the index the collection should hold
+        embedding_function: Embedding function used for query texts
+        metadata (Optional[dict]): Extra collection metadata
+
+    Returns:
+        Tuple[Collection, bool]: The collection and whether it is empty and must be populated
+    """
+    client = get_chroma_client()
+    collection_metadata = {**(metadata or {}), "index_version": index_version or "unversioned"}
+    try:
+        collection = client.get_collection(name=name, embedding_function=embedding_function)
+    except Exception:
+        collection = None
+
+    # get_or_create_collection would overwrite the stored metadata, so compare before touching it
+    if collection is None or (collection.metadata or {}).get("index_version") != collection_metadata["index_version"]:
+        if collection is not None:
+            print(f"[ChromaConfig] Collection '{name}' is stale, rebuilding for index version {index_version}")
+            client.delete_collection(name)
+        collection = client.create_collection(
+            name=name,
+            embedding_function=embedding_function,
+            metadata=collection_metadata
+        )
+
+    return collection, collection.count() == 0
@@ -0,0 +1,303 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+import aiohttp
+import requests
+
+DEFAULT_CACHE_DIR = os.path.join(Path(__file__).parent.parent, "data", "cache", "images")
+
+class ImageCache:
+    def __init__(self,
+                 cache_dir: str = DEFAULT_CACHE_DIR,
+                 max_size_mb: float = 2048,
+                 max_age_seconds: float = 0,
+                 offline: Optional[bool] = None,
+                 access_flush_seconds: float = 10):
+        """
+        Initialize a content-addressed on-disk cache for downloaded catalog images.
+
+        Image bytes are stored once per SHA-256 digest; a small SQLite index maps each
+        URL to its digest together with the ETag and Last-Modified validators, so
+        unchanged images are revalidated with a conditional request instead of being
+        downloaded again.
+
+        Args:
+            cache_dir (str): Directory where cached images and the index are stored
+            max_size_mb (float): Total size of cached images before LRU eviction kicks in
+            max_age_seconds (float): How long a cached image is served without revalidation
+            offline (Optional[bool]): Never touch the network; defaults to the IMAGE_CACHE_OFFLINE env variable
+            access_flush_seconds (float): How long cache hits are batched before their access times are
+                written to the index
+        """
+        self.cache_dir = Path(cache_dir)
+        self.blob_dir = self.cache_dir / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 1_000_000)
+        self.max_age_seconds = max_age_seconds
+        if offline is None:
+            offline = os.getenv("IMAGE_CACHE_OFFLINE", "").lower() in ("1", "true", "yes")
+        self.offline = offline
+        self.access_flush_seconds = access_flush_seconds
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.cache_dir / "index.sqlite"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                validated_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_sha256 ON entries (sha256)")
+        self._db.commit()
+        # Bytes of all referenced blobs, kept up to date on every insert and delete
+        self._total_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT sha256, MAX(size) AS size FROM entries GROUP BY sha256)"
+        ).fetchone()[0]
+        # Access times of cache hits not yet written to the index, by URL
+        self._pending_access: Dict[str, float] = {}
+        self._last_access_flush = time.time()
+
+        self.stats = {
+            'hits': 0,
+            'revalidated': 0,
+            'downloaded': 0,
+            'downloaded_bytes': 0,
+            'misses': 0,
+            'evicted': 0,
+        }
+
+    def _blob_path(self, sha256: str) -> Path:
+        """Get the file path for a content digest."""
+        return self.blob_dir / sha256[:2] / sha256
+
+    def _get_entry(self, url: str) -> Optional[Dict]:
+        """Get the index entry for a URL, dropping it if its blob has gone missing."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sha256, size, etag, last_modified, validated_at FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            if not self._blob_path(row[0]).exists():
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self._db.commit()
+                return None
+        return {'sha256': row[0], 'size': row[1], 'etag': row[2], 'last_modified': row[3], 'validated_at': row[4]}
+
+    def _read(self, url: str, entry: Dict, revalidated: bool = False) -> Optional[bytes]:
+        """Read a cached blob and record the access; None if the blob was evicted in the meantime."""
+        try:
+            data = self._blob_path(entry['sha256']).read_bytes()
+        except FileNotFoundError:
+            # Another thread or process evicted it after the entry was looked up
+            with self._lock:
+                self._pending_access.pop(url, None)
+                self._db.execute("DELETE FROM entries WHERE url = ? AND sha256 = ?", (url, entry['sha256']))
+                self._db.commit()
+            return None
+
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self._pending_access.pop(url, None)
+                self._db.execute("UPDATE entries SET last_access = ?, validated_at = ? WHERE url = ?", (now, now, url))
+                self._db.commit()
+            else:
+                # Hits only bump recency, so they are written in batches instead of a commit each
+                self._pending_access[url] = now
+                if now - self._last_access_flush >= self.access_flush_seconds:
+                    self._flush_access()
+        self.stats['revalidated' if revalidated else 'hits'] += 1
+        return data
+
+    def _flush_access(self):
+        """Write the batched access times to the index. Caller must hold the lock."""
+        if self._pending_access:
+            self._db.executemany(
+                "UPDATE entries SET last_access = ? WHERE url = ?",
+                [(accessed, url) for url, accessed in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+        self._db.commit()
+        self._last_access_flush = time.time()
+
+    def flush(self):
+        """Write the access times of recent cache hits to the index, e.g. before the process exits."""
+        with self._lock:
+            self._flush_access()
+
+    def get(self, url: str) -> Optional[bytes]:
+        """
+        Get cached image bytes for a URL without any network access.
+
+        Args:
+            url (str): Image URL
+
+        Returns:
+            Optional[bytes]: Cached bytes, or None if the URL is not cached
+        """
+        entry = self._get_entry(url)
+        if entry is None:
+            return None
+        return self._read(url, entry)
+
+    def put(self, url: str, data: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        Store image bytes for a URL.
+
+        Args:
+            url (str): Image URL
+            data (bytes): Image bytes
+            etag (Optional[str]): ETag returned by the server
+            last_modified (Optional[str]): Last-Modified returned by the server
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(sha256)
+        now = time.time()
+        with self._lock:
+            # Checked under the lock, so eviction cannot delete the blob between the check and the insert
+            if not path.exists():
+                # Write through a temp file so readers in other processes never see partial blobs
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+
+            previous = self._db.execute("SELECT sha256, size FROM entries WHERE url = ?", (url,)).fetchone()
+            if not self._db.execute("SELECT 1 FROM entries WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone():
+                self._total_bytes += len(data)
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (url, sha256, size, etag, last_modified, validated_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, sha256, len(data), etag, last_modified, now, now)
+            )
+            self._pending_access.pop(url, None)
+            if previous and previous[0] != sha256:
+                self._delete_blob_if_unreferenced(*previous)
+            self._evict()
+            self._flush_access()
+
+    def _delete_blob_if_unreferenced(self, sha256: str, size: int):
+        """Delete a blob once no URL points at it. Caller must hold the lock."""
+        referenced = self._db.execute("SELECT 1 FROM entries WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+        if not referenced:
+            self._blob_path(sha256).unlink(missing_ok=True)
+            self._total_bytes -= size
+
+    def _evict(self):
+        """Evict least recently used entries until the cache fits in max_size_bytes. Caller must hold the lock."""
+        if self._total_bytes <= self.max_size_bytes:
+            return
+        # Eviction order must see the batched cache hits
+        self._flush_access()
+        while self._total_bytes > self.max_size_bytes:
+            rows = self._db.execute("SELECT url, sha256, size FROM entries ORDER BY last_access LIMIT 64").fetchall()
+            if not rows:
+                break
+            for url, sha256, size in rows:
+                if self._total_bytes <= self.max_size_bytes:
+                    break
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self._delete_blob_if_unreferenced(sha256, size)
+                self.stats['evicted'] += 1
+
+    def _is_fresh(self, entry: Dict) -> bool:
+        """Check whether an entry can be served without revalidation."""
+        return self.offline or time.time() - entry['validated_at'] < self.max_age_seconds
+
+    def _conditional_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers for a cached entry."""
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str) -> Optional[bytes]:
+        """
+        Get image bytes, revalidating or downloading them as needed.
+
+        Args:
+            session (aiohttp.ClientSession): Session used for downloads
+            url (str): Image URL
+
+        Returns:
+            Optional[bytes]: Image bytes, or None if the image is unavailable
+        """
+        entry = self._get_entry(url)
+        if entry and self._is_fresh(entry):
+            data = self._read(url, entry)
+            if data is not None:
+                return data
+            entry = None
+        if self.offline:
+            self.stats['misses'] += 1
+            return None
+
+        try:
+            async with session.get(url, headers=self._conditional_headers(entry)) as response:
+                if response.status == 304 and entry:
+                    return self._read(url, entry, revalidated=True)
+                if response.status != 200:
+                    print(f"[ImageCache] Failed to load image from {url}: HTTP {response.status}")
+                    return self._read(url, entry) if entry else None
+                data = await response.read()
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+        except aiohttp.ClientError as e:
+            # Serve a stale copy rather than failing when the origin is unreachable
+            print(f"[ImageCache] Error loading image from {url}: {e}")
+            return self._read(url, entry) if entry else None
+
+        self.stats['downloaded'] += 1
+        self.stats['downloaded_bytes'] += len(data)
+        self.put(url, data, etag=etag, last_modified=last_modified)
+        return data
+
+    def fetch_sync(self, url: str, timeout: float = 30) -> Optional[bytes]:
+        """
+        Synchronous counterpart of fetch for scripts that do not run an event loop.
+
+        Args:
+            url (str): Image URL
+            timeout (float): Request timeout in seconds
+
+        Returns:
+            Optional[bytes]: Image bytes, or None if the image is unavailable
+        """
+        entry = self._get_entry(url)
+        if entry and self._is_fresh(entry):
+            data = self._read(url, entry)
+            if data is not None:
+                return data
+            entry = None
+        if self.offline:
+            self.stats['misses'] += 1
+            return None
+
+        try:
+            response = requests.get(url, headers=self._conditional_headers(entry), timeout=timeout)
+        except requests.RequestException as e:
+            print(f"[ImageCache] Error loading image from {url}: {e}")
+            return self._read(url, entry) if entry else None
+        if response.status_code == 304 and entry:
+            return self._read(url, entry, revalidated=True)
+        if response.status_code != 200:
+            print(f"[ImageCache] Failed to load image from {url}: HTTP {response.status_code}")
+            return self._read(url, entry) if entry else None
+
+        self.stats['downloaded'] += 1
+        self.stats['downloaded_bytes'] += len(response.content)
+        self.put(url, response.content, etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'))
+        return response.content
@@ -0,0 +1,120 @@
+import os
+import json
+import pickle
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_INDEX_ROOT = os.path.join(Path(__file__).parent.parent, "data", "index")
+CURRENT_POINTER = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+IMAGE_INDEX_ARTIFACT = "image_embeddings.pkl"
+TEXT_INDEX_ARTIFACT = "text_embeddings.pkl"
+
+def get_current_index_version(index_root: str = DEFAULT_INDEX_ROOT) -> Optional[str]:
+    """
+    Get the currently published index version.
+
+    Args:
+        index_root (str): Directory holding published index versions
+
+    Returns:
+        Optional[str]: The published version, or None if nothing has been published
+    """
+    pointer = Path(index_root) / CURRENT_POINTER
+    if not pointer.exists():
+        return None
+    version = pointer.read_text(encoding='utf-8').strip()
+    if not version or not (Path(index_root) / version).is_dir():
+        return None
+    return version
+
+def create_staging_dir(version: str, index_root: str = DEFAULT_INDEX_ROOT) -> Path:
+    """Create an empty staging directory for a new index version."""
+    staging_dir = Path(index_root) / f".staging-{version}"
+    if staging_dir.exists():
+        shutil.rmtree(staging_dir)
+    staging_dir.mkdir(parents=True)
+    return staging_dir
+
+def write_artifact(staging_dir: Path, name: str, data: Any):
+    """Pickle an index artifact into a staging directory."""
+    with open(staging_dir / name, 'wb') as f:
+        pickle.dump(data, f)
+
+def publish_index_version(staging_dir: Path, version: str, manifest: Dict, index_root: str = DEFAULT_INDEX_ROOT, keep_versions: int = 3) -> Path:
+    """
+    Atomically publish a staged index version.
+
+    The staging directory is renamed into place first and the CURRENT pointer is
+    swapped last, so readers see either the previous version or the new one, never
+    a partially written index.
+
+    Args:
+        staging_dir (Path): Directory containing the staged artifacts
+        version (str): Version being published
+        manifest (Dict): Build metadata stored alongside the artifacts
+        index_root (str): Directory holding published index versions
+        keep_versions (int): Number of published versions to keep on disk
+
+    Returns:
+        Path: Directory of the published version
+    """
+    with open(staging_dir / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    version_dir = Path(index_root) / version
+    os.replace(staging_dir, version_dir)
+
+    pointer = Path(index_root) / CURRENT_POINTER
+    tmp_pointer = pointer.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_pointer, 'w', encoding='utf-8') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pointer, pointer)
+
+    _prune_old_versions(index_root, keep_versions)
+    return version_dir
+
+def _prune_old_versions(index_root: str, keep_versions: int):
+    """Remove the oldest published versions beyond keep_versions."""
+    current = get_current_index_version(index_root)
+    versions = sorted(
+        p.name for p in Path(index_root).iterdir()
+        if p.is_dir() and not p.name.startswith('.')
+    )
+    for version in versions[:-keep_versions] if keep_versions > 0 else []:
+        if version != current:
+            shutil.rmtree(Path(index_root) / version, ignore_errors=True)
+
+def load_index_artifact(name: str, index_root: str = DEFAULT_INDEX_ROOT) -> Optional[Any]:
+    """
+    Load an artifact from the currently published index version.
+
+    Args:
+        name (str): Artifact file name
+        index_root (str): Directory holding published index versions
+
+    Returns:
+        Optional[Any]: The unpickled artifact, or None if it has not been published
+    """
+    version = get_current_index_version(index_root)
+    if version is None:
+        return None
+    path = Path(index_root) / version / name
+    if not path.exists():
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def load_index_manifest(index_root: str = DEFAULT_INDEX_ROOT) -> Optional[Dict]:
+    """Load the manifest of the currently published index version."""
+    version = get_current_index_version(index_root)
+    if version is None:
+        return None
+    path = Path(index_root) / version / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
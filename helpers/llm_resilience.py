@@ -0,0 +1,183 @@
+import time
+import random
+from bisect import insort
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Callable, Deque, Iterator, List, Optional
+
+# Monotonic time by which the current conversation turn must be answered
+_turn_deadline: ContextVar[Optional[float]] = ContextVar("turn_deadline", default=None)
+
+class UpstreamError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = True, retry_after: Optional[float] = None):
+        """
+        Error returned by, or while reaching, an upstream model API.
+
+        Args:
+            message (str): Error description
+            status (Optional[int]): HTTP status, if a response was received
+            retryable (bool): Whether the same request may succeed when retried
+            retry_after (Optional[float]): Seconds the server asked to wait before retrying
+        """
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+class CircuitOpenError(UpstreamError):
+    def __init__(self):
+        super().__init__("Circuit breaker is open", retryable=False)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given in seconds or as an HTTP date.
+
+    Args:
+        value (Optional[str]): Header value
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if absent or unparseable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """
+    Get the wait before a retry: the server's Retry-After if given, otherwise full-jitter exponential backoff.
+
+    Args:
+        attempt (int): Zero-based number of the attempt that just failed
+        base (float): Backoff for the first retry in seconds
+        cap (float): Maximum backoff in seconds
+        retry_after (Optional[float]): Seconds the server asked to wait
+
+    Returns:
+        float: Seconds to wait
+    """
+    if retry_after is not None:
+        return min(retry_after, cap)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a circuit breaker that stops calling an upstream after repeated failures.
+
+        After failure_threshold consecutive failures the circuit opens and calls fail
+        fast. Once reset_timeout has passed, one trial call is let through; its success
+        closes the circuit and its failure opens it again.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            reset_timeout (float): Seconds the circuit stays open before a trial call
+            clock (Callable[[], float]): Time source in seconds
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """Get the circuit state: closed, open or half_open."""
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Check whether a call may be made now."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        """Record a successful call, closing the circuit."""
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_cancelled(self):
+        """Forget a call cancelled before it finished, so a new trial call can be made."""
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        """Record a failed call, opening the circuit at the threshold or after a failed trial."""
+        self.consecutive_failures += 1
+        if self.trial_in_flight or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+        self.trial_in_flight = False
+
+class LatencyTracker:
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Initialize a rolling window of request latencies.
+
+        Args:
+            window (int): Number of most recent latencies kept
+            min_samples (int): Samples needed before percentiles are reported
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque()
+        self._sorted: List[float] = []
+
+    def record(self, seconds: float):
+        """Add a latency sample, dropping the oldest one when the window is full."""
+        self._samples.append(seconds)
+        insort(self._sorted, seconds)
+        if len(self._samples) > self.window:
+            self._sorted.remove(self._samples.popleft())
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Get a latency percentile.
+
+        Args:
+            p (float): Percentile between 0 and 100
+
+        Returns:
+            Optional[float]: Latency in seconds, or None until enough samples are recorded
+        """
+        if len(self._sorted) < self.min_samples:
+            return None
+        index = min(len(self._sorted) - 1, int(len(self._sorted) * p / 100))
+        return self._sorted[index]
+
+@contextmanager
+def turn_budget(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Bound every upstream call made while handling one conversation turn.
+
+    The deadline is stored in a context variable, so concurrent turns each see their own.
+
+    Args:
+        seconds (Optional[float]): Total time allowed for the turn (None leaves calls unbounded)
+    """
+    token = _turn_deadline.set(time.monotonic() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _turn_deadline.reset(token)
+
+def remaining_turn_budget() -> Optional[float]:
+    """Get the seconds left in the current turn's budget, or None outside a budgeted turn."""
+    deadline = _turn_deadline.get()
+    return deadline - time.monotonic() if deadline is not None else None
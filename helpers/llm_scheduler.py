@@ -0,0 +1,218 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Request priorities; lower values are served first
+PRIORITY_INTERACTIVE = 0  # Answers a user is waiting for
+PRIORITY_CLASSIFIER = 1   # Routing decisions ahead of an answer
+PRIORITY_BACKGROUND = 2   # Batch jobs such as catalog description generation
+
+# Rough token cost of one image input
+IMAGE_TOKENS = 850
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a token bucket that starts full.
+
+        Args:
+            capacity (float): Maximum tokens held
+            refill_per_second (float): Tokens added per second
+            clock (Callable[[], float]): Time source in seconds
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    def _refill(self):
+        """Add the tokens accrued since the last update."""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def time_until_available(self, amount: float) -> float:
+        """
+        Get the seconds until the bucket holds enough tokens.
+
+        Requests larger than the capacity wait for a full bucket instead of forever.
+
+        Args:
+            amount (float): Tokens needed
+
+        Returns:
+            float: Seconds to wait (0 if available now)
+        """
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.refill_per_second)
+
+    def consume(self, amount: float):
+        """Take tokens; the balance may go negative to record usage beyond an estimate."""
+        self._refill()
+        self.tokens -= amount
+
+    def release(self, amount: float):
+        """Give back tokens taken for a request that was never sent."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class LLMScheduler:
+    def __init__(self,
+                 requests_per_minute: float = 500,
+                 tokens_per_minute: float = 200_000,
+                 token_estimator: Optional[Callable[[str], int]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a client-side scheduler for upstream model requests.
+
+        Requests wait in a priority queue until both the requests-per-minute and the
+        tokens-per-minute buckets can cover them, so bursts are queued instead of
+        turning into upstream 429s. Within a priority, requests are served in order.
+
+        Args:
+            requests_per_minute (float): Request rate limit
+            tokens_per_minute (float): Token rate limit (prompt plus completion)
+            token_estimator (Optional[Callable[[str], int]]): Counts tokens in a text; defaults to TokenCounter
+            clock (Callable[[], float]): Time source in seconds
+        """
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60, clock)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60, clock)
+        self._token_estimator = token_estimator
+        self._queue: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {
+            'granted': 0,
+            'queued': 0,
+            'released': 0,
+            'max_wait_seconds': 0.0,
+        }
+
+    def count_tokens(self, text: str) -> int:
+        """Count the tokens in a text with the configured estimator."""
+        if self._token_estimator is None:
+            try:
+                from helpers.token_counter import TokenCounter
+                self._token_estimator = TokenCounter().count_tokens
+            except Exception as e:
+                # An approximate count is enough to pace requests
+                print(f"[LLMScheduler] Tokenizer unavailable ({e}), estimating 4 characters per token")
+                self._token_estimator = lambda value: len(value) // 4 + 1
+        return self._token_estimator(text)
+
+    def estimate_tokens(self, payload: Dict) -> int:
+        """
+        Estimate the tokens a chat completion request will use.
+
+        Args:
+            payload (Dict): Request payload
+
+        Returns:
+            int: Prompt tokens plus the completion limit
+        """
+        total = payload.get('max_tokens', 0)
+        for message in payload.get('messages', []):
+            content = message['content']
+            if isinstance(content, str):
+                total += self.count_tokens(content)
+                continue
+            for part in content:
+                total += self.count_tokens(part['text']) if part.get('type') == 'text' else IMAGE_TOKENS
+        return total
+
+    async def acquire(self, estimated_tokens: int, priority: int = PRIORITY_INTERACTIVE):
+        """
+        Wait until a request may be sent.
+
+        Args:
+            estimated_tokens (int): Tokens the request is expected to use
+            priority (int): Request priority; lower values are served first
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), estimated_tokens, future))
+        start = time.monotonic()
+        self._dispatch()
+        if not future.done():
+            self.stats['queued'] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before the waiter was cancelled, so the request is never sent
+                self.release(estimated_tokens)
+            else:
+                # The next request may have been held back by this one's reservation
+                self._dispatch()
+            raise
+        self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], round(time.monotonic() - start, 3))
+
+    def release(self, estimated_tokens: int):
+        """
+        Return the capacity of a granted request that will not be sent, e.g. because its deadline passed.
+
+        Args:
+            estimated_tokens (int): Tokens reserved when the request was granted
+        """
+        self.requests.release(1)
+        self.tokens.release(estimated_tokens)
+        self.stats['released'] += 1
+        self._dispatch()
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """
+        Correct the token bucket once a response reports its real usage.
+
+        Args:
+            estimated_tokens (int): Tokens reserved when the request was granted
+            actual_tokens (Optional[int]): Tokens the response reported, if any
+        """
+        if actual_tokens is not None:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def _dispatch(self):
+        """Grant queued requests in priority order while capacity lasts, then wait for the next refill."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            _, _, estimated_tokens, future = self._queue[0]
+            if future.done():
+                # The waiter gave up, e.g. its deadline passed
+                heapq.heappop(self._queue)
+                continue
+            wait = max(self.requests.time_until_available(1), self.tokens.time_until_available(estimated_tokens))
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._queue)
+            self.requests.consume(1)
+            self.tokens.consume(estimated_tokens)
+            self.stats['granted'] += 1
+            future.set_result(None)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get grant and queueing counters and the current queue length."""
+        return {**self.stats, 'queue_length': len(self._queue)}
+
+    def close(self):
+        """Stop the refill timer and cancel the waiting requests, e.g. before the event loop closes."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            heapq.heappop(self._queue)[3].cancel()
+
+@lru_cache(maxsize=None)
+def get_llm_scheduler() -> LLMScheduler:
+    """Get the process-wide scheduler, limited by the LLM_RPM and LLM_TPM env variables."""
+    return LLMScheduler(
+        requests_per_minute=float(os.getenv("LLM_RPM", 500)),
+        tokens_per_minute=float(os.getenv("LLM_TPM", 200_000))
+    )
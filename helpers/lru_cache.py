@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024, ttl_seconds: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a bounded least-recently-used cache.
+
+        Args:
+            maxsize (int): Maximum number of entries kept
+            ttl_seconds (Optional[float]): Lifetime of an entry after it is stored (None keeps entries until evicted)
+            clock (Callable[[], float]): Time source in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _is_expired(self, expires_at: float) -> bool:
+        """Check whether an entry with this expiry time has expired."""
+        return self.ttl_seconds is not None and self.clock() >= expires_at
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value and mark it as recently used.
+
+        Args:
+            key (Hashable): Cache key
+
+        Returns:
+            Optional[Any]: The cached value, or None on a miss
+        """
+        if key in self._data and self._is_expired(self._data[key][1]):
+            del self._data[key]
+            self.expirations += 1
+        if key not in self._data:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return self._data[key][0]
+
+    def touch(self, key: Hashable):
+        """Mark an entry as recently used without counting a lookup."""
+        if key in self._data:
+            self._data.move_to_end(key)
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Iterate over unexpired entries from least to most recently used, without changing their order."""
+        for key, (value, expires_at) in list(self._data.items()):
+            if not self._is_expired(expires_at):
+                yield key, value
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry when full."""
+        expires_at = self.clock() + self.ttl_seconds if self.ttl_seconds is not None else float('inf')
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Remove all entries."""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data and not self._is_expired(self._data[key][1])
+
+    def stats(self) -> Dict[str, float]:
+        """Get hit, miss, eviction, expiration and size counters."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
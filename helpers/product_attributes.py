@@ -0,0 +1,123 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional
+from models.product_filters import ProductFilters
+
+# Bumped whenever the typed metadata stored with product vectors changes shape
+PRODUCT_METADATA_SCHEMA = "attributes-v3"
+
+# Category keywords, matched against the rightmost words of the product title
+CATEGORIES = (
+    'blouse', 'bodysuit', 'camisole', 'cardigan', 'coat', 'crop', 'dress', 'jacket', 'jeans',
+    'knitwear', 'pants', 'shirt', 'shorts', 'skirt', 'sweater', 'trousers', 'tunic', 'undershirt', 'vest',
+)
+# Garment words too common in queries to be a category on their own ("top seller"); they
+# become a phrase with the word before them, e.g. "tank top"
+COMPOUND_CATEGORIES = ('top',)
+# Title words stored under an unambiguous category name ("body size" is not about bodysuits)
+CATEGORY_ALIASES = {'body': 'bodysuit'}
+
+def extract_attributes(product: Dict) -> Dict:
+    """
+    Extract typed attributes from a catalog product.
+
+    Catalog names follow "<code> - <title> - <color>", e.g. "42847 - Blouse - Green";
+    some names omit the color part.
+
+    Args:
+        product (Dict): Catalog product
+
+    Returns:
+        Dict: category, color, price, total_stock and in_stock (0/1) columns
+    """
+    parts = [part.strip() for part in product['name'].split(' - ')]
+    title = ' - '.join(parts[1:-1]) if len(parts) >= 3 else (parts[1] if len(parts) == 2 else parts[0])
+    color = parts[-1].casefold() if len(parts) >= 3 else ''
+
+    words = [CATEGORY_ALIASES.get(word, word) for word in re.findall(r"\w+", title.casefold())]
+    index = next((i for i in reversed(range(len(words))) if words[i] in CATEGORIES or words[i] in COMPOUND_CATEGORIES),
+                 len(words) - 1)
+    category = words[index] if words else ''
+    if category in COMPOUND_CATEGORIES:
+        category = f"{words[index - 1]} {category}" if index > 0 else ''
+
+    total_stock = int(product.get('total_stock', 0) or 0)
+    return {
+        'category': category,
+        'color': color,
+        'price': float(product.get('price', 0) or 0),
+        'total_stock': total_stock,
+        'in_stock': int(total_stock > 0),
+    }
+
+def find_category(query: str, categories: Iterable[str]) -> Optional[str]:
+    """
+    Find the category a query names, as a whole word or phrase, singular or plural.
+
+    Args:
+        query (str): Search query
+        categories (Iterable[str]): Categories of the indexed products
+
+    Returns:
+        Optional[str]: The longest matching category, e.g. "crop top" over "crop"
+    """
+    words = re.findall(r"\w+", query.casefold())
+    text = f" {' '.join(words)} "
+    return next((c for c in sorted(categories, key=len, reverse=True) if f" {c} " in text or f" {c}s " in text), None)
+
+class AttributeBitmaskIndex:
+    def __init__(self, doc_ids: List[str], attributes: Dict[str, Dict]):
+        """
+        Initialize bitmask pre-filters for an in-process index.
+
+        Bit i of every mask refers to doc_ids[i], matching the document order of the
+        in-process index being filtered.
+
+        Args:
+            doc_ids (List[str]): Document ids in index order
+            attributes (Dict[str, Dict]): Document id -> extracted attributes
+        """
+        self.all_mask = (1 << len(doc_ids)) - 1
+        self.color_masks: Dict[str, int] = {}
+        self.category_masks: Dict[str, int] = {}
+        self.in_stock_mask = 0
+        prices = []
+        for position, doc_id in enumerate(doc_ids):
+            attrs = attributes[doc_id]
+            bit = 1 << position
+            self.color_masks[attrs['color']] = self.color_masks.get(attrs['color'], 0) | bit
+            self.category_masks[attrs['category']] = self.category_masks.get(attrs['category'], 0) | bit
+            if attrs['in_stock']:
+                self.in_stock_mask |= bit
+            prices.append((attrs['price'], position))
+        prices.sort()
+        self.sorted_prices = [price for price, _ in prices]
+        self.price_positions = [position for _, position in prices]
+
+    def mask(self, filters: Optional[ProductFilters]) -> Optional[int]:
+        """
+        Compute the bitmask of documents that satisfy the filters.
+
+        Args:
+            filters (Optional[ProductFilters]): Filters to apply
+
+        Returns:
+            Optional[int]: Bitmask of eligible documents, or None when nothing is filtered
+        """
+        if filters is None or filters.is_empty():
+            return None
+        mask = self.all_mask
+        if filters.color is not None:
+            mask &= self.color_masks.get(filters.color, 0)
+        if filters.category is not None:
+            mask &= self.category_masks.get(filters.category, 0)
+        if filters.in_stock is not None:
+            mask &= self.in_stock_mask if filters.in_stock else self.all_mask & ~self.in_stock_mask
+        if filters.min_price is not None or filters.max_price is not None:
+            low = bisect_left(self.sorted_prices, filters.min_price) if filters.min_price is not None else 0
+            high = bisect_right(self.sorted_prices, filters.max_price) if filters.max_price is not None else len(self.sorted_prices)
+            price_mask = 0
+            for position in self.price_positions[low:high]:
+                price_mask |= 1 << position
+            mask &= price_mask
+        return mask
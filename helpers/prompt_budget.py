@@ -0,0 +1,199 @@
+import os
+import re
+import math
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from helpers.lru_cache import LRUCache
+
+# Prompt token limits per call site; prompts above them are trimmed before sending
+DEFAULT_PROMPT_LIMITS = {
+    'lonca_query': 6000,
+    'search_results': 6000,
+    'query_classification': 3000,
+    'non_lonca_response': 2000,
+    'escalation': 2000,
+}
+
+# Call site of the model requests made in the current context, for usage accounting
+_call_site: ContextVar[str] = ContextVar("llm_call_site", default="other")
+# Stands in for a section while a prompt is rendered to find its static parts
+_MARKER = re.compile("\x00([^\x00]*)\x00")
+
+@dataclass
+class PromptSection:
+    text: str
+    priority: Optional[int] = None  # None is never trimmed; lower priorities are trimmed first
+    keep: str = "head"  # The end that survives trimming: "head" or "tail"
+
+class PromptBudget:
+    def __init__(self, limits: Optional[Dict[str, int]] = None, token_estimator: Optional[Callable[[str], int]] = None,
+                 max_cached_counts: int = 256):
+        """
+        Initialize token budgeting for prompts.
+
+        Prompts are assembled from sections; when a call site's formatted prompt exceeds
+        its limit, the lowest-priority sections are cut line by line (or dropped) until
+        it fits. Token usage reported by the API is recorded per call site.
+
+        Args:
+            limits (Optional[Dict[str, int]]): Prompt token limits by call site (defaults to DEFAULT_PROMPT_LIMITS)
+            token_estimator (Optional[Callable[[str], int]]): Counts tokens in a text; defaults to TokenCounter
+            max_cached_counts (int): Static prompt parts whose token counts are remembered
+        """
+        self.limits = dict(DEFAULT_PROMPT_LIMITS if limits is None else limits)
+        self._token_estimator = token_estimator
+        self._static_counts = LRUCache(maxsize=max_cached_counts)
+        self.usage: Dict[str, Dict[str, int]] = {}
+
+    def count_tokens(self, text: str) -> int:
+        """Count the tokens in a text with the configured estimator."""
+        if self._token_estimator is None:
+            try:
+                from helpers.token_counter import TokenCounter
+                self._token_estimator = TokenCounter().count_tokens
+            except Exception as e:
+                print(f"[PromptBudget] Tokenizer unavailable ({e}), estimating 4 characters per token")
+                self._token_estimator = lambda value: len(value) // 4 + 1
+        return self._token_estimator(text)
+
+    def count_static_tokens(self, text: str) -> int:
+        """Count the tokens in a text that recurs unchanged, such as a prompt template."""
+        count = self._static_counts.get(text)
+        if count is None:
+            count = self.count_tokens(text)
+            self._static_counts.put(text, count)
+        return count
+
+    def _site_usage(self, call_site: str) -> Dict[str, int]:
+        """Get the usage counters of a call site."""
+        if call_site not in self.usage:
+            self.usage[call_site] = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'trimmed_prompts': 0}
+        return self.usage[call_site]
+
+    def _trim(self, section: PromptSection, max_tokens: int) -> str:
+        """Keep whole lines from the section's kept end while they fit in max_tokens."""
+        if max_tokens <= 0:
+            return ""
+        lines = section.text.splitlines(keepends=True)
+        if section.keep == "tail":
+            lines.reverse()
+        kept: List[str] = []
+        used = 0
+        for line in lines:
+            used += self.count_tokens(line)
+            if used > max_tokens:
+                break
+            kept.append(line)
+        if section.keep == "tail":
+            kept.reverse()
+        return "".join(kept)
+
+    def _measure(self, sections: Dict[str, PromptSection], render: Callable[[Dict[str, str]], Iterable[str]]) -> Tuple[int, Dict[str, int]]:
+        """
+        Render the prompt with a marker per section to find its static parts.
+
+        Returns:
+            Tuple[int, Dict[str, int]]: Tokens of the formatted prompt outside the sections,
+                and how often each section occurs in it
+        """
+        static_tokens = 0
+        occurrences = dict.fromkeys(sections, 0)
+        for message in render({name: f"\x00{name}\x00" for name in sections}):
+            for i, part in enumerate(_MARKER.split(message)):
+                if i % 2:
+                    occurrences[part] += 1
+                elif part:
+                    static_tokens += self.count_static_tokens(part)
+        return static_tokens, occurrences
+
+    def fit(self, call_site: str, sections: Dict[str, PromptSection],
+            render: Callable[[Dict[str, str]], Iterable[str]]) -> Dict[str, str]:
+        """
+        Fit a prompt's sections into the call site's token limit.
+
+        Args:
+            call_site (str): Name of the call site, selecting the limit
+            sections (Dict[str, PromptSection]): Variable parts of the prompt by name
+            render (Callable[[Dict[str, str]], Iterable[str]]): Formats the messages sent to the model
+                from the text of each section; everything it adds is counted as static text
+
+        Returns:
+            Dict[str, str]: The text of each section, trimmed where needed
+        """
+        texts = {name: section.text for name, section in sections.items()}
+        limit = self.limits.get(call_site)
+        if limit is None:
+            return texts
+
+        static_tokens, occurrences = self._measure(sections, render)
+        counts = {name: self.count_tokens(section.text) for name, section in sections.items()}
+        total = static_tokens + sum(counts[name] * occurrences[name] for name in sections)
+        if total <= limit:
+            return texts
+
+        original_total = total
+        trimmable = sorted(
+            (section.priority, name) for name, section in sections.items()
+            if section.priority is not None and occurrences[name]
+        )
+        for _, name in trimmable:
+            excess = total - limit
+            if excess <= 0:
+                break
+            texts[name] = self._trim(sections[name], counts[name] - math.ceil(excess / occurrences[name]))
+            trimmed_count = self.count_tokens(texts[name])
+            total -= (counts[name] - trimmed_count) * occurrences[name]
+            counts[name] = trimmed_count
+        self._site_usage(call_site)['trimmed_prompts'] += 1
+        print(f"[PromptBudget] Trimmed {call_site} prompt from {original_total} to {total} tokens (limit {limit})")
+        return texts
+
+    def record_usage(self, call_site: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        """
+        Record the tokens a model request used.
+
+        Args:
+            call_site (str): Name of the call site that made the request
+            prompt_tokens (Optional[int]): Prompt tokens reported by the API
+            completion_tokens (Optional[int]): Completion tokens reported by the API
+        """
+        usage = self._site_usage(call_site)
+        usage['calls'] += 1
+        usage['prompt_tokens'] += prompt_tokens or 0
+        usage['completion_tokens'] += completion_tokens or 0
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get token usage and trimmed prompts per call site."""
+        return {call_site: dict(usage) for call_site, usage in self.usage.items()}
+
+@contextmanager
+def llm_call_site(name: Optional[str]) -> Iterator[None]:
+    """
+    Attribute the model requests made in this context to a call site.
+
+    Args:
+        name (Optional[str]): Call site name (None keeps the current one)
+    """
+    if name is None:
+        yield
+        return
+    token = _call_site.set(name)
+    try:
+        yield
+    finally:
+        _call_site.reset(token)
+
+def current_call_site() -> str:
+    """Get the call site the current model request belongs to."""
+    return _call_site.get()
+
+@lru_cache(maxsize=None)
+def get_prompt_budget() -> PromptBudget:
+    """Get the process-wide prompt budget; PROMPT_TOKEN_LIMIT caps every call site when set."""
+    limits = dict(DEFAULT_PROMPT_LIMITS)
+    if os.getenv("PROMPT_TOKEN_LIMIT"):
+        limits = {name: min(limit, int(os.environ["PROMPT_TOKEN_LIMIT"])) for name, limit in limits.items()}
+    return PromptBudget(limits)
@@ -0,0 +1,109 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+from helpers.lru_cache import LRUCache
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 4096, ttl_seconds: Optional[float] = 86400.0,
+                 db_path: Optional[str] = None, clock: Callable[[], float] = time.time):
+        """
+        Initialize a cache of model responses keyed by the exact request.
+
+        Entries live in a bounded in-memory LRU; with a db_path they are also written
+        to SQLite, so cached responses survive restarts and are shared between processes.
+
+        Args:
+            maxsize (int): Maximum number of responses kept in memory
+            ttl_seconds (Optional[float]): Lifetime of a cached response (None keeps responses until evicted)
+            db_path (Optional[str]): SQLite file for the persistent backend (None keeps the cache in memory only)
+            clock (Callable[[], float]): Wall-clock time source in seconds
+        """
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.memory = LRUCache(maxsize=maxsize, ttl_seconds=ttl_seconds, clock=clock)
+        self.persistent_hits = 0
+
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._db.commit()
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """
+        Hash a request payload (model, messages and sampling parameters) into a cache key.
+
+        Args:
+            request (Dict[str, Any]): The JSON request payload
+
+        Returns:
+            str: Hex SHA-256 of the canonical JSON encoding
+        """
+        encoded = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached response, falling back to the persistent backend on a memory miss.
+
+        Args:
+            key (str): Cache key from make_key
+
+        Returns:
+            Optional[str]: The cached response content, or None on a miss
+        """
+        content = self.memory.get(key)
+        if content is not None or self._db is None:
+            return content
+
+        with self._lock:
+            row = self._db.execute("SELECT content, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        content, created_at = row
+        if self.ttl_seconds is not None and self.clock() - created_at >= self.ttl_seconds:
+            with self._lock:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+            return None
+
+        self.persistent_hits += 1
+        self.memory.put(key, content)
+        return content
+
+    def put(self, key: str, content: str):
+        """
+        Cache a response.
+
+        Args:
+            key (str): Cache key from make_key
+            content (str): Response content
+        """
+        self.memory.put(key, content)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, content, created_at) VALUES (?, ?, ?)",
+                    (key, content, self.clock())
+                )
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Get hit, miss, eviction and size counters."""
+        stats = self.memory.stats()
+        stats['persistent_hits'] = self.persistent_hits
+        stats['misses'] -= self.persistent_hits
+        lookups = stats['hits'] + self.persistent_hits + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + self.persistent_hits) / lookups, 4) if lookups else 0.0
+        return stats
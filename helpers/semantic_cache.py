@@ -0,0 +1,121 @@
+import re
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence
+import numpy as np
+from helpers.lru_cache import LRUCache
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for cache lookups.
+
+    Args:
+        query (str): Raw query text
+
+    Returns:
+        str: Casefolded query without punctuation or repeated whitespace,
+            e.g. "  How do I RETURN an item?? " -> "how do i return an item"
+    """
+    return ' '.join(re.sub(r"[^\w\s]", " ", query.casefold()).split())
+
+class SemanticCache:
+    def __init__(self, maxsize: int = 1024, ttl_seconds: Optional[float] = 3600.0,
+                 similarity_threshold: Optional[float] = 0.95, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a bounded query result cache with an exact and a semantic tier.
+
+        Lookups first match the normalized query text. On a miss, the query embedding can be
+        compared with the embeddings of cached queries in the same scope, and the closest
+        result is reused if its cosine similarity reaches the threshold.
+
+        Args:
+            maxsize (int): Maximum number of cached queries
+            ttl_seconds (Optional[float]): Lifetime of a cached result (None keeps results until evicted)
+            similarity_threshold (Optional[float]): Minimum cosine similarity for a semantic hit (None disables the semantic tier)
+            clock (Callable[[], float]): Time source in seconds
+        """
+        self.entries = LRUCache(maxsize=maxsize, ttl_seconds=ttl_seconds, clock=clock)
+        self.similarity_threshold = similarity_threshold
+        self.semantic_hits = 0
+
+    def get(self, query: str, scope: Hashable = None) -> Optional[Any]:
+        """
+        Get the cached result for the normalized query text.
+
+        Args:
+            query (str): Query text
+            scope (Hashable): Extra lookup parameters results depend on, e.g. (region, n_results)
+
+        Returns:
+            Optional[Any]: The cached result, or None on a miss
+        """
+        entry = self.entries.get((scope, normalize_query(query)))
+        return entry[1] if entry is not None else None
+
+    def get_similar(self, embedding: Sequence[float], scope: Hashable = None) -> Optional[Any]:
+        """
+        Get the cached result of the most similar query, after `get` missed.
+
+        Args:
+            embedding (Sequence[float]): Query embedding
+            scope (Hashable): Extra lookup parameters results depend on
+
+        Returns:
+            Optional[Any]: The cached result, or None when no cached query is similar enough
+        """
+        if self.similarity_threshold is None:
+            return None
+
+        vector = self._unit(embedding)
+        best_key, best_value, best_similarity = None, None, self.similarity_threshold
+        for key, (cached_vector, value) in self.entries.items():
+            if key[0] != scope or cached_vector is None:
+                continue
+            similarity = float(np.dot(vector, cached_vector))
+            if similarity >= best_similarity:
+                best_key, best_value, best_similarity = key, value, similarity
+        if best_key is None:
+            return None
+        self.entries.touch(best_key)
+        self.semantic_hits += 1
+        return best_value
+
+    def put(self, query: str, value: Any, scope: Hashable = None, embedding: Optional[Sequence[float]] = None):
+        """
+        Cache the result for a query.
+
+        Args:
+            query (str): Query text
+            value (Any): Result to cache
+            scope (Hashable): Extra lookup parameters the result depends on
+            embedding (Optional[Sequence[float]]): Query embedding, enabling semantic reuse of this result
+        """
+        vector = self._unit(embedding) if embedding is not None else None
+        self.entries.put((scope, normalize_query(query)), (vector, value))
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        """Get an L2-normalized copy of an embedding."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def clear(self):
+        """Remove all entries."""
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> Dict[str, float]:
+        """Get hit, miss, eviction, expiration and size counters for both tiers."""
+        stats = self.entries.stats()
+        exact_hits = stats.pop('hits')
+        misses = stats.pop('misses') - self.semantic_hits
+        lookups = exact_hits + self.semantic_hits + misses
+        stats.update({
+            'exact_hits': exact_hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': misses,
+            'hit_rate': round((exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+        })
+        return stats
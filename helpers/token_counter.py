@@ -1,6 +1,12 @@
 import tiktoken
+from functools import lru_cache
 from typing import Dict, Tuple
 
+@lru_cache(maxsize=None)
+def get_encoding(name: str = "cl100k_base") -> tiktoken.Encoding:
+    """Get a tiktoken encoding, loaded once per process."""
+    return tiktoken.get_encoding(name)
+
 class TokenCounter:
     def __init__(self, model: str = "gpt-4.1-mini"):
         """
@@ -11,7 +17,7 @@ class TokenCounter:
         """
         self.model = model
         # Use cl100k_base encoding which works for all GPT models
-        self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.encoding = get_encoding("cl100k_base")
         
     def count_tokens(self, text: str) -> int:
         """Count the number of tokens in a text."""
@@ -1,12 +1,121 @@
-from dataclasses import dataclass
+import sys
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+class ProductRef:
+    """
+    A product shown in a conversation, referenced by its catalog id.
+
+    Only the fields rendered into prompts are kept, instead of a copy of the
+    whole search result dict; the strings are shared with the catalog entry.
+    """
+    __slots__ = ('product_id', 'name', 'price', 'total_stock', 'search_type')
+
+    def __init__(self, product_id: str, name: str, price: Any, total_stock: int = 0, search_type: Optional[str] = None):
+        self.product_id = product_id
+        self.name = name
+        self.price = price
+        self.total_stock = total_stock
+        self.search_type = sys.intern(search_type) if search_type else None
+
+    @classmethod
+    def from_dict(cls, product: Dict[str, Any]) -> "ProductRef":
+        """Create a reference from a search result or a dict made by to_dict."""
+        return cls(
+            product_id=product['product_id'],
+            name=product['name'],
+            price=product['price'],
+            total_stock=product.get('total_stock', 0),
+            search_type=product.get('search_type')
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the product dict format of search results."""
+        data = {
+            'product_id': self.product_id,
+            'name': self.name,
+            'price': self.price,
+            'total_stock': self.total_stock,
+        }
+        if self.search_type:
+            data['search_type'] = self.search_type
+        return data
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ProductRef) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"ProductRef({self.product_id!r}, {self.name!r})"
+
+class SearchResults:
+    """Products found for a message: an exact match and/or similar products."""
+    __slots__ = ('exact_match', 'similar_products')
+
+    def __init__(self, exact_match: Optional[ProductRef] = None, similar_products: Iterable[ProductRef] = ()):
+        self.exact_match = exact_match
+        self.similar_products: Tuple[ProductRef, ...] = tuple(similar_products)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SearchResults":
+        """Create from a {'exact_match', 'similar_products'} dict of product dicts."""
+        exact_match = data.get('exact_match')
+        return cls(
+            ProductRef.from_dict(exact_match) if exact_match else None,
+            [ProductRef.from_dict(product) for product in data.get('similar_products') or ()]
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the {'exact_match', 'similar_products'} format of product searches."""
+        return {
+            'exact_match': self.exact_match.to_dict() if self.exact_match else None,
+            'similar_products': [product.to_dict() for product in self.similar_products],
+        }
 
-@dataclass
 class Message:
-    role: str  # 'user' or 'assistant'
-    content: str
-    timestamp: datetime
-    image: Optional[str] = None
-    search_results: Optional[Dict] = None
-    image_description: Optional[str] = None
\ No newline at end of file
+    """
+    A conversation message.
+
+    Slotted, with interned roles, images referenced by content hash (the BlobStore
+    id) and products by ProductRef, so a session's history stays small in memory.
+    """
+    __slots__ = ('role', 'content', 'timestamp', 'image', 'search_results', 'image_description')
+
+    def __init__(self, role: str, content: str, timestamp: Optional[datetime] = None, image: Optional[str] = None,
+                 search_results: Optional[SearchResults] = None, image_description: Optional[str] = None):
+        self.role = sys.intern(role)  # 'user' or 'assistant'
+        self.content = content
+        self.timestamp = timestamp if timestamp is not None else datetime.now()
+        self.image = image  # SHA-256 of the image bytes
+        self.search_results = search_results
+        self.image_description = image_description
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a JSON-compatible dict."""
+        return {
+            'role': self.role,
+            'content': self.content,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'image': self.image,
+            'search_results': self.search_results.to_dict() if self.search_results else None,
+            'image_description': self.image_description,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Message":
+        """Create a message from a dict made by to_dict."""
+        timestamp = data.get('timestamp')
+        search_results = data.get('search_results')
+        return cls(
+            role=data['role'],
+            content=data['content'],
+            timestamp=datetime.fromisoformat(timestamp) if timestamp else None,
+            image=data.get('image'),
+            search_results=SearchResults.from_dict(search_results) if search_results else None,
+            image_description=data.get('image_description')
+        )
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Message) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"Message(role={self.role!r}, content={self.content!r}, timestamp={self.timestamp!r})"
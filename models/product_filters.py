@@ -0,0 +1,39 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+@dataclass
+class ProductFilters:
+    color: Optional[str] = None
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    in_stock: Optional[bool] = None
+
+    def is_empty(self) -> bool:
+        """Check whether no filter is set."""
+        return all(value is None for value in (self.color, self.category, self.min_price, self.max_price, self.in_stock))
+
+    def to_chroma_where(self) -> Optional[Dict]:
+        """
+        Convert the filters to a ChromaDB where clause over the typed product metadata.
+
+        Returns:
+            Optional[Dict]: The where clause, or None when no filter is set
+        """
+        conditions: List[Dict] = []
+        if self.color is not None:
+            conditions.append({'color': self.color})
+        if self.category is not None:
+            conditions.append({'category': self.category})
+        if self.min_price is not None:
+            conditions.append({'price': {'$gte': float(self.min_price)}})
+        if self.max_price is not None:
+            conditions.append({'price': {'$lte': float(self.max_price)}})
+        if self.in_stock is not None:
+            conditions.append({'in_stock': int(self.in_stock)})
+
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {'$and': conditions}
@@ -1,8 +1,24 @@
-import React, { useState, useRef } from 'react';
+import React, { useState, useRef, useEffect } from 'react';
 import './App.css';
 
 // Add this import for backend API helper
-import { sendMessageToBackend } from './api';
+import { BACKEND_URL, sendMessageToBackend, subscribeToMessages } from './api';
+
+// Resolve image paths returned by the backend against its URL
+const withImageUrl = (msg) => {
+  if (msg.image && msg.image.startsWith('/')) {
+    return { ...msg, image: `${BACKEND_URL}${msg.image}` };
+  }
+  return msg;
+};
+
+// Merge messages into the list by id, ignoring ones already shown
+const mergeMessages = (current, incoming) => {
+  const known = new Set(current.map((msg) => msg.id));
+  const added = incoming.filter((msg) => !known.has(msg.id)).map(withImageUrl);
+  if (!added.length) return current;
+  return [...current, ...added].sort((a, b) => a.id - b.id);
+};
 
 function Message({ message }) {
   return (
@@ -33,6 +49,17 @@ function App() {
   const fileInputRef = useRef();
   const audioInputRef = useRef();
   const sessionIdRef = useRef(null);
+  const unsubscribeRef = useRef(null);
+
+  // Close the event stream when the app unmounts
+  useEffect(() => () => unsubscribeRef.current && unsubscribeRef.current(), []);
+
+  // A reply is pending until an assistant message follows the latest user message
+  useEffect(() => {
+    if (messages.length) setPending(messages[messages.length - 1].role === 'user');
+  }, [messages]);
+
+  const handleIncoming = (msgs) => setMessages((current) => mergeMessages(current, msgs));
 
   // Helper to convert file to base64
   const fileToBase64 = (file) => {
@@ -67,23 +94,14 @@ function App() {
       });
       if (!sessionIdRef.current) {
         sessionIdRef.current = res.session_id;
+        unsubscribeRef.current = subscribeToMessages(res.session_id, 0, (msg) => handleIncoming([msg]));
       }
-      const msgs = res.messages.map((msg) => {
-        if (msg.image && !msg.image.startsWith('data:')) {
-          return { ...msg, image: `data:image/*;base64,${msg.image}` };
-        }
-        return msg;
-      });
-      setMessages(msgs);
+      handleIncoming(res.messages);
       setInput('');
       setImage(null);
       setAudio(null);
       if (fileInputRef.current) fileInputRef.current.value = '';
       if (audioInputRef.current) audioInputRef.current.value = '';
-      setPending(res.pending);
-      if (res.pending) {
-        setTimeout(pollForResponse, 1000);
-      }
     } catch (err) {
       setPending(false);
       alert('Error sending message.');
@@ -106,32 +124,6 @@ function App() {
     }
   };
 
-  const pollForResponse = async () => {
-    const session_id = sessionIdRef.current;
-    try {
-      const res = await sendMessageToBackend({
-        message: '', // No new message, just poll
-        image: null,
-        region,
-        session_id,
-      });
-      const msgs = res.messages.map((msg) => {
-        if (msg.image && !msg.image.startsWith('data:')) {
-          return { ...msg, image: `data:image/*;base64,${msg.image}` };
-        }
-        return msg;
-      });
-      setMessages(msgs);
-      setPending(res.pending);
-      if (res.pending) {
-        setTimeout(pollForResponse, 1000);
-      }
-    } catch (err) {
-      setPending(false);
-      alert('Error polling for response.');
-    }
-  };
-
   return (
     <div className="chat-container">
       <div style={{padding: '16px', borderBottom: '1px solid #eee', background: '#fff'}}>
@@ -144,8 +136,8 @@ function App() {
         </select>
       </div>
       <div className="messages">
-        {messages.map((msg, idx) => (
-          <Message key={idx} message={msg} />
+        {messages.map((msg) => (
+          <Message key={msg.id} message={msg} />
         ))}
       </div>
       <form className="input-area" onSubmit={handleSend}>
@@ -1,6 +1,8 @@
+export const BACKEND_URL = 'http://localhost:8000';
+
 // Send a message to the FastAPI backend
 export async function sendMessageToBackend({ message, image, audio_data, region, session_id }) {
-  const res = await fetch('http://localhost:8000/message', {
+  const res = await fetch(`${BACKEND_URL}/message`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -11,4 +13,15 @@ export async function sendMessageToBackend({ message, image, audio_data, region,
     throw new Error('Failed to send message');
   }
   return await res.json();
-} 
\ No newline at end of file
+}
+
+// Receive the session's messages as they are stored, starting from message id `since`.
+// EventSource reconnects on its own and resumes after the last received id.
+// Returns a function that closes the stream.
+export function subscribeToMessages(session_id, since, onMessage) {
+  const source = new EventSource(
+    `${BACKEND_URL}/events?session_id=${encodeURIComponent(session_id)}&since=${since}`
+  );
+  source.addEventListener('message', (event) => onMessage(JSON.parse(event.data)));
+  return () => source.close();
+}
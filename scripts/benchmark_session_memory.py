@@ -0,0 +1,118 @@
+import gc
+import sys
+import json
+import random
+import argparse
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.conversation_context import ConversationContext
+
+@dataclass
+class LegacyMessage:
+    """The message layout before the compact model, for comparison."""
+    role: str
+    content: str
+    timestamp: datetime
+    image: Optional[str] = None
+    search_results: Optional[Dict] = None
+    image_description: Optional[str] = None
+
+class LegacyConversation:
+    """Conversation state as it was kept before: every message, and copies of whole result dicts."""
+
+    def __init__(self):
+        self.messages: List[LegacyMessage] = []
+        self.last_search_results: Optional[Dict] = None
+
+    def add_message(self, role: str, content: str, image_description: Optional[str] = None, image: Optional[str] = None):
+        self.messages.append(LegacyMessage(role, content, datetime.now(), image=image, image_description=image_description))
+
+    def add_search_results(self, exact_match: Optional[Dict], similar_products: List[Dict]):
+        self.last_search_results = {'exact_match': exact_match, 'similar_products': similar_products}
+
+def compact_conversation() -> ConversationContext:
+    """Create a conversation without history limits, so only the message representation is compared."""
+    return ConversationContext(max_recent_messages=10 ** 6, max_messages=10 ** 6)
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line options for the benchmark."""
+    parser = argparse.ArgumentParser(description="Measure the memory a live chat session's conversation state takes.")
+    parser.add_argument("--sessions", type=int, default=1000, help="Number of simulated sessions")
+    parser.add_argument("--turns", type=int, default=20, help="User/assistant turns per session")
+    parser.add_argument("--catalog", default="data/product_catalog_multi_image.json", help="Catalog the search results come from")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the simulated conversations")
+    return parser.parse_args()
+
+def search_result(product: Dict, search_type: str) -> Dict:
+    """Build a search result the way ProductSearchService returns it, as a fresh dict."""
+    product_id = product['id']['$oid'] if isinstance(product['id'], dict) else str(product['id'])
+    return {
+        'product_id': product_id,
+        'name': product['name'],
+        'price': product['price'],
+        'image_path': (product.get('image_paths') or [product.get('image_path')])[0],
+        'total_stock': product.get('total_stock', 0),
+        'product_link': product.get('product_link'),
+        'product_code': product.get('product_code'),
+        'supplier_stock_code': product.get('supplier_stock_code'),
+        'similarity': random.random(),
+        'search_type': search_type
+    }
+
+def simulate_session(conversation, products: List[Dict], turns: int):
+    """Play a conversation of product searches, image questions and FAQ answers."""
+    for turn in range(turns):
+        kind = turn % 3
+        if kind == 0:
+            conversation.add_message('user', f"Do you have {random.choice(products)['name']} in other colors?")
+            results = [search_result(product, 'text') for product in random.sample(products, 5)]
+            conversation.add_search_results(None, results)
+            conversation.add_message('assistant', "Here are some similar products: " + ", ".join(r['name'] for r in results) * 2)
+        elif kind == 1:
+            conversation.add_message('user', "Is this available?", image_description="A floral midi dress with puff sleeves. " * 6,
+                                     image=f"{random.getrandbits(256):064x}")
+            exact = search_result(random.choice(products), 'image')
+            conversation.add_search_results(exact, [])
+            conversation.add_message('assistant', f"Yes, {exact['name']} is in stock at ${exact['price']}. " * 3)
+        else:
+            conversation.add_message('user', "What is the minimum order quantity and how long does shipping take?")
+            conversation.add_message('assistant', "The minimum order is one pack per product and delivery takes 3-5 business days. " * 3)
+
+def measure(factory, products: List[Dict], sessions: int, turns: int) -> float:
+    """Get the bytes allocated per session for conversations made by factory."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    conversations = []
+    for _ in range(sessions):
+        conversation = factory()
+        simulate_session(conversation, products, turns)
+        conversations.append(conversation)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / sessions
+
+def main():
+    """Main function to compare the memory per session of the legacy and compact models."""
+    args = parse_args()
+    with open(project_root / args.catalog, 'r', encoding='utf-8') as f:
+        products = json.load(f)['products']
+
+    results = {}
+    for name, factory in (('legacy', LegacyConversation), ('compact', compact_conversation)):
+        random.seed(args.seed)
+        results[name] = measure(factory, products, args.sessions, args.turns)
+        print(f"{name:>8}: {results[name] / 1024:8.1f} KiB per session ({args.turns} turns)")
+    print(f"  saving: {1 - results['compact'] / results['legacy']:8.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 import json
-import requests
 import os
 import sys
 from io import BytesIO
@@ -10,6 +9,8 @@ from services.ai_service import AIService
 from services.prompt_builder import PromptBuilder
 from services.image_description_service import ImageDescriptionService
 from helpers.image_utils import convert_image_to_base64
+from helpers.image_cache import ImageCache
+from helpers.llm_scheduler import PRIORITY_BACKGROUND
 import asyncio
 
 CATALOG_PATH = "data/product_catalog_multi_image.json"
@@ -22,9 +23,11 @@ async def main():
     products = catalog['products']
 
     # Set up services
-    ai_service = AIService()
+    # Batch work yields to interactive requests sharing the rate limit
+    ai_service = AIService(default_priority=PRIORITY_BACKGROUND)
     prompt_builder = PromptBuilder()
     image_desc_service = ImageDescriptionService(ai_service, prompt_builder)
+    image_cache = ImageCache()
 
     results = {}
     for product in products:
@@ -35,9 +38,11 @@ async def main():
             continue
         image_url = image_urls[0]
         try:
-            resp = requests.get(image_url)
-            resp.raise_for_status()
-            image = Image.open(BytesIO(resp.content)).convert('RGB')
+            image_bytes = image_cache.fetch_sync(image_url)
+            if image_bytes is None:
+                print(f"Image unavailable for product {product_id}")
+                continue
+            image = Image.open(BytesIO(image_bytes)).convert('RGB')
             base64_img = convert_image_to_base64(image)
             desc = await image_desc_service.get_image_description(base64_img)
             print(f"{product_id}: {desc}")
@@ -49,6 +54,8 @@ async def main():
         except Exception as e:
             print(f"Error for {product_id}: {e}")
 
+    ai_service.scheduler.close()
+
     with open(OUTPUT_PATH, 'w') as f:
         json.dump(results, f, indent=2, ensure_ascii=False)
     print(f"Saved descriptions to {OUTPUT_PATH}")
@@ -0,0 +1,30 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.faq_service import FAQService
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line options for the FAQ sync."""
+    parser = argparse.ArgumentParser(description="Reindex FAQs that changed in prompts/LoncaFAQs.xlsx.")
+    parser.add_argument("--rebuild", action="store_true", help="Re-embed every FAQ, even unchanged ones")
+    return parser.parse_args()
+
+def main():
+    """Main function to sync the FAQ collection with the spreadsheet."""
+    args = parse_args()
+    
+    # FAQService resolves the spreadsheet relative to the project root
+    os.chdir(project_root)
+    faq_service = FAQService()
+    if args.rebuild:
+        faq_service.sync_faqs(force=True)
+    faq_service.client.persist()
+
+if __name__ == "__main__":
+    main()
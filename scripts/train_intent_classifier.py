@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+from pathlib import Path
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.intent_classifier import DEFAULT_DECISION_LOG, DEFAULT_MODEL_DIR, get_model_path
+from services.text_encoder import DEFAULT_TEXT_MODEL, get_text_encoder
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line options for classifier training."""
+    parser = argparse.ArgumentParser(description="Train a local intent classifier from logged LLM decisions.")
+    parser.add_argument("task", help="Decision to train, e.g. product_query or lonca_query")
+    parser.add_argument("--log", default=DEFAULT_DECISION_LOG, help="JSONL decision log")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR, help="Directory trained classifiers are written to")
+    parser.add_argument("--text-model", default=DEFAULT_TEXT_MODEL, help="Sentence embedding model")
+    parser.add_argument("--threshold", type=float, default=0.9, help="Confidence threshold to evaluate")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Fraction of decisions held out for evaluation")
+    parser.add_argument("--min-samples", type=int, default=50, help="Refuse to train on fewer decisions")
+    return parser.parse_args()
+
+def load_decisions(log_path: str, task: str) -> dict:
+    """
+    Load the latest LLM decision per distinct text for a task.
+
+    Args:
+        log_path (str): JSONL decision log; its rotated predecessor <log_path>.1 is read first
+        task (str): Decision name
+
+    Returns:
+        dict: Text -> label (0/1)
+    """
+    decisions = {}
+    for path in (f"{log_path}.1", log_path):
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record['task'] == task:
+                    decisions[record['text']] = record['label']
+    return decisions
+
+def evaluate(model: LogisticRegression, embeddings: np.ndarray, labels: np.ndarray, threshold: float) -> dict:
+    """
+    Measure accuracy overall and on the predictions confident enough to skip the LLM.
+
+    Args:
+        model (LogisticRegression): Trained classifier
+        embeddings (np.ndarray): Held-out embeddings
+        labels (np.ndarray): Held-out labels
+        threshold (float): Confidence threshold
+
+    Returns:
+        dict: accuracy, coverage (fraction decided locally) and confident_accuracy
+    """
+    probabilities = model.predict_proba(embeddings)[:, 1]
+    predictions = (probabilities >= 0.5).astype(int)
+    confident = np.maximum(probabilities, 1 - probabilities) >= threshold
+    return {
+        'accuracy': round(float((predictions == labels).mean()), 4),
+        'coverage': round(float(confident.mean()), 4),
+        'confident_accuracy': round(float((predictions[confident] == labels[confident]).mean()), 4) if confident.any() else None,
+    }
+
+def main():
+    """Main function to train, evaluate and save the classifier."""
+    args = parse_args()
+    decisions = load_decisions(args.log, args.task)
+    if len(decisions) < args.min_samples or len(set(decisions.values())) < 2:
+        print(f"Only {len(decisions)} decisions for '{args.task}' (need {args.min_samples} covering both labels), not training.")
+        return
+
+    texts = list(decisions)
+    labels = np.array([decisions[text] for text in texts])
+    embeddings = get_text_encoder(args.text_model).encode(texts)
+
+    train_x, test_x, train_y, test_y = train_test_split(
+        embeddings, labels, test_size=args.test_size, stratify=labels, random_state=0
+    )
+    model = LogisticRegression(max_iter=1000, class_weight='balanced')
+    model.fit(train_x, train_y)
+    metrics = evaluate(model, test_x, test_y, args.threshold)
+    print(f"Held-out evaluation at threshold {args.threshold}: {metrics}")
+
+    # Refit on every decision for the saved model
+    model.fit(embeddings, labels)
+    os.makedirs(args.model_dir, exist_ok=True)
+    model_path = get_model_path(args.task, args.model_dir)
+    with open(model_path, 'wb') as f:
+        pickle.dump({
+            'model': model,
+            'text_model': args.text_model,
+            'n_samples': len(texts),
+            'metrics': metrics,
+            'threshold': args.threshold,
+            'trained_at': time.time(),
+        }, f)
+    print(f"Saved '{args.task}' classifier to {model_path}")
+
+if __name__ == "__main__":
+    main()
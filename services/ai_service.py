@@ -1,18 +1,80 @@
-from typing import Dict
+import os
+import json
+import time
+import asyncio
+from typing import Dict, Optional, Tuple
 import aiohttp
 from helpers.api_key import get_openai_api_key
+from helpers.response_cache import ResponseCache
+from helpers.llm_scheduler import PRIORITY_CLASSIFIER, PRIORITY_INTERACTIVE, LLMScheduler, get_llm_scheduler
+from helpers.prompt_budget import PromptBudget, current_call_site, get_prompt_budget, llm_call_site
+from helpers.llm_resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    UpstreamError,
+    backoff_delay,
+    parse_retry_after,
+    remaining_turn_budget,
+)
+
+# Returned in place of a generated answer when the model API is unavailable
+FALLBACK_REPLY = "Sorry, I'm having trouble answering right now. Please try again in a moment."
 
 class AIService:
-    def __init__(self, model: str = "gpt-4.1-mini"):
+    def __init__(self,
+                 model: str = "gpt-4.1-mini",
+                 response_cache: Optional[ResponseCache] = None,
+                 response_timeout: float = 20.0,
+                 classification_timeout: float = 6.0,
+                 max_retries: int = 2,
+                 backoff_base: float = 0.5,
+                 backoff_cap: float = 8.0,
+                 hedge_requests: bool = False,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 scheduler: Optional[LLMScheduler] = None,
+                 default_priority: int = PRIORITY_INTERACTIVE,
+                 prompt_budget: Optional[PromptBudget] = None):
         """
         Initialize the AI service.
         
         Args:
             model (str): The model to use (default: gpt-4.1-mini)
+            response_cache (Optional[ResponseCache]): Cache for classifications whose call site opts in with
+                cache=True; defaults to an in-memory cache, persisted to SQLite when AI_RESPONSE_CACHE_DB is set
+            response_timeout (float): Deadline in seconds for a generated answer, retries included
+            classification_timeout (float): Deadline in seconds for a classification, retries included
+            max_retries (int): Retries after timeouts, connection errors, 429 and 5xx responses
+            backoff_base (float): Backoff before the first retry; doubles per retry, with full jitter
+            backoff_cap (float): Maximum backoff, also applied to Retry-After
+            hedge_requests (bool): Send a duplicate request when the first one is slower than the observed p95
+            circuit_breaker (Optional[CircuitBreaker]): Breaker that fast-fails calls after repeated failures
+            scheduler (Optional[LLMScheduler]): Rate limiter requests queue in; defaults to the process-wide one
+            default_priority (int): Priority of get_response calls, e.g. PRIORITY_BACKGROUND for batch jobs
+            prompt_budget (Optional[PromptBudget]): Records token usage per call site; defaults to the process-wide one
         """
         self.model = model
         self.api_key = get_openai_api_key()
         self.api_url = "https://api.openai.com/v1/chat/completions"
+        self.response_cache = response_cache or ResponseCache(db_path=os.getenv("AI_RESPONSE_CACHE_DB") or None)
+        self.response_timeout = response_timeout
+        self.classification_timeout = classification_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge_requests = hedge_requests
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.scheduler = scheduler or get_llm_scheduler()
+        self.default_priority = default_priority
+        self.prompt_budget = prompt_budget or get_prompt_budget()
+        self.latency = LatencyTracker()
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'hedges': 0,
+            'failures': 0,
+            'circuit_rejections': 0,
+        }
 
     def _create_response(self, content: str) -> Dict:
         """
@@ -32,51 +94,91 @@ class AIService:
             }]
         }
         
-    async def get_classification(self, prompt: str) -> str:
+    async def get_classification(self, prompt: str, cache: bool = False) -> str:
         """
         Get a simple yes/no classification from the model.
         
         Args:
             prompt (str): The classification prompt
+            cache (bool): Reuse the response of an identical earlier request
             
         Returns:
             str: The model's classification ('yes' or 'no')
         """
+        label = await self.classify(
+            "You are a query classifier. Respond with ONLY 'yes' or 'no'.",
+            prompt,
+            cache=cache
+        )
+        return label or "no"  # Default to 'no' in case of error
+        
+    async def classify(self, system_prompt: str, user_prompt: str, labels: Tuple[str, ...] = ("yes", "no"),
+                       model: Optional[str] = None, cache: bool = False, call_site: Optional[str] = None) -> Optional[str]:
+        """
+        Classify a prompt into one of a fixed set of labels.
+        
+        The completion is constrained with a JSON schema enum, generated deterministically
+        and capped at a few tokens, so the answer is always one of the labels.
+        
+        Args:
+            system_prompt (str): Classifier instructions
+            user_prompt (str): The input to classify
+            labels (Tuple[str, ...]): Allowed labels
+            model (Optional[str]): Model override, e.g. a smaller model for simple decisions
+            cache (bool): Reuse the response of an identical earlier request
+            call_site (Optional[str]): Name token usage is recorded under
+            
+        Returns:
+            Optional[str]: The chosen label, or None if the request failed
+        """
         try:
-            # Prepare headers
             headers = {
                 "Content-Type": "application/json",
                 "Authorization": f"Bearer {self.api_key}"
             }
-
-            # Prepare payload
+            
             payload = {
-                "model": self.model,
-                "temperature": 0.1,  # Lower temperature for more consistent responses
-                "max_tokens": 10,    # We only need a short response
+                "model": model or self.model,
+                "temperature": 0,
+                "max_tokens": 16,
                 "messages": [
                     {
                         "role": "system",
-                        "content": "You are a query classifier. Respond with ONLY 'yes' or 'no'."
+                        "content": system_prompt
                     },
                     {
                         "role": "user",
-                        "content": prompt
+                        "content": user_prompt
                     }
-                ]
+                ],
+                "response_format": {
+                    "type": "json_schema",
+                    "json_schema": {
+                        "name": "classification",
+                        "strict": True,
+                        "schema": {
+                            "type": "object",
+                            "properties": {"label": {"type": "string", "enum": list(labels)}},
+                            "required": ["label"],
+                            "additionalProperties": False
+                        }
+                    }
+                }
             }
-
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    response.raise_for_status()
-                    result = await response.json()
-                    return result["choices"][0]["message"]["content"].strip().lower()
+            
+            with llm_call_site(call_site):
+                content = await self._post(headers, payload, cache, timeout=self.classification_timeout, priority=PRIORITY_CLASSIFIER)
+            label = json.loads(content)["label"]
+            if label not in labels:
+                raise ValueError(f"Unexpected label {label!r}")
+            return label
             
         except Exception as e:
             print(f"Error getting classification: {e}")
-            return "no"  # Default to 'no' in case of error
+            return None
         
-    async def get_response(self, system_prompt: str, user_prompt: str, image_data: str = None) -> Dict:
+    async def get_response(self, system_prompt: str, user_prompt: str, image_data: str = None,
+                           priority: Optional[int] = None, call_site: Optional[str] = None) -> Dict:
         """
         Get response from OpenAI's model, supporting optional image input.
         
@@ -84,9 +186,11 @@ class AIService:
             system_prompt (str): The system prompt defining the assistant's behavior
             user_prompt (str): The user's message and context
             image_data (str, optional): Base64-encoded image data
+            priority (Optional[int]): Scheduler priority (defaults to the service's default priority)
+            call_site (Optional[str]): Name token usage is recorded under
             
         Returns:
-            Dict: The model's response
+            Dict: The model's response; if the model API fails, a fallback reply with an "error" key
         """
         try:
             headers = {
@@ -131,11 +235,181 @@ class AIService:
                     ]
                 }
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    response.raise_for_status()
-                    result = await response.json()
-                    return self._create_response(result["choices"][0]["message"]["content"])
+            with llm_call_site(call_site):
+                # Sampled answers are never cached, so repeated questions keep getting fresh wording
+                content = await self._post(headers, payload, False, timeout=self.response_timeout,
+                                           priority=self.default_priority if priority is None else priority)
+            return self._create_response(content)
         except Exception as e:
             print(f"Error getting AI response: {e}")
-            return {"error": str(e)} 
\ No newline at end of file
+            return {**self._create_response(FALLBACK_REPLY), "error": str(e)}
+            
+    async def _post(self, headers: Dict, payload: Dict, cache: bool, timeout: float, priority: int) -> str:
+        """
+        Send a chat completion request, serving identical cached requests without a round trip.
+        
+        Args:
+            headers (Dict): Request headers
+            payload (Dict): Request payload
+            cache (bool): Look up and store the response in the response cache; only honoured for
+                temperature 0 requests, whose answer depends on the prompt alone
+            timeout (float): Deadline for this call site; shortened to what is left of the turn budget
+            priority (int): Scheduler priority of the request
+            
+        Returns:
+            str: The message content of the first choice
+        """
+        cache_key = self.response_cache.make_key(payload) if cache and payload.get('temperature') == 0 else None
+        if cache_key:
+            content = self.response_cache.get(cache_key)
+            if content is not None:
+                return content
+        
+        content = await self._post_with_retries(headers, payload, timeout, priority)
+        
+        if cache_key:
+            self.response_cache.put(cache_key, content)
+        return content
+        
+    async def _post_with_retries(self, headers: Dict, payload: Dict, timeout: float, priority: int) -> str:
+        """
+        Send a request, retrying transient failures with backoff until the deadline.
+        
+        Args:
+            headers (Dict): Request headers
+            payload (Dict): Request payload
+            timeout (float): Deadline for this call site
+            priority (int): Scheduler priority of the request
+            
+        Returns:
+            str: The message content of the first choice
+            
+        Raises:
+            UpstreamError: If the request failed for good, ran out of time or the circuit is open
+        """
+        turn_remaining = remaining_turn_budget()
+        if turn_remaining is not None:
+            timeout = min(timeout, turn_remaining)
+        if timeout <= 0:
+            raise UpstreamError("Turn budget exhausted", retryable=False)
+        if not self.circuit_breaker.allow():
+            self.stats['circuit_rejections'] += 1
+            raise CircuitOpenError()
+        
+        deadline = time.monotonic() + timeout
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    content = await self._send_hedged(headers, payload, deadline - time.monotonic(), priority)
+                    self.circuit_breaker.record_success()
+                    return content
+                except UpstreamError as e:
+                    error = e
+                    if not e.retryable:
+                        # The request itself is wrong or never left the queue; the upstream is healthy
+                        self.circuit_breaker.record_success()
+                        raise
+                
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap, error.retry_after)
+                if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    break
+                print(f"[AIService] Retrying after {error} in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+                self.stats['retries'] += 1
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # The turn was superseded; the outcome says nothing about the upstream
+            self.circuit_breaker.record_cancelled()
+            raise
+        
+        self.stats['failures'] += 1
+        self.circuit_breaker.record_failure()
+        raise error
+        
+    async def _send_hedged(self, headers: Dict, payload: Dict, timeout: float, priority: int) -> str:
+        """
+        Send a request and, with hedging enabled, a duplicate once the first is slower than p95.
+        
+        Args:
+            headers (Dict): Request headers
+            payload (Dict): Request payload
+            timeout (float): Seconds left for this attempt
+            priority (int): Scheduler priority of the request
+            
+        Returns:
+            str: The message content of whichever request succeeded first
+        """
+        hedge_delay = self.latency.percentile(95) if self.hedge_requests else None
+        if hedge_delay is None or hedge_delay >= timeout:
+            return await self._send(headers, payload, timeout, priority)
+        
+        primary = asyncio.ensure_future(self._send(headers, payload, timeout, priority))
+        pending = {primary}
+        error = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+            if done:
+                return primary.result()
+            
+            self.stats['hedges'] += 1
+            pending.add(asyncio.ensure_future(self._send(headers, payload, timeout - hedge_delay, priority)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Also reached when the caller is cancelled, e.g. by a superseding turn
+            for task in pending:
+                task.cancel()
+        
+    async def _send(self, headers: Dict, payload: Dict, timeout: float, priority: int) -> str:
+        """
+        Wait for the rate limiter, then send one request, classifying failures as retryable or not.
+        
+        Args:
+            headers (Dict): Request headers
+            payload (Dict): Request payload
+            timeout (float): Seconds before the request is abandoned, time spent queued included
+            priority (int): Scheduler priority of the request
+            
+        Returns:
+            str: The message content of the first choice
+        """
+        estimated_tokens = self.scheduler.estimate_tokens(payload)
+        queued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(self.scheduler.acquire(estimated_tokens, priority), timeout)
+        except asyncio.TimeoutError:
+            raise UpstreamError(f"Rate limit queue wait exceeded {timeout:.1f}s", retryable=False)
+        timeout -= time.monotonic() - queued_at
+        if timeout <= 0:
+            # aiohttp treats a total timeout of 0 as no timeout at all
+            self.scheduler.release(estimated_tokens)
+            raise UpstreamError("Deadline passed while waiting in the rate limit queue", retryable=False)
+        
+        self.stats['requests'] += 1
+        start = time.monotonic()
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+                async with session.post(self.api_url, headers=headers, json=payload) as response:
+                    if response.status == 429 or response.status >= 500:
+                        raise UpstreamError(
+                            f"HTTP {response.status}",
+                            status=response.status,
+                            retry_after=parse_retry_after(response.headers.get("Retry-After"))
+                        )
+                    if response.status >= 400:
+                        raise UpstreamError(f"HTTP {response.status}: {await response.text()}", status=response.status, retryable=False)
+                    result = await response.json()
+        except asyncio.TimeoutError:
+            raise UpstreamError(f"Timed out after {timeout:.1f}s")
+        except aiohttp.ClientError as e:
+            raise UpstreamError(f"Connection error: {e}")
+        
+        self.latency.record(time.monotonic() - start)
+        usage = result.get("usage", {})
+        self.scheduler.record_usage(estimated_tokens, usage.get("total_tokens"))
+        self.prompt_budget.record_usage(current_call_site(), usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        return result["choices"][0]["message"]["content"]
@@ -4,13 +4,18 @@ from .ai_service import AIService
 from .query_validator import QueryValidator
 from .response_builder import ResponseBuilder
 from .conversation_context import ConversationContext
+from .conversation_summarizer import ConversationSummarizer
+from .session_store import SessionStore
 from .product_search_service import ProductSearchService
 from .follow_up_service import FollowUpService
 from .product_query_service import ProductQueryService
 from .search_result_service import SearchResultService
 from .lonca_query_service import LoncaQueryService
 from .image_description_service import ImageDescriptionService
+from .faq_shortcut_service import FAQShortcutService
 from helpers.image_utils import process_base64_image
+from helpers.blob_store import content_id
+from helpers.llm_resilience import turn_budget
 import whisper
 import tempfile
 import base64
@@ -18,13 +23,27 @@ import os
 from helpers.audio_utils import transcribe_audio
 
 class ChatHandler:
-    def __init__(self, model: str = "gpt-4.1-mini", faq_service=None):
+    def __init__(self, model: str = "gpt-4.1-mini", faq_service=None, templated_escalation: bool = False,
+                 faq_shortcut_relevance: Optional[float] = None, classifier_model: Optional[str] = None,
+                 turn_budget_seconds: Optional[float] = 45.0, session_store: Optional[SessionStore] = None):
         """
         Initialize the chat handler with required services.
         
         Args:
             model (str): The model to use (default: gpt-4.1-mini)
+            templated_escalation (bool): Escalate unanswerable queries with a fixed reply instead of an LLM call
+            faq_shortcut_relevance (Optional[float]): FAQ relevance at which the stored answer is returned
+                without any LLM call (None, the default, disables the shortcut). The shortcut skips the
+                follow-up, product and business checks, and relevance is 1 - distance / 2, so 0.85 already
+                accepts a cosine similarity of 0.7; only enable it with a threshold checked on real queries
+            classifier_model (Optional[str]): Smaller model for the yes/no classifiers (defaults to model)
+            turn_budget_seconds (Optional[float]): Time allowed for all model calls of one turn; each call's
+                deadline is cut to what is left (None leaves turns unbounded)
+            session_store (Optional[SessionStore]): Store of the conversations passed with a session id,
+                which background summaries are saved to
         """
+        self.turn_budget_seconds = turn_budget_seconds
+        
         # Initialize core services
         self.ai_service = AIService(model)
         self.prompt_builder = PromptBuilder(faq_service=faq_service)
@@ -36,23 +55,33 @@ class ChatHandler:
         self.query_validator = QueryValidator(
             self.ai_service,
             self.prompt_builder,
-            self.response_builder
+            self.response_builder,
+            classifier_model=classifier_model
         )
-        self.follow_up_service = FollowUpService(self.ai_service, self.prompt_builder)
+        self.follow_up_service = FollowUpService(self.ai_service, self.prompt_builder, classifier_model=classifier_model)
         self.product_query_service = ProductQueryService(
             self.ai_service,
             self.prompt_builder,
-            self.product_search_service
+            self.product_search_service,
+            classifier_model=classifier_model
         )
         self.search_result_service = SearchResultService(self.ai_service, self.prompt_builder)
         self.lonca_query_service = LoncaQueryService(
             self.ai_service,
             self.prompt_builder,
-            self.response_builder
+            self.response_builder,
+            templated_escalation=templated_escalation
         )
         self.image_description_service = ImageDescriptionService(self.ai_service, self.prompt_builder)
+        self.conversation_summarizer = ConversationSummarizer(self.ai_service, self.prompt_builder, session_store=session_store)
+        self.faq_shortcut_service = (
+            FAQShortcutService(min_relevance=faq_shortcut_relevance)
+            if faq_shortcut_relevance is not None else None
+        )
         
-    async def process_message(self, user_input: str, context: Optional[Dict] = None) -> Dict:
+    async def process_message(self, user_input: str, context: Optional[Dict] = None,
+                              conversation_context: Optional[ConversationContext] = None,
+                              session_id: Optional[str] = None) -> Dict:
         """
         Process a user message and return the AI response.
         
@@ -61,10 +90,22 @@ class ChatHandler:
             context (Dict, optional): Additional context for the conversation
                 - image_data: Base64 encoded image data if present
                 - region: The user's region
+            conversation_context (Optional[ConversationContext]): The session's conversation, updated
+                in place; defaults to the handler's own single conversation
+            session_id (Optional[str]): Session whose conversation is kept in the handler's session store
             
         Returns:
             Dict: The AI's response
         """
+        if conversation_context is None:
+            conversation_context = self.conversation_context
+        # Older messages are summarized alongside the turn, outside its budget
+        self.conversation_summarizer.schedule(conversation_context, session_id=session_id)
+        with turn_budget(self.turn_budget_seconds):
+            return await self._process_message(user_input, context, conversation_context)
+        
+    async def _process_message(self, user_input: str, context: Optional[Dict], conversation_context: ConversationContext) -> Dict:
+        """Process a user message within the turn budget."""
         # Get region and image data from context
         region = context.get("region") if context else None
         image_data = context.get("image_data") if context else None
@@ -73,9 +114,12 @@ class ChatHandler:
         # Process image and image description from context
         image_description = None
         image=None
+        image_id = None
         if image_data:
             try:
                 image = process_base64_image(image_data)
+                # The conversation keeps only the image's content hash (its upload blob id)
+                image_id = content_id(base64.b64decode(image_data))
             except ValueError:
                 image=None
             image_description = await self.image_description_service.get_image_description(image_data)
@@ -98,13 +142,23 @@ class ChatHandler:
                     os.remove(audio_path)
         
         # Add user message to conversation context
-        self.conversation_context.add_message('user', user_input, image_description=image_description)
+        conversation_context.add_message('user', user_input, image_description=image_description, image=image_id)
         print("\n[ChatHandler] Updated conversation context with user message")
         
+        # FAQs for this turn are retrieved at most once, by whichever service needs them first
+        retrieval = self.prompt_builder.create_retrieval_context(user_input, region)
+        
+        # Answer questions that match a stored FAQ closely without classification or generation
+        if self.faq_shortcut_service:
+            faq_answer = self.faq_shortcut_service.try_answer(retrieval, conversation_context, has_image=image is not None)
+            if faq_answer:
+                conversation_context.add_message('assistant', faq_answer)
+                return self.ai_service._create_response(faq_answer)
+        
         # First, check if this is a follow-up about an existing product
         follow_up_result = await self.follow_up_service.check_follow_up(
             user_input,
-            self.conversation_context
+            conversation_context
         )
         print(f"\n[ChatHandler] Follow-up result: {follow_up_result}")
         
@@ -112,11 +166,12 @@ class ChatHandler:
             is_valid, response, search_results = follow_up_result
             if not is_valid:
                 return self.ai_service._create_response(response)
-            response, self.conversation_context = await self.search_result_service.handle_search_results(
+            response, conversation_context = await self.search_result_service.handle_search_results(
                 user_input,
                 search_results,
-                self.conversation_context,
-                region
+                conversation_context,
+                region,
+                retrieval=retrieval
             )
             print("\n[ChatHandler] Updated conversation context with follow-up search results")
             return response
@@ -133,11 +188,12 @@ class ChatHandler:
             is_valid, response, search_results = product_query_result
             if not is_valid:
                 return self.ai_service._create_response(response)
-            response, self.conversation_context = await self.search_result_service.handle_search_results(
+            response, conversation_context = await self.search_result_service.handle_search_results(
                 user_input,
                 search_results,
-                self.conversation_context,
-                region
+                conversation_context,
+                region,
+                retrieval=retrieval
             )
             print("\n[ChatHandler] Updated conversation context with product-query search results")
             return response
@@ -145,7 +201,7 @@ class ChatHandler:
         # Finally, validate if the query is Lonca-related
         is_valid, response = await self.query_validator.validate_query(
             query=user_input,
-            conversation_context=self.conversation_context,
+            conversation_context=conversation_context,
             image_description=image_description
         )
         print(f"\n[ChatHandler] Query validation result: is_valid={is_valid}, response={response}")
@@ -154,11 +210,12 @@ class ChatHandler:
             return self.ai_service._create_response(response)
             
         # Handle Lonca-related query
-        response, self.conversation_context = await self.lonca_query_service.handle_query(
+        response, conversation_context = await self.lonca_query_service.handle_query(
             query=user_input,
             region=region,
-            conversation_context=self.conversation_context,
-            image_description=image_description
+            conversation_context=conversation_context,
+            image_description=image_description,
+            retrieval=retrieval
         )
         print("\n[ChatHandler] Updated conversation context with Lonca query response")
         return response 
\ No newline at end of file
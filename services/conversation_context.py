@@ -1,31 +1,119 @@
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from datetime import datetime
-from models.message import Message
+from models.message import Message, ProductRef, SearchResults
 
 class ConversationContext:
-    def __init__(self):
+    def __init__(self, max_recent_messages: int = 10, max_messages: int = 30):
+        """
+        Initialize an empty conversation.
+        
+        The last max_recent_messages messages are kept verbatim; older ones wait to be
+        folded into `summary` by a ConversationSummarizer. If folding falls behind, or
+        no summarizer runs, messages beyond max_messages are dropped, so the rendered
+        context stays bounded either way.
+        
+        Args:
+            max_recent_messages (int): Messages kept verbatim, never folded into the summary
+            max_messages (int): Messages kept at most, including those waiting to be folded
+        """
+        self.max_recent_messages = max_recent_messages
+        self.max_messages = max(max_messages, max_recent_messages)
         self.messages: List[Message] = []
+        self.summary: Optional[str] = None
         self.current_topic: Optional[str] = None
-        self.last_search_results: Optional[Dict] = None
+        self.last_search_results: Optional[SearchResults] = None
+        # Rendered conversation, reused until the messages or the summary change
+        self._rendered: Optional[str] = None
+        
+    def add_message(self, role: str, content: str, timestamp: Optional[datetime] = None, search_results: Optional[Dict] = None,
+                    image_description: Optional[str] = None, image: Optional[str] = None):
+        """
+        Add a new message to the conversation history.
         
-    def add_message(self, role: str, content: str, timestamp: Optional[datetime] = datetime.now(), search_results: Optional[Dict] = None, image_description: Optional[str] = None):
-        """Add a new message to the conversation history."""
+        Args:
+            role (str): 'user' or 'assistant'
+            content (str): Message text
+            timestamp (Optional[datetime]): When the message was sent (defaults to now)
+            search_results (Optional[Dict]): Products found for the message, kept as references
+            image_description (Optional[str]): Description of the image sent with the message
+            image (Optional[str]): Content hash of that image
+        """
         message = Message(
             role=role,
             content=content,
             timestamp=timestamp,
-            search_results=search_results,
+            image=image,
+            search_results=SearchResults.from_dict(search_results) if search_results else None,
             image_description=image_description
         )
         self.messages.append(message)
+        if len(self.messages) > self.max_messages:
+            del self.messages[:len(self.messages) - self.max_messages]
+        self._rendered = None
         
     def add_search_results(self, exact_match: Optional[Dict], similar_products: List[Dict]):
-        """Store the latest search results."""
-        self.last_search_results = {
-            'exact_match': exact_match,
-            'similar_products': similar_products
+        """Store references to the latest search results."""
+        self.last_search_results = SearchResults(
+            ProductRef.from_dict(exact_match) if exact_match else None,
+            [ProductRef.from_dict(product) for product in similar_products]
+        )
+        
+    def messages_to_summarize(self) -> List[Message]:
+        """Get the messages older than the verbatim window, oldest first."""
+        return self.messages[:max(0, len(self.messages) - self.max_recent_messages)]
+        
+    def apply_summary(self, summary: str, summarized: List[Message]) -> bool:
+        """
+        Replace summarized messages with the summary that now covers them.
+        
+        Args:
+            summary (str): Summary of the earlier summary and the summarized messages
+            summarized (List[Message]): The messages the summary was made from, as returned
+                by messages_to_summarize; compared by value, so a context loaded from a
+                session store matches too
+            
+        Returns:
+            bool: Whether the summary was applied; it is not if the history changed since,
+                e.g. because the messages were dropped or already summarized in the meantime
+        """
+        count = len(summarized)
+        if count > len(self.messages) or any(a != b for a, b in zip(self.messages, summarized)):
+            return False
+        del self.messages[:count]
+        self.summary = summary
+        self._rendered = None
+        return True
+        
+    def copy(self) -> "ConversationContext":
+        """Get a copy whose changes do not affect this context."""
+        context = ConversationContext(self.max_recent_messages, self.max_messages)
+        context.messages = list(self.messages)
+        context.summary = self.summary
+        context.current_topic = self.current_topic
+        context.last_search_results = self.last_search_results
+        context._rendered = self._rendered
+        return context
+        
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the conversation state to a dict, e.g. for an external session store."""
+        return {
+            'messages': [message.to_dict() for message in self.messages],
+            'summary': self.summary,
+            'current_topic': self.current_topic,
+            'last_search_results': self.last_search_results.to_dict() if self.last_search_results else None,
         }
         
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConversationContext":
+        """Restore a conversation from a dict made by to_dict."""
+        context = cls()
+        context.messages = [Message.from_dict(message) for message in data.get('messages', [])]
+        context.summary = data.get('summary')
+        context.current_topic = data.get('current_topic')
+        last_search_results = data.get('last_search_results')
+        context.last_search_results = SearchResults.from_dict(last_search_results) if last_search_results else None
+        return context
+        
     def get_recent_messages(self, limit: Optional[int] = None) -> List[Message]:
         """
         Get messages from the conversation.
@@ -41,35 +129,43 @@ class ConversationContext:
         return self.messages[-limit:]
         
     def get_conversation_context(self) -> str:
-        """Get the conversation context."""
-        recent_messages = self.get_recent_messages()
-        if not recent_messages:
-            return ""
-            
-        context = "Recent conversation:\n"
-        for msg in recent_messages:
-            context += f"{msg.role.capitalize()}: {msg.content}\n"
+        """Get the conversation context: the summary of earlier messages followed by the recent ones."""
+        if self._rendered is None:
+            parts = []
+            if self.summary:
+                parts.append(f"Summary of earlier conversation:\n{self.summary}\n\n")
+            if self.messages:
+                parts.append("Recent conversation:\n")
+                parts.append(self.format_messages(self.messages))
+            self._rendered = "".join(parts)
+        return self._rendered
+        
+    @staticmethod
+    def format_messages(messages: List[Message]) -> str:
+        """Render messages with their image descriptions and search results as a transcript."""
+        lines = []
+        for msg in messages:
+            lines.append(f"{msg.role.capitalize()}: {msg.content}\n")
             
             # Add image description if present
             if msg.image_description:
-                context += f"[Image provided. Description (summary): {msg.image_description}]\n"
+                lines.append(f"[Image provided. Description (summary): {msg.image_description}]\n")
             
             # Add search results if present
             if msg.search_results:
-                context += "\nSearch Results:\n"
-                if msg.search_results['exact_match']:
-                    exact = msg.search_results['exact_match']
-                    context += f"Exact Match: {exact['name']} (Price: ${exact['price']}, Stock: {exact.get('total_stock', 0)} packs)\n"
-                    if 'search_type' in exact:
-                        context += f"Found via: {exact['search_type']}\n"
+                lines.append("\nSearch Results:\n")
+                if msg.search_results.exact_match:
+                    exact = msg.search_results.exact_match
+                    lines.append(f"Exact Match: {exact.name} (Price: ${exact.price}, Stock: {exact.total_stock} packs)\n")
+                    if exact.search_type:
+                        lines.append(f"Found via: {exact.search_type}\n")
                 
-                if msg.search_results['similar_products']:
-                    context += "Similar Products:\n"
-                    for product in msg.search_results['similar_products']:
-                        context += f"- {product['name']} (Price: ${product['price']}, Stock: {product.get('total_stock', 0)} packs)"
-                        if 'search_type' in product:
-                            context += f" (Found via: {product['search_type']})"
-                        context += "\n"
-                context += "\n"
-            
-        return context 
\ No newline at end of file
+                if msg.search_results.similar_products:
+                    lines.append("Similar Products:\n")
+                    for product in msg.search_results.similar_products:
+                        line = f"- {product.name} (Price: ${product.price}, Stock: {product.total_stock} packs)"
+                        if product.search_type:
+                            line += f" (Found via: {product.search_type})"
+                        lines.append(line + "\n")
+                lines.append("\n")
+        return "".join(lines)
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Dict, Optional, Union
+from .ai_service import AIService
+from .prompt_builder import PromptBuilder
+from .conversation_context import ConversationContext
+from .session_store import SessionStore
+from helpers.llm_scheduler import PRIORITY_BACKGROUND
+
+class ConversationSummarizer:
+    def __init__(self, ai_service: AIService, prompt_builder: PromptBuilder, min_messages: int = 4,
+                 session_store: Optional[SessionStore] = None):
+        """
+        Initialize the summarizer that folds old messages into a conversation's summary.
+        
+        Args:
+            ai_service (AIService): The AI service instance
+            prompt_builder (PromptBuilder): The prompt builder instance
+            min_messages (int): Messages that must be waiting before a summary is requested,
+                so the summary is updated every few turns instead of on every one
+            session_store (Optional[SessionStore]): Store that summaries of sessions are saved to,
+                since they are usually ready only after the turn saved its conversation
+        """
+        self.ai_service = ai_service
+        self.prompt_builder = prompt_builder
+        self.min_messages = min_messages
+        self.session_store = session_store
+        # Running summaries by session; also keeps the tasks referenced until they finish
+        self._tasks: Dict[Union[str, int], asyncio.Task] = {}
+        
+    def schedule(self, conversation_context: ConversationContext, session_id: Optional[str] = None) -> Optional[asyncio.Task]:
+        """
+        Start updating the conversation's summary in the background if enough messages left
+        the verbatim window. The turn does not wait for it; the summary is applied to the
+        conversation whenever it is ready, and saved to the session store for a session.
+        
+        Args:
+            conversation_context (ConversationContext): The conversation to summarize
+            session_id (Optional[str]): Session the conversation belongs to, if it is stored
+            
+        Returns:
+            Optional[asyncio.Task]: The running summary task, or None if none was started
+        """
+        # Each turn of a stored session loads a new context, so tasks are tracked by session
+        key = session_id if session_id is not None else id(conversation_context)
+        messages = conversation_context.messages_to_summarize()
+        if len(messages) < self.min_messages or key in self._tasks:
+            return None
+        
+        task = asyncio.create_task(self._summarize(conversation_context.summary, messages))
+        self._tasks[key] = task
+        
+        def apply(task: asyncio.Task):
+            self._tasks.pop(key, None)
+            if task.cancelled() or task.exception() is not None or not task.result():
+                return
+            summary = task.result()
+            # The turn's own context, in case the turn has not saved it yet
+            applied = conversation_context.apply_summary(summary, messages)
+            if session_id is not None and self.session_store is not None:
+                applied = self.session_store.apply_summary(session_id, summary, messages) or applied
+            if applied:
+                print(f"[ConversationSummarizer] Folded {len(messages)} messages into the summary")
+        
+        task.add_done_callback(apply)
+        return task
+        
+    async def _summarize(self, summary: Optional[str], messages) -> Optional[str]:
+        """Ask the model for the summary of the earlier summary followed by the messages."""
+        system_prompt = self.prompt_builder._load_prompt("conversation_summary_prompt.txt")
+        user_prompt = (
+            f"Current summary:\n{summary or '(none)'}\n\n"
+            f"Messages:\n{ConversationContext.format_messages(messages)}"
+        )
+        response = await self.ai_service.get_response(system_prompt, user_prompt, priority=PRIORITY_BACKGROUND,
+                                                      call_site="conversation_summary")
+        if response.get('error'):
+            print(f"[ConversationSummarizer] Keeping the previous summary: {response['error']}")
+            return None
+        return response.get('choices', [{}])[0].get('message', {}).get('content', '').strip() or None
@@ -1,14 +1,27 @@
+import hashlib
 import pandas as pd
 from chromadb.utils import embedding_functions
-from typing import Dict, List
+from typing import Dict, List, Optional
 from pathlib import Path
 from helpers.relevance_calculator import calculate_relevance_score
-from helpers.chroma_config import get_chroma_client
+from helpers.chroma_config import get_chroma_client, get_versioned_collection
+from helpers.semantic_cache import SemanticCache
 import os
 
+# Bumped whenever the layout of FAQ documents in the collection changes
+FAQ_INDEX_SCHEMA = "region-v2"
+
 class FAQService:
-    def __init__(self):
-        """Initialize the FAQ service with vector database."""
+    def __init__(self, cache_size: int = 1024, cache_ttl_seconds: float = 3600.0, semantic_cache_threshold: Optional[float] = 0.95):
+        """
+        Initialize the FAQ service with vector database.
+        
+        Args:
+            cache_size (int): Maximum number of cached FAQ lookups
+            cache_ttl_seconds (float): Lifetime of a cached FAQ lookup
+            semantic_cache_threshold (Optional[float]): Cosine similarity at which a differently
+                phrased query reuses a cached lookup (None disables semantic reuse)
+        """
         self.prompts_dir = Path("prompts")
         self.faq_file = self.prompts_dir / "LoncaFAQs.xlsx"
         
@@ -24,28 +37,33 @@ class FAQService:
             model_name="paraphrase-multilingual-MiniLM-L12-v2"
         )
         
-        # Create or get the collection
-        self.collection = self.client.get_or_create_collection(
+        # Get the collection, rebuilding it only when the document layout changed
+        self.collection, _ = get_versioned_collection(
             name="lonca_faqs",
+            index_version=FAQ_INDEX_SCHEMA,
             embedding_function=self.embedding_function,
             metadata={"hnsw:space": "cosine"}
         )
         
         # Cache for FAQ results
-        self._cache: Dict[str, List[Dict]] = {}
+        self.cache = SemanticCache(
+            maxsize=cache_size,
+            ttl_seconds=cache_ttl_seconds,
+            similarity_threshold=semantic_cache_threshold
+        )
         
-        # Load and process FAQs only if collection is empty
-        if not self._collection_has_data():
-            self._load_faqs()
+        # Reindex only the FAQs that changed since the spreadsheet was last loaded
+        self.sync_faqs()
         
-    def _collection_has_data(self) -> bool:
-        """Check if the collection already has data."""
-        try:
-            # Try to get one document from the collection
-            result = self.collection.get(limit=1)
-            return len(result['ids']) > 0
-        except Exception:
-            return False
+    def _faq_file_digest(self) -> str:
+        """Get a short content hash of the FAQ spreadsheet."""
+        with open(self.faq_file, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+        
+    def _load_regions(self) -> List[str]:
+        """Get the regions present in the collection."""
+        result = self.collection.get(include=["metadatas"])
+        return sorted({metadata['region'] for metadata in result['metadatas']})
         
     def has_relevant_faqs(self, query: str, region: str = None, min_relevance: float = 0.3) -> bool:
         """
@@ -62,51 +80,104 @@ class FAQService:
         faqs = self.get_relevant_faqs(query, region)
         return any(faq['relevance'] >= min_relevance for faq in faqs)
         
-    def _load_faqs(self):
-        """Load FAQs from Excel and add to vector database."""
+    def _read_faq_entries(self) -> Dict[str, Dict]:
+        """
+        Read the FAQ spreadsheet into one entry per question and region.
+        
+        Returns:
+            Dict[str, Dict]: Document id -> {"document", "metadata"}; ids are derived from the
+                question text, so reordering rows or editing answers keeps them stable
+        """
+        # Read Excel file
+        df = pd.read_excel(self.faq_file)
+        
+        # Get region columns (excluding 'Question' and unnamed columns)
+        region_cols = [col for col in df.columns if col not in ['Question'] and not col.startswith('Unnamed')]
+        
+        if not region_cols:
+            raise ValueError(f"No region columns found. Available columns: {df.columns.tolist()}")
+        
+        # One row per question and region with a non-empty answer; a question repeated in the sheet keeps its first answer
+        answers = df.melt(id_vars=['Question'], value_vars=region_cols, var_name='region', value_name='answer')
+        answers = answers.dropna(subset=['Question', 'answer'])
+        answers['question'] = answers['Question'].astype(str).str.strip()
+        answers['answer'] = answers['answer'].astype(str).str.strip()
+        answers = answers[(answers['question'] != '') & (answers['answer'] != '') & (answers['answer'].str.lower() != 'nan')]
+        answers['question_id'] = answers['question'].map(
+            lambda question: "q" + hashlib.sha1(question.casefold().encode('utf-8')).hexdigest()[:12]
+        )
+        answers = answers.drop_duplicates(subset=['question_id', 'region'], keep='first')
+        
+        entries = {}
+        for question_id, question, answer, region in answers[['question_id', 'question', 'answer', 'region']].itertuples(index=False):
+            document = f"Q: {question}\nA: {answer}"
+            entries[f"{question_id}_r{region}"] = {
+                "document": document,
+                "metadata": {
+                    "question_id": question_id,
+                    "question": question,
+                    "answer": answer,
+                    "region": region,
+                    "content_hash": hashlib.sha1(document.encode('utf-8')).hexdigest()[:16]
+                }
+            }
+        return entries
+        
+    def sync_faqs(self, force: bool = False) -> Dict[str, int]:
+        """
+        Bring the vector database in line with the FAQ spreadsheet.
+        
+        Nothing is read or embedded when the spreadsheet's content hash matches the one stored
+        with the collection. Otherwise new and edited answers are embedded in one batch and
+        upserted, and answers removed from the sheet are deleted.
+        
+        Args:
+            force (bool): Re-embed every answer, even unchanged ones
+            
+        Returns:
+            Dict[str, int]: Number of upserted, deleted and unchanged answers
+        """
         try:
-            # Read Excel file
-            df = pd.read_excel(self.faq_file)
+            file_digest = self._faq_file_digest()
+            collection_metadata = self.collection.metadata or {}
+            if not force and collection_metadata.get('faq_file_digest') == file_digest:
+                self.regions = self._load_regions()
+                return {'upserted': 0, 'deleted': 0, 'unchanged': self.collection.count()}
             
-            # Get region columns (excluding 'Question' and unnamed columns)
-            region_cols = [col for col in df.columns if col not in ['Question'] and not col.startswith('Unnamed')]
+            entries = self._read_faq_entries()
+            existing = self.collection.get(include=["metadatas"])
+            existing_hashes = {
+                doc_id: metadata.get('content_hash')
+                for doc_id, metadata in zip(existing['ids'], existing['metadatas'])
+            }
+            changed = [
+                doc_id for doc_id, entry in entries.items()
+                if force or existing_hashes.get(doc_id) != entry['metadata']['content_hash']
+            ]
+            removed = [doc_id for doc_id in existing_hashes if doc_id not in entries]
             
-            if not region_cols:
-                raise ValueError(f"No region columns found. Available columns: {df.columns.tolist()}")
+            # Embed all changed answers in one call and write them in bulk
+            if changed:
+                documents = [entries[doc_id]['document'] for doc_id in changed]
+                self.collection.upsert(
+                    ids=changed,
+                    embeddings=self.embedding_function(documents),
+                    documents=documents,
+                    metadatas=[entries[doc_id]['metadata'] for doc_id in changed]
+                )
+            if removed:
+                self.collection.delete(ids=removed)
+            self.collection.modify(metadata={**collection_metadata, 'faq_file_digest': file_digest})
             
-            # Process each row and region
-            for idx, row in df.iterrows():
-                question = str(row['Question']).strip()
-                
-                # Process each region's answer
-                for region in region_cols:
-                    answer = str(row[region]).strip()
-                    
-                    if pd.notna(question) and pd.notna(answer) and question and answer and answer.lower() != 'nan':
-                        # Create a unique ID for each FAQ
-                        doc_id = f"q{idx}_r{region}"
-                        
-                        # Check if this FAQ already exists
-                        try:
-                            existing = self.collection.get(ids=[doc_id])
-                            if len(existing['ids']) > 0:
-                                continue
-                        except Exception:
-                            pass
-                        
-                        # Add to vector database
-                        self.collection.add(
-                            documents=[f"Q: {question}\nA: {answer}"],
-                            metadatas=[{
-                                "question": question,
-                                "answer": answer,
-                                "region": region
-                            }],
-                            ids=[doc_id]
-                        )
-                        
         except Exception as e:
             raise Exception(f"Error loading FAQs: {e}")
+        
+        # Cached lookups may hold answers that just changed
+        self.cache.clear()
+        self.regions = self._load_regions()
+        stats = {'upserted': len(changed), 'deleted': len(removed), 'unchanged': len(entries) - len(changed)}
+        print(f"[FAQService] Synced FAQs: {stats}")
+        return stats
             
     def get_relevant_faqs(self, query: str, region: str = None, n_results: int = 3) -> List[Dict]:
         """
@@ -120,44 +191,48 @@ class FAQService:
         Returns:
             List[Dict]: List of relevant FAQs with their answers
         """
+        # Regions come from the client; a where clause no answer matches fails in Chroma
+        if region and region not in self.regions:
+            print(f"[FAQService] Unknown region {region!r}, no FAQs returned")
+            return []
+        
         try:
-            # Create cache key
-            cache_key = f"{query}_{region}_{n_results}"
+            # Check the cache for the normalized query first, then for a semantically equivalent one
+            scope = (region, n_results)
+            cached = self.cache.get(query, scope)
+            if cached is not None:
+                return cached
+            embedding = self.embedding_function([query])[0]
+            cached = self.cache.get_similar(embedding, scope)
+            if cached is not None:
+                return cached
             
-            # Check cache first
-            if cache_key in self._cache:
-                return self._cache[cache_key]
-            
-            # Search without region filter first to get all results
+            # Score only the requested region's answers; without a region every question has one
+            # answer per region, so this many hits always contain n_results distinct questions
+            where = {"region": region} if region else None
             results = self.collection.query(
-                query_texts=[query],
-                n_results=50
+                query_embeddings=[embedding],
+                n_results=n_results if region else n_results * max(len(self.regions), 1),
+                where=where
             )
             
-            # Format and filter results
+            # Format results, keeping the best answer per question
             faqs = []
             seen_questions = set()
             
             for i in range(len(results['ids'][0])):
-                question = results['metadatas'][0][i]['question']
-                result_region = results['metadatas'][0][i]['region']
-                
-                # Skip if we've already seen this question
-                if question in seen_questions:
+                metadata = results['metadatas'][0][i]
+                if metadata['question_id'] in seen_questions:
                     continue
                     
-                # Skip if region doesn't match (when region filter is applied)
-                if region and result_region != region:
-                    continue
-                    
-                seen_questions.add(question)
+                seen_questions.add(metadata['question_id'])
                 distance = results['distances'][0][i]
                 relevance = calculate_relevance_score(distance)
                 
                 faqs.append({
-                    "question": question,
-                    "answer": results['metadatas'][0][i]['answer'],
-                    "region": result_region,
+                    "question": metadata['question'],
+                    "answer": metadata['answer'],
+                    "region": metadata['region'],
                     "distance": distance,
                     "relevance": relevance
                 })
@@ -169,13 +244,17 @@ class FAQService:
             faqs = faqs[:n_results]
             
             # Cache the results
-            self._cache[cache_key] = faqs
+            self.cache.put(query, faqs, scope, embedding=embedding)
             
             return faqs
             
         except Exception as e:
             raise Exception(f"Error getting relevant FAQs: {e}")
             
+    def cache_stats(self) -> Dict[str, float]:
+        """Get hit-rate, size and eviction counters of the FAQ lookup cache."""
+        return self.cache.stats()
+            
     def format_faqs_for_prompt(self, faqs: List[Dict]) -> str:
         """
         Format FAQs for inclusion in the prompt.
@@ -0,0 +1,65 @@
+import time
+from typing import Dict, Optional
+from .conversation_context import ConversationContext
+from .retrieval_context import RetrievalContext
+
+class FAQShortcutService:
+    def __init__(self, min_relevance: float, answer_template: str = "{answer}"):
+        """
+        Initialize the FAQ answer shortcut.
+
+        Args:
+            min_relevance (float): Relevance the top FAQ must reach to be answered directly; the
+                reply skips every other check, so this should be set from a measured precision
+            answer_template (str): Template for the reply; may use {answer}, {question} and {region}
+        """
+        self.min_relevance = min_relevance
+        self.answer_template = answer_template
+        self.turns = 0
+        self.served = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def try_answer(self, retrieval: RetrievalContext, conversation_context: ConversationContext, has_image: bool = False) -> Optional[str]:
+        """
+        Answer with the stored regional FAQ answer when the match is unambiguous.
+
+        The shortcut applies only when the region is known, no image was sent, the
+        conversation has no open product context, and the top FAQ is relevant enough.
+
+        Args:
+            retrieval (RetrievalContext): FAQ retrieval for this turn
+            conversation_context (ConversationContext): The current conversation context
+            has_image (bool): Whether the user sent an image this turn
+
+        Returns:
+            Optional[str]: The reply, or None when the turn needs the full pipeline
+        """
+        start = time.perf_counter()
+        self.turns += 1
+
+        open_product_context = bool(conversation_context.last_search_results and conversation_context.last_search_results.exact_match)
+        if not retrieval.region or has_image or open_product_context:
+            return None
+
+        top_faq = retrieval.top_faq
+        if top_faq is None or top_faq['relevance'] < self.min_relevance:
+            return None
+
+        reply = self.answer_template.format(answer=top_faq['answer'], question=top_faq['question'], region=top_faq['region'])
+        latency = time.perf_counter() - start
+        self.served += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        print(f"[FAQShortcutService] Answered from FAQ '{top_faq['question']}' (relevance {top_faq['relevance']}) in {latency * 1000:.1f} ms")
+        return reply
+
+    def stats(self) -> Dict[str, float]:
+        """Get the fraction of turns served by the shortcut and its latency."""
+        return {
+            'turns': self.turns,
+            'served': self.served,
+            'served_fraction': round(self.served / self.turns, 4) if self.turns else 0.0,
+            'avg_latency_ms': round(self.total_latency / self.served * 1000, 2) if self.served else 0.0,
+            'max_latency_ms': round(self.max_latency * 1000, 2),
+        }
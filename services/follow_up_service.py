@@ -2,18 +2,21 @@ from typing import Optional, Tuple, Dict
 from .conversation_context import ConversationContext
 from .ai_service import AIService
 from .prompt_builder import PromptBuilder
+from models.message import ProductRef
 
 class FollowUpService:
-    def __init__(self, ai_service: AIService, prompt_builder: PromptBuilder):
+    def __init__(self, ai_service: AIService, prompt_builder: PromptBuilder, classifier_model: Optional[str] = None):
         """
         Initialize the follow-up service.
         
         Args:
             ai_service: The AI service instance
             prompt_builder: The prompt builder instance
+            classifier_model (Optional[str]): Model for the follow-up classifier (defaults to the AI service's model)
         """
         self.ai_service = ai_service
         self.prompt_builder = prompt_builder
+        self.classifier_model = classifier_model
         
     async def check_follow_up(self, query: str, conversation_context: ConversationContext) -> Optional[Tuple[bool, str, Optional[dict]]]:
         """
@@ -29,39 +32,36 @@ class FollowUpService:
                 - str: Response message (empty string for valid queries)
                 - dict: Search results if applicable
         """
-        if not conversation_context.last_search_results or not conversation_context.last_search_results['exact_match']:
+        last_search_results = conversation_context.last_search_results
+        if not last_search_results or not last_search_results.exact_match:
             return None
 
-        is_follow_up = await self._is_follow_up_about_product(
-            query, 
-            conversation_context.last_search_results['exact_match']
-        )
+        is_follow_up = await self._is_follow_up_about_product(query, last_search_results.exact_match)
         
         if is_follow_up:
             print("\n[FollowUpService] Handling follow-up question about existing product")
-            return True, "", conversation_context.last_search_results
+            return True, "", last_search_results.to_dict()
             
         return None
 
-    async def _is_follow_up_about_product(self, query: str, product: dict) -> bool:
+    async def _is_follow_up_about_product(self, query: str, product: ProductRef) -> bool:
         """
         Determine if the query is a follow-up question about an existing product.
         
         Args:
             query (str): The user's query
-            product (dict): The product information
+            product (ProductRef): The product discussed last
             
         Returns:
             bool: True if query is about the existing product
         """
         system_prompt = self.prompt_builder._load_prompt("follow_up_classifier_prompt.txt").format(
-            product_name=product['name'],
-            product_id=product['product_id'],
+            product_name=product.name,
+            product_id=product.product_id,
             query=query
         )
         user_prompt = f"Query: {query}"
         
-        response = await self.ai_service.get_response(system_prompt, user_prompt)
-        classification = response.get('choices', [{}])[0].get('message', {}).get('content', '').strip().lower()
-        
+        classification = await self.ai_service.classify(system_prompt, user_prompt, model=self.classifier_model,
+                                                        cache=True, call_site="follow_up_classification")
         return classification == 'yes' 
\ No newline at end of file
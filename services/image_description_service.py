@@ -19,6 +19,6 @@ class ImageDescriptionService:
         # Use a detailed prompt for image description
         system_prompt = self.prompt_builder._load_prompt("image_description_prompt.txt")
         user_prompt = "Describe the product in the image."
-        response = await self.ai_service.get_response(system_prompt, user_prompt, image_data)
+        response = await self.ai_service.get_response(system_prompt, user_prompt, image_data, call_site="image_description")
         image_description = response.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
         return image_description 
\ No newline at end of file
@@ -0,0 +1,86 @@
+from PIL import Image
+import torch
+from torchvision import transforms
+from torchvision.models import resnet50, ResNet50_Weights
+from typing import List
+
+class ImageEncoder:
+    def __init__(self):
+        """Initialize the image encoder with a pre-trained ResNet model."""
+        # Load pre-trained ResNet model
+        self.model = resnet50(weights=ResNet50_Weights.DEFAULT)
+        self.model.eval()  # Set to evaluation mode
+        self.model_name = "resnet50-imagenet"
+
+        # Define image transformations
+        self.transform = transforms.Compose([
+            transforms.Resize(256),
+            transforms.CenterCrop(224),
+            transforms.ToTensor(),
+            transforms.Normalize(
+                mean=[0.485, 0.456, 0.406],
+                std=[0.229, 0.224, 0.225]
+            )
+        ])
+
+    def preprocess_image(self, image: Image.Image) -> Image.Image:
+        """
+        Preprocess image to ensure it's in the correct format.
+
+        Args:
+            image (PIL.Image): Input image
+
+        Returns:
+            PIL.Image: Preprocessed image
+        """
+        # Convert to RGB if not already
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        # Remove alpha channel if present
+        if image.mode == 'RGBA':
+            # Create a white background
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            # Paste the image on the background
+            background.paste(image, mask=image.split()[3])  # 3 is the alpha channel
+            image = background
+
+        return image
+
+    def to_tensor(self, image: Image.Image) -> torch.Tensor:
+        """
+        Preprocess an image and apply the model transforms.
+
+        Args:
+            image (PIL.Image): Input image
+
+        Returns:
+            torch.Tensor: Normalized image tensor of shape (3, 224, 224)
+        """
+        return self.transform(self.preprocess_image(image))
+
+    def extract_features(self, image: Image.Image) -> torch.Tensor:
+        """
+        Extract features from a single image.
+
+        Args:
+            image (PIL.Image): Input image
+
+        Returns:
+            torch.Tensor: Feature vector
+        """
+        return self.extract_features_batch([self.to_tensor(image)])[0]
+
+    def extract_features_batch(self, image_tensors: List[torch.Tensor]) -> torch.Tensor:
+        """
+        Extract features for a batch of already transformed images in one forward pass.
+
+        Args:
+            image_tensors (List[torch.Tensor]): Tensors produced by to_tensor
+
+        Returns:
+            torch.Tensor: Feature matrix of shape (batch, features)
+        """
+        with torch.no_grad():
+            features = self.model(torch.stack(image_tensors))
+        return features
@@ -0,0 +1,318 @@
+import json
+import time
+import asyncio
+import hashlib
+from io import BytesIO
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import aiohttp
+from PIL import Image
+from tqdm import tqdm
+from helpers.image_cache import ImageCache
+from helpers.product_attributes import PRODUCT_METADATA_SCHEMA, extract_attributes
+from helpers.index_store import (
+    DEFAULT_INDEX_ROOT,
+    IMAGE_INDEX_ARTIFACT,
+    TEXT_INDEX_ARTIFACT,
+    create_staging_dir,
+    write_artifact,
+    publish_index_version,
+)
+from .image_encoder import ImageEncoder
+from .text_encoder import get_text_encoder
+
+# Marks the end of a stage's input
+_DONE = object()
+
+async def _run_stages(tasks: List[asyncio.Task]):
+    """
+    Wait for all stages of a pipeline to finish.
+
+    A stage that fails would leave the stages around it blocked on their queues, so
+    the first error cancels every other stage and is raised.
+
+    Args:
+        tasks (List[asyncio.Task]): The running stages
+    """
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        # Also reached when the build itself is cancelled; finished stages ignore cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+
+def get_product_id(product: Dict) -> str:
+    """Get the string id of a catalog product."""
+    return product['id']['$oid'] if isinstance(product['id'], dict) else str(product['id'])
+
+def get_product_text(product: Dict) -> str:
+    """Get the text that is embedded for a catalog product."""
+    return f"{product['name']} {product.get('description', '')} {product.get('category', '')}"
+
+def get_product_image_urls(product: Dict) -> List[str]:
+    """Get all image URLs of a catalog product, supporting single- and multi-image catalogs."""
+    image_paths = product.get('image_paths')
+    if image_paths and isinstance(image_paths, list):
+        return image_paths
+    return [product['image_path']] if product.get('image_path') else []
+
+class PipelineStats:
+    def __init__(self):
+        """Initialize counters for each pipeline stage."""
+        self.started_at = time.monotonic()
+        self.downloaded = 0
+        self.downloaded_bytes = 0
+        self.decoded = 0
+        self.encoded = 0
+        self.failed = 0
+
+    def summary(self) -> Dict:
+        """Get stage counters and throughput since the build started."""
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            'downloaded': self.downloaded,
+            'downloaded_mb': round(self.downloaded_bytes / 1_000_000, 2),
+            'decoded': self.decoded,
+            'encoded': self.encoded,
+            'failed': self.failed,
+            'elapsed_seconds': round(elapsed, 2),
+            'images_per_second': round(self.encoded / elapsed, 2),
+        }
+
+class IndexBuilder:
+    def __init__(self,
+                 catalog_path: str = "data/product_catalog_multi_image.json",
+                 index_root: str = DEFAULT_INDEX_ROOT,
+                 image_encoder: Optional[ImageEncoder] = None,
+                 text_embedding_function: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 image_cache: Optional[ImageCache] = None,
+                 download_workers: int = 16,
+                 decode_workers: int = 4,
+                 encode_batch_size: int = 32,
+                 text_batch_size: int = 256,
+                 queue_size: int = 256,
+                 keep_versions: int = 3):
+        """
+        Initialize the offline embedding build pipeline.
+
+        Images flow through download -> decode -> batched encode -> write stages
+        connected by bounded queues, so slow downloads never starve the encoder and
+        a slow encoder applies backpressure to the downloaders.
+
+        Args:
+            catalog_path (str): Path to the product catalog JSON
+            index_root (str): Directory where index versions are published
+            image_encoder (ImageEncoder, optional): Encoder used for product images
+            text_embedding_function (Callable, optional): Embedding function used for product text
+            image_cache (ImageCache, optional): On-disk cache for downloaded images
+            download_workers (int): Number of concurrent image downloads
+            decode_workers (int): Number of threads decoding and transforming images
+            encode_batch_size (int): Number of images per model forward pass
+            text_batch_size (int): Number of product texts embedded per call
+            queue_size (int): Capacity of each inter-stage queue
+            keep_versions (int): Number of published index versions to keep
+        """
+        self.catalog_path = catalog_path
+        self.index_root = index_root
+        self.image_encoder = image_encoder or ImageEncoder()
+        self.text_embedding_function = text_embedding_function or get_text_encoder()
+        self.image_cache = image_cache or ImageCache()
+        self.download_workers = download_workers
+        self.decode_workers = decode_workers
+        self.encode_batch_size = encode_batch_size
+        self.text_batch_size = text_batch_size
+        self.queue_size = queue_size
+        self.keep_versions = keep_versions
+
+    def build(self) -> str:
+        """
+        Build and publish a new index version.
+
+        Returns:
+            str: The published version
+        """
+        return asyncio.run(self.build_async())
+
+    async def build_async(self) -> str:
+        """
+        Build and publish a new index version from within a running event loop.
+
+        Returns:
+            str: The published version
+        """
+        with open(self.catalog_path, 'rb') as f:
+            catalog_bytes = f.read()
+        products = json.loads(catalog_bytes)['products']
+        version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        stats = PipelineStats()
+
+        print(f"[IndexBuilder] Building index version {version} for {len(products)} products")
+        with ThreadPoolExecutor(max_workers=self.decode_workers) as executor:
+            image_index = await self._build_image_index(products, executor, stats)
+            self.image_cache.flush()
+            text_index = await asyncio.get_running_loop().run_in_executor(
+                executor, self._build_text_index, products
+            )
+
+        staging_dir = create_staging_dir(version, self.index_root)
+        write_artifact(staging_dir, IMAGE_INDEX_ARTIFACT, image_index)
+        write_artifact(staging_dir, TEXT_INDEX_ARTIFACT, text_index)
+        manifest = {
+            'version': version,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'catalog_path': str(self.catalog_path),
+            'catalog_sha256': hashlib.sha256(catalog_bytes).hexdigest(),
+            'products': len(products),
+            'image_embeddings': len(image_index[1]),
+            'text_embeddings': len(text_index['ids']),
+            'image_model': self.image_encoder.model_name,
+            'text_model': getattr(self.text_embedding_function, 'model_name', type(self.text_embedding_function).__name__),
+            'metadata_schema': PRODUCT_METADATA_SCHEMA,
+            'stats': stats.summary(),
+            'image_cache': dict(self.image_cache.stats),
+        }
+        publish_index_version(staging_dir, version, manifest, self.index_root, self.keep_versions)
+        print(f"[IndexBuilder] Published index version {version}: {manifest['stats']}")
+        return version
+
+    async def _build_image_index(self, products: List[Dict], executor: ThreadPoolExecutor, stats: PipelineStats) -> Tuple[Dict[str, Dict], Dict]:
+        """Run the download -> decode -> encode -> write pipeline over all product images."""
+        download_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        decode_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        encode_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        jobs = []
+        for product in products:
+            product_id = get_product_id(product)
+            for idx, image_url in enumerate(get_product_image_urls(product)):
+                jobs.append((f"{product_id}_{idx}", product_id, product, image_url))
+
+        all_products: Dict[str, Dict] = {}
+        all_embeddings: Dict = {}
+        progress = tqdm(total=len(jobs), desc="Encoding images")
+
+        async def produce():
+            for job in jobs:
+                await download_queue.put(job)
+            for _ in range(self.download_workers):
+                await download_queue.put(_DONE)
+
+        async def download(session: aiohttp.ClientSession):
+            while (job := await download_queue.get()) is not _DONE:
+                try:
+                    data = await self.image_cache.fetch(session, job[3])
+                except Exception as e:
+                    print(f"[IndexBuilder] Error downloading {job[3]}: {e}")
+                    data = None
+                if data is None:
+                    stats.failed += 1
+                    progress.update(1)
+                    continue
+                stats.downloaded += 1
+                stats.downloaded_bytes += len(data)
+                await decode_queue.put((job, data))
+
+        async def decode():
+            loop = asyncio.get_running_loop()
+            while (item := await decode_queue.get()) is not _DONE:
+                job, data = item
+                try:
+                    tensor = await loop.run_in_executor(executor, self._decode_image, data)
+                except Exception as e:
+                    print(f"[IndexBuilder] Error decoding {job[3]}: {e}")
+                    stats.failed += 1
+                    progress.update(1)
+                    continue
+                stats.decoded += 1
+                await encode_queue.put((job, tensor))
+
+        async def encode():
+            loop = asyncio.get_running_loop()
+            batch = []
+            while True:
+                item = await encode_queue.get()
+                if item is not _DONE:
+                    batch.append(item)
+                if batch and (len(batch) >= self.encode_batch_size or item is _DONE):
+                    features = await loop.run_in_executor(
+                        executor,
+                        self.image_encoder.extract_features_batch,
+                        [tensor for _, tensor in batch]
+                    )
+                    await write_queue.put(([job for job, _ in batch], features))
+                    stats.encoded += len(batch)
+                    progress.update(len(batch))
+                    progress.set_postfix(**{k: v for k, v in stats.summary().items() if k in ('failed', 'images_per_second')})
+                    batch = []
+                if item is _DONE:
+                    await write_queue.put(_DONE)
+                    return
+
+        async def write():
+            while (item := await write_queue.get()) is not _DONE:
+                batch_jobs, features = item
+                for (embedding_id, product_id, product, image_url), feature in zip(batch_jobs, features):
+                    all_products[embedding_id] = {
+                        'product_id': product_id,
+                        'name': product['name'],
+                        'price': product['price'],
+                        'image_url': image_url
+                    }
+                    all_embeddings[embedding_id] = feature.numpy()
+
+        async with aiohttp.ClientSession() as session:
+            writer = asyncio.create_task(write())
+            encoder = asyncio.create_task(encode())
+            decoders = [asyncio.create_task(decode()) for _ in range(self.decode_workers)]
+            downloaders = [asyncio.create_task(download(session)) for _ in range(self.download_workers)]
+
+            async def coordinate():
+                await produce()
+                await asyncio.gather(*downloaders)
+                for _ in decoders:
+                    await decode_queue.put(_DONE)
+                await asyncio.gather(*decoders)
+                await encode_queue.put(_DONE)
+
+            try:
+                await _run_stages([asyncio.create_task(coordinate()), *downloaders, *decoders, encoder, writer])
+            finally:
+                progress.close()
+
+        return all_products, all_embeddings
+
+    def _decode_image(self, data: bytes):
+        """Decode image bytes and apply the encoder transforms."""
+        return self.image_encoder.to_tensor(Image.open(BytesIO(data)))
+
+    def _build_text_index(self, products: List[Dict]) -> Dict:
+        """Embed all product texts in batches and collect their collection records."""
+        ids = []
+        documents = []
+        metadatas = []
+        for product in products:
+            image_urls = get_product_image_urls(product)
+            ids.append(get_product_id(product))
+            documents.append(get_product_text(product))
+            metadatas.append({
+                'name': product['name'],
+                'image_path': image_urls[0] if image_urls else None,
+                **extract_attributes(product)
+            })
+
+        embeddings = []
+        for i in tqdm(range(0, len(documents), self.text_batch_size), desc="Encoding product text"):
+            embeddings.extend(self.text_embedding_function(documents[i:i + self.text_batch_size]))
+
+        return {
+            'ids': ids,
+            'embeddings': [list(map(float, e)) for e in embeddings],
+            'documents': documents,
+            'metadatas': metadatas
+        }
@@ -0,0 +1,162 @@
+import os
+import json
+import asyncio
+import time
+import pickle
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from .text_encoder import TextEncoder, get_text_encoder
+
+DEFAULT_MODEL_DIR = os.path.join(Path(__file__).parent.parent, "data", "models")
+DEFAULT_DECISION_LOG = os.path.join(Path(__file__).parent.parent, "data", "logs", "intent_decisions.jsonl")
+
+def get_model_path(task: str, model_dir: str = DEFAULT_MODEL_DIR) -> str:
+    """Get the file a task's trained classifier is stored in."""
+    return os.path.join(model_dir, f"intent_{task}.pkl")
+
+class IntentClassifier:
+    def __init__(self,
+                 task: str,
+                 text_encoder: Optional[TextEncoder] = None,
+                 model_path: Optional[str] = None,
+                 decision_log: str = DEFAULT_DECISION_LOG,
+                 confidence_threshold: float = 0.9,
+                 shadow: Optional[bool] = None,
+                 max_log_bytes: int = 50_000_000):
+        """
+        Initialize a local yes/no intent classifier that answers obvious cases before the LLM.
+
+        The classifier is logistic regression over sentence embeddings, trained by
+        scripts/train_intent_classifier.py from logged LLM decisions. Without a trained
+        model it only logs decisions.
+
+        Args:
+            task (str): Decision name, e.g. "product_query" or "lonca_query"
+            text_encoder (Optional[TextEncoder]): Encoder for query embeddings; defaults to the shared one
+            model_path (Optional[str]): Trained model file; defaults to data/models/intent_<task>.pkl
+            decision_log (str): JSONL file LLM decisions are appended to as training data
+            confidence_threshold (float): Probability the local prediction needs to skip the LLM
+            shadow (Optional[bool]): Predict and log but always ask the LLM; defaults to the
+                INTENT_CLASSIFIER_SHADOW env variable
+            max_log_bytes (int): Size at which the decision log is rotated to <decision_log>.1,
+                replacing the previous rotation
+        """
+        self.task = task
+        self.decision_log = decision_log
+        self.max_log_bytes = max_log_bytes
+        self.confidence_threshold = confidence_threshold
+        if shadow is None:
+            shadow = os.getenv("INTENT_CLASSIFIER_SHADOW", "").lower() in ("1", "true", "yes")
+        self.shadow = shadow
+        self._text_encoder = text_encoder
+        self.text_model = None
+        self.model = self._load_model(model_path or get_model_path(task))
+
+        self.stats = {
+            'local_decisions': 0,
+            'llm_decisions': 0,
+            'shadow_agreements': 0,
+            'shadow_disagreements': 0,
+        }
+
+    @property
+    def text_encoder(self) -> TextEncoder:
+        """Get the encoder the model was trained with, loading the shared one on first use."""
+        if self._text_encoder is None:
+            self._text_encoder = get_text_encoder(self.text_model)
+        return self._text_encoder
+
+    def _load_model(self, model_path: str):
+        """Load a trained model if one exists for this task and encoder."""
+        if not os.path.exists(model_path):
+            print(f"[IntentClassifier] No trained model for '{self.task}', every decision goes to the LLM")
+            return None
+        with open(model_path, 'rb') as f:
+            artifact = pickle.load(f)
+        if self._text_encoder is not None and artifact['text_model'] != self._text_encoder.model_name:
+            print(f"[IntentClassifier] Ignoring '{self.task}' model trained on {artifact['text_model']}, expected {self._text_encoder.model_name}")
+            return None
+        self.text_model = artifact['text_model']
+        print(f"[IntentClassifier] Loaded '{self.task}' model trained on {artifact['n_samples']} decisions")
+        return artifact['model']
+
+    def predict(self, text: str) -> Optional[Tuple[bool, float]]:
+        """
+        Predict the decision for a text.
+
+        Args:
+            text (str): Classifier input
+
+        Returns:
+            Optional[Tuple[bool, float]]: (decision, confidence), or None without a trained model
+        """
+        if self.model is None:
+            return None
+        probability = float(self.model.predict_proba([self.text_encoder.encode_query(text)])[0][1])
+        return probability >= 0.5, max(probability, 1 - probability)
+
+    async def decide(self, text: str, follow_up: bool = False) -> Tuple[Optional[bool], Optional[Tuple[bool, float]]]:
+        """
+        Decide locally when the prediction is confident enough.
+
+        The query is embedded in the default executor, so the event loop keeps serving
+        other sessions meanwhile.
+
+        Args:
+            text (str): Classifier input
+            follow_up (bool): The text continues a conversation. The model only sees the text, so a
+                follow-up like "and in blue?" can look like a "no"; only "yes" is then decided locally.
+
+        Returns:
+            Tuple[Optional[bool], Optional[Tuple[bool, float]]]: The local decision (None when the LLM
+                must decide) and the raw prediction to pass on to record_llm_decision
+        """
+        if self.model is None:
+            return None, None
+        prediction = await asyncio.get_running_loop().run_in_executor(None, self.predict, text)
+        if (prediction is not None and not self.shadow and prediction[1] >= self.confidence_threshold
+                and (prediction[0] or not follow_up)):
+            self.stats['local_decisions'] += 1
+            return prediction[0], prediction
+        return None, prediction
+
+    def record_llm_decision(self, text: str, decision: bool, prediction: Optional[Tuple[bool, float]] = None):
+        """
+        Log a decision made by the LLM as training data, comparing it with the local prediction.
+
+        Args:
+            text (str): Classifier input
+            decision (bool): The LLM's decision
+            prediction (Optional[Tuple[bool, float]]): The local prediction made for the same text
+        """
+        self.stats['llm_decisions'] += 1
+        
+        # In shadow mode, compare the LLM with the predictions that would have skipped it
+        if prediction is not None and self.shadow and prediction[1] >= self.confidence_threshold:
+            key = 'shadow_agreements' if prediction[0] == decision else 'shadow_disagreements'
+            self.stats[key] += 1
+
+        record = {
+            'task': self.task,
+            'text': text,
+            'label': int(decision),
+            'local_label': int(prediction[0]) if prediction else None,
+            'local_confidence': round(prediction[1], 4) if prediction else None,
+            'timestamp': time.time(),
+        }
+        try:
+            os.makedirs(os.path.dirname(self.decision_log), exist_ok=True)
+            if os.path.exists(self.decision_log) and os.path.getsize(self.decision_log) >= self.max_log_bytes:
+                os.replace(self.decision_log, f"{self.decision_log}.1")
+            with open(self.decision_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"[IntentClassifier] Could not log decision: {e}")
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get local/LLM decision counts and how often confident shadow predictions matched the LLM."""
+        compared = self.stats['shadow_agreements'] + self.stats['shadow_disagreements']
+        return {
+            **self.stats,
+            'shadow_agreement_rate': round(self.stats['shadow_agreements'] / compared, 4) if compared else 0.0,
+        }
@@ -3,9 +3,10 @@ from .ai_service import AIService
 from .prompt_builder import PromptBuilder
 from .response_builder import ResponseBuilder
 from .conversation_context import ConversationContext
+from .retrieval_context import RetrievalContext
 
 class LoncaQueryService:
-    def __init__(self, ai_service: AIService, prompt_builder: PromptBuilder, response_builder: ResponseBuilder):
+    def __init__(self, ai_service: AIService, prompt_builder: PromptBuilder, response_builder: ResponseBuilder, templated_escalation: bool = False):
         """
         Initialize the Lonca query service.
         
@@ -13,12 +14,15 @@ class LoncaQueryService:
             ai_service: The AI service instance
             prompt_builder: The prompt builder instance
             response_builder: The response builder instance
+            templated_escalation (bool): Escalate with the fixed reply instead of generating one
         """
         self.ai_service = ai_service
         self.prompt_builder = prompt_builder
         self.response_builder = response_builder
+        self.templated_escalation = templated_escalation
         
-    async def handle_query(self, query: str, region: Optional[str], conversation_context: ConversationContext, image_description: Optional[str] = None) -> Tuple[Dict, ConversationContext]:
+    async def handle_query(self, query: str, region: Optional[str], conversation_context: ConversationContext, image_description: Optional[str] = None,
+                           retrieval: Optional[RetrievalContext] = None) -> Tuple[Dict, ConversationContext]:
         """
         Handle a Lonca-related query.
         
@@ -27,11 +31,33 @@ class LoncaQueryService:
             region (Optional[str]): The user's region
             conversation_context (ConversationContext): The current conversation context
             image_description (Optional[str]): Description of the image, if available
+            retrieval (Optional[RetrievalContext]): FAQ retrieval already made for this turn
             
         Returns:
             Tuple[Dict, ConversationContext]: The AI's response and updated conversation context
         """
         print(f"[LoncaQueryService] handle_query called with region: {region}")
+        retrieval = retrieval or self.prompt_builder.create_retrieval_context(query, region)
+        
+        # If no relevant FAQs found, escalate to human agent without generating an answer
+        if not retrieval.has_relevant_faqs:
+            print("[LoncaQueryService] No relevant FAQs found, escalating to human agent")
+            escalation_response = await self.response_builder.get_escalation_response(
+                query,
+                conversation_context,
+                use_template=self.templated_escalation
+            )
+            response = {
+                "choices": [{
+                    "message": {
+                        "content": escalation_response
+                    }
+                }]
+            }
+            # Add escalation response to conversation context
+            conversation_context.add_message('assistant', escalation_response)
+            return response, conversation_context
+        
         # Get conversation context
         conversation_context_text = conversation_context.get_conversation_context()
             
@@ -39,29 +65,16 @@ class LoncaQueryService:
         system_prompt, user_prompt = self.prompt_builder.build_prompt(
             user_message=query, 
             region=region,
-            conversation_context=conversation_context_text
+            conversation_context=conversation_context_text,
+            retrieval=retrieval
         )
         if image_description:
             user_prompt += f"\nImage Description: {image_description}"
         
         # Get AI response
-        response = await self.ai_service.get_response(system_prompt, user_prompt)
+        response = await self.ai_service.get_response(system_prompt, user_prompt, call_site="lonca_query")
         
         # Add assistant's response to conversation context
         conversation_context.add_message('assistant', response['choices'][0]['message']['content'])
         
-        # If no relevant FAQs found, escalate to human agent
-        if not self.prompt_builder.faq_service.has_relevant_faqs(query, region):
-            print("[LoncaQueryService] No relevant FAQs found, escalating to human agent")
-            escalation_response = await self.response_builder.get_escalation_response(query, conversation_context)
-            response = {
-                "choices": [{
-                    "message": {
-                        "content": escalation_response
-                    }
-                }]
-            }
-            # Add escalation response to conversation context
-            conversation_context.add_message('assistant', escalation_response)
-        
         return response, conversation_context 
\ No newline at end of file
@@ -2,14 +2,44 @@ import asyncio
 from models.message import Message
 from typing import Optional, Dict, List, Callable
 from helpers.image_utils import process_base64_image
+from services.session_store import SessionStore
 import time
 
+# Endings that suggest the user has finished their thought
+COMPLETE_MESSAGE_ENDINGS = ("?", "!", ".")
+
+def looks_complete(text: str) -> bool:
+    """Check whether a message looks like a finished thought, e.g. a question."""
+    return text.strip().endswith(COMPLETE_MESSAGE_ENDINGS)
+
+def get_debounce_delay(user_input: str, debounce_seconds: float, complete_debounce_seconds: Optional[float]) -> float:
+    """Get the silence to wait for after a message, shorter when it looks complete."""
+    if complete_debounce_seconds is not None and looks_complete(user_input):
+        return min(complete_debounce_seconds, debounce_seconds)
+    return debounce_seconds
+
 class MultiMessageBuffer:
-    def __init__(self, debounce_seconds: int = 5, process_callback: Optional[Callable] = None):
+    def __init__(self, debounce_seconds: float = 5, process_callback: Optional[Callable] = None,
+                 complete_debounce_seconds: Optional[float] = None):
+        """
+        Initialize a buffer that combines messages sent in quick succession into one turn.
+
+        The buffer is processed once no message has arrived for the debounce time. The
+        wait is a single timer handle rescheduled on every message, so idle sessions
+        cost nothing.
+
+        Args:
+            debounce_seconds (float): Silence before the buffer is processed
+            process_callback (Optional[Callable]): Called with (combined_message, context)
+            complete_debounce_seconds (Optional[float]): Shorter silence used when the latest
+                message looks complete (see looks_complete); None always waits debounce_seconds
+        """
         self.message_buffer: List[str] = []
         self.base64_image: Optional[str] = None
         self.debounce_seconds = debounce_seconds
+        self.complete_debounce_seconds = complete_debounce_seconds
         self.last_input_time = None
+        self.debounce_timer: Optional[asyncio.TimerHandle] = None
         self.debounce_task = None
         self.buffer_lock = None
         self.process_callback = process_callback  # Called with (combined_message, context)
@@ -19,6 +49,11 @@ class MultiMessageBuffer:
         if self.buffer_lock is None:
             self.buffer_lock = asyncio.Lock()
 
+    @property
+    def is_pending(self) -> bool:
+        """Check whether buffered messages are waiting for, or being, processed."""
+        return self.debounce_timer is not None or (self.debounce_task is not None and not self.debounce_task.done())
+
     async def add_message(self, user_input: str, region: Optional[str] = None, base64_image: Optional[str] = None):
         await self.ensure_lock()
         async with self.buffer_lock:
@@ -28,18 +63,20 @@ class MultiMessageBuffer:
                 self.region = region
             if base64_image:
                 self.base64_image = base64_image
-        if self.debounce_task is None or self.debounce_task.done():
-            self.debounce_task = asyncio.create_task(self.debounce_loop())
 
-    async def debounce_loop(self):
-        await self.ensure_lock()
-        while True:
-            await asyncio.sleep(0.1)
-            if self.last_input_time and (time.time() - self.last_input_time > self.debounce_seconds):
-                await self.process_buffer()
-                self.last_input_time = None
-                self.debounce_task = None
-                break
+        # Restart the countdown from this message
+        if self.debounce_timer is not None:
+            self.debounce_timer.cancel()
+        self.debounce_timer = asyncio.get_running_loop().call_later(
+            get_debounce_delay(user_input, self.debounce_seconds, self.complete_debounce_seconds),
+            self._on_debounce_timer
+        )
+
+    def _on_debounce_timer(self):
+        """Process the buffer once the debounce time has passed without new messages."""
+        self.debounce_timer = None
+        self.last_input_time = None
+        self.debounce_task = asyncio.create_task(self.process_buffer())
 
     async def process_buffer(self):
         await self.ensure_lock()
@@ -54,6 +91,82 @@ class MultiMessageBuffer:
                 self.message_buffer.clear()
                 self.base64_image = None
 
+class SessionMessageBuffer:
+    def __init__(self, store: SessionStore, session_id: str, process_callback: Callable,
+                 debounce_seconds: float = 5, complete_debounce_seconds: Optional[float] = None,
+                 turn_lease_seconds: float = 120.0, cancel_superseded: bool = True,
+                 on_idle: Optional[Callable[[], None]] = None):
+        """
+        Initialize a debounce buffer whose messages are kept in a session store.
+
+        Works like MultiMessageBuffer, but the buffered messages live in the store, so
+        consecutive messages of a session may reach different worker processes. Every
+        worker that buffers a message arms its own timer; the store lets exactly one of
+        them claim the batch once the session has been quiet for the debounce time.
+
+        Args:
+            store (SessionStore): Store holding the buffered messages
+            session_id (str): Session the buffer belongs to
+            process_callback (Callable): Called with (combined_message, batch) where batch
+                holds the buffered 'texts' and the latest 'audio_data'
+            debounce_seconds (float): Silence before the buffer is processed
+            complete_debounce_seconds (Optional[float]): Shorter silence after a message that looks complete
+            turn_lease_seconds (float): Time after which a turn whose worker died is given up
+            cancel_superseded (bool): Cancel this worker's running turn when a new message arrives and
+                answer its messages together with the new one
+            on_idle (Optional[Callable[[], None]]): Called once the buffer has nothing left to wait for,
+                so its owner can drop it
+        """
+        self.store = store
+        self.session_id = session_id
+        self.process_callback = process_callback
+        self.debounce_seconds = debounce_seconds
+        self.complete_debounce_seconds = complete_debounce_seconds
+        self.turn_lease_seconds = turn_lease_seconds
+        self.cancel_superseded = cancel_superseded
+        self.on_idle = on_idle
+        self.debounce_timer: Optional[asyncio.TimerHandle] = None
+        self.debounce_task = None
+
+    async def add_message(self, user_input: str, audio_data: Optional[str] = None):
+        delay = get_debounce_delay(user_input, self.debounce_seconds, self.complete_debounce_seconds)
+        self.store.buffer_message(self.session_id, user_input, due_at=time.time() + delay, audio_data=audio_data)
+        if self.cancel_superseded and self.debounce_task is not None and not self.debounce_task.done():
+            # The user kept typing, so the running turn's answer would be stale
+            print(f"[SessionMessageBuffer] Cancelling superseded turn of session {self.session_id}")
+            self.debounce_task.cancel()
+        self._schedule(delay)
+
+    def _schedule(self, delay: float):
+        """Arm the timer, replacing a pending one."""
+        if self.debounce_timer is not None:
+            self.debounce_timer.cancel()
+        self.debounce_timer = asyncio.get_running_loop().call_later(delay, self._on_debounce_timer)
+
+    def _on_debounce_timer(self):
+        self.debounce_timer = None
+        self.debounce_task = asyncio.create_task(self.process_buffer())
+
+    async def process_buffer(self):
+        """Process the buffered messages if this worker wins the claim."""
+        batch = self.store.claim_buffer(self.session_id, time.time(), self.turn_lease_seconds)
+        if batch is not None:
+            try:
+                await self.process_callback("\n".join(batch['texts']), batch)
+            except asyncio.CancelledError:
+                # Merge the cancelled turn's messages into the next one
+                self.store.restore_buffer(self.session_id, batch, time.time())
+                raise
+            finally:
+                self.store.finish_turn(self.session_id)
+
+        # Not due yet (a later message moved the due time) or a turn was in progress: try again then
+        wait = self.store.seconds_until_claimable(self.session_id, time.time())
+        if wait is not None:
+            self._schedule(max(wait, 0.05))
+        elif self.on_idle is not None:
+            self.on_idle()
+
 async def receive_message(user_input: str, context: Optional[Dict] = None):
 
     region = context.get("region") if context else None
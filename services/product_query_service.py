@@ -3,9 +3,11 @@ from .ai_service import AIService
 from .prompt_builder import PromptBuilder
 from .product_search_service import ProductSearchService
 from .image_text_search_service import ImageTextSearchService
+from .intent_classifier import IntentClassifier
 
 class ProductQueryService:
-    def __init__(self, ai_service: AIService, prompt_builder: PromptBuilder, product_search_service: ProductSearchService):
+    def __init__(self, ai_service: AIService, prompt_builder: PromptBuilder, product_search_service: ProductSearchService,
+                 intent_classifier: Optional[IntentClassifier] = None, classifier_model: Optional[str] = None):
         """
         Initialize the product query service.
         
@@ -13,10 +15,14 @@ class ProductQueryService:
             ai_service: The AI service instance
             prompt_builder: The prompt builder instance
             product_search_service: The product search service instance
+            intent_classifier (Optional[IntentClassifier]): Local classifier tried before the LLM
+            classifier_model (Optional[str]): Model for the product-query classifier (defaults to the AI service's model)
         """
         self.ai_service = ai_service
         self.prompt_builder = prompt_builder
         self.product_search_service = product_search_service
+        self.intent_classifier = intent_classifier or IntentClassifier("product_query", text_encoder=product_search_service.text_encoder)
+        self.classifier_model = classifier_model
         self.image_text_search_service = ImageTextSearchService()
         
     async def check_product_query(self, query: str, image: Optional[str] = None, image_description: Optional[str] = None) -> Optional[Tuple[bool, str, Optional[dict]]]:
@@ -39,8 +45,9 @@ class ProductQueryService:
             return None
         
         print("\n[ProductQueryService] Handling new product search query")
-        # Perform search and return only exact matches
-        exact_match, _ = self.product_search_service.search_products(query, image)
+        # Restrict the search to colors and categories named in the query, then return only exact matches
+        filters = self.product_search_service.parse_filters(query)
+        exact_match, _ = self.product_search_service.search_products(query, image, filters=filters)
         return True, "", {
             'exact_match': exact_match,
             'similar_products': []  # Empty list since we're not using similar products
@@ -81,11 +88,20 @@ class ProductQueryService:
         if image_description:
             query = f"{query}\nImage Description: {image_description}"
 
+        # Let the local classifier decide obvious cases
+        local_decision, prediction = await self.intent_classifier.decide(query)
+        if local_decision is not None:
+            print(f"[ProductQueryService] Local classifier decided product query={local_decision} (confidence {prediction[1]:.2f})")
+            return local_decision
+        
         # Check if the combined query is product-related
         system_prompt = self.prompt_builder._load_prompt("product_query_classifier_prompt.txt")
         user_prompt = f"Query: {query}"
         
-        response = await self.ai_service.get_response(system_prompt, user_prompt)
-        classification = response.get('choices', [{}])[0].get('message', {}).get('content', '').strip().lower()
+        classification = await self.ai_service.classify(system_prompt, user_prompt, model=self.classifier_model,
+                                                        cache=True, call_site="product_query_classification")
         
-        return classification == 'yes' 
\ No newline at end of file
+        is_product_query = classification == 'yes'
+        if classification is not None:
+            self.intent_classifier.record_llm_decision(query, is_product_query, prediction)
+        return is_product_query
\ No newline at end of file
@@ -1,202 +1,333 @@
 from typing import List, Dict, Optional, Tuple
+import re
 import json
-import numpy as np
 from PIL import Image
 from .image_search_service import ImageSearchService
-from chromadb.utils import embedding_functions
-import torch
-from transformers import AutoTokenizer, AutoModel
-from helpers.chroma_config import get_chroma_client
+from .index_builder import get_product_id, get_product_text, get_product_image_urls
+from .text_encoder import TextEncoder, get_text_encoder
+from helpers.chroma_config import get_versioned_collection
+from helpers.index_store import TEXT_INDEX_ARTIFACT, get_current_index_version, load_index_artifact, load_index_manifest
+from helpers.bm25_index import BM25Index, LexicalHit, reciprocal_rank_fusion, tokenize
+from helpers.product_attributes import PRODUCT_METADATA_SCHEMA, AttributeBitmaskIndex, extract_attributes, find_category
+from models.product_filters import ProductFilters
+
+# Term frequency weights of the product fields in the lexical index
+LEXICAL_FIELD_WEIGHTS = {
+    'name': 2.0,
+    'handle': 1.0,
+    'product_code': 3.0,
+    'supplier_stock_code': 3.0,
+    'description': 1.0,
+}
+# Product fields whose tokens count as identifier fragments in a query
+IDENTIFIER_FIELDS = ('handle', 'product_code', 'supplier_stock_code')
+# How many times the runner-up's BM25 score the top hit needs to skip vector search without an identifier
+LEXICAL_DOMINANCE_RATIO = 2.0
 
 class ProductSearchService:
-    def __init__(self, catalog_path: str = "data/product_catalog_multi_image.json"):
+    def __init__(self, catalog_path: str = "data/product_catalog_multi_image.json", text_encoder: Optional[TextEncoder] = None):
         """Initialize the product search service with both text and image search capabilities."""
         self.catalog_path = catalog_path
         self.image_search_service = ImageSearchService()
         
-        # Initialize text search components
-        self.tokenizer = AutoTokenizer.from_pretrained('sentence-transformers/all-MiniLM-L6-v2')
-        self.text_model = AutoModel.from_pretrained('sentence-transformers/all-MiniLM-L6-v2')
-        
-        # Initialize ChromaDB with shared configuration
-        self.chroma_client = get_chroma_client()
+        # One shared encoder embeds both indexed product text and incoming queries
+        self.text_encoder = text_encoder or get_text_encoder()
         
-        # Initialize text search components
-        try:
-            self.text_collection = self.chroma_client.create_collection(
-                name="product_text",
-                embedding_function=embedding_functions.DefaultEmbeddingFunction()
-            )
-        except Exception as e:
-            if "already exists" in str(e):
-                self.text_collection = self.chroma_client.get_collection(
-                    name="product_text",
-                    embedding_function=embedding_functions.DefaultEmbeddingFunction()
-                )
+        # Load the published text index, if the offline build pipeline has produced one with the same encoder
+        self.text_index = load_index_artifact(TEXT_INDEX_ARTIFACT)
+        index_version = None
+        if self.text_index is not None:
+            manifest = load_index_manifest() or {}
+            if manifest.get('text_model') != self.text_encoder.model_name:
+                print(f"[ProductSearchService] Ignoring text index built with {manifest.get('text_model')}, expected {self.text_encoder.model_name}")
+                self.text_index = None
+            elif manifest.get('metadata_schema') != PRODUCT_METADATA_SCHEMA:
+                print(f"[ProductSearchService] Ignoring text index with metadata schema {manifest.get('metadata_schema')}, expected {PRODUCT_METADATA_SCHEMA}")
+                self.text_index = None
             else:
-                raise e
+                index_version = get_current_index_version()
+        
+        # Initialize ChromaDB with shared configuration, rebuilding the collection when the index version changed
+        self.text_collection, needs_population = get_versioned_collection(
+            name="product_text",
+            index_version=f"{index_version}:{self.text_encoder.model_name}:{PRODUCT_METADATA_SCHEMA}",
+            embedding_function=self.text_encoder
+        )
         
         # Load product catalog and initialize text embeddings
         self.product_catalog = self._load_product_catalog()
-        self._initialize_text_collection()
+        if needs_population:
+            self._initialize_text_collection()
+        
+        # Build in-process lookups: products by id, exact identifiers, the BM25 index and its attribute pre-filters
+        self.products_by_id = {get_product_id(p): p for p in self.product_catalog['products']}
+        self.product_attributes = {product_id: extract_attributes(p) for product_id, p in self.products_by_id.items()}
+        self.identifier_index = self._build_identifier_index()
+        self.lexical_index = self._build_lexical_index()
+        self.attribute_index = AttributeBitmaskIndex(self.lexical_index.doc_ids, self.product_attributes)
     
     def _load_product_catalog(self) -> Dict:
         """Load the product catalog from JSON file."""
         with open(self.catalog_path, 'r') as f:
             return json.load(f)
     
-    def _get_text_embedding(self, text: str) -> np.ndarray:
-        """Generate text embedding using the transformer model."""
-        inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True)
-        with torch.no_grad():
-            outputs = self.text_model(**inputs)
-        return outputs.last_hidden_state.mean(dim=1).numpy()[0]
-    
     def _initialize_text_collection(self):
         """Initialize ChromaDB collection with product text embeddings."""
-        if self.text_collection.count() == 0:
-            print("Adding text embeddings to ChromaDB...")
-            ids = []
-            embeddings = []
-            documents = []
-            metadatas = []
+        if self.text_index is not None:
+            print("Adding text embeddings from the published index to ChromaDB...")
+            self.text_collection.add(**self.text_index)
+            return
+        
+        print("Adding text embeddings to ChromaDB...")
+        ids = []
+        documents = []
+        metadatas = []
+        
+        for product in self.product_catalog['products']:
+            image_urls = get_product_image_urls(product)
+            ids.append(get_product_id(product))
+            documents.append(get_product_text(product))
+            metadatas.append({
+                'name': product['name'],
+                'image_path': image_urls[0] if image_urls else None,
+                **extract_attributes(product)
+            })
+        
+        # Embed the whole catalog in batched forward passes
+        self.text_collection.add(
+            ids=ids,
+            embeddings=self.text_encoder.encode(documents).tolist(),
+            documents=documents,
+            metadatas=metadatas
+        )
+    
+    def _build_identifier_index(self) -> Dict[str, str]:
+        """Map lowercased handles, product codes and supplier stock codes to product ids."""
+        identifiers = {}
+        for product_id, product in self.products_by_id.items():
+            for field in IDENTIFIER_FIELDS:
+                if product.get(field):
+                    identifiers[str(product[field]).casefold()] = product_id
+        return identifiers
+    
+    def _build_lexical_index(self) -> BM25Index:
+        """Build the BM25 index over product name, handle, codes and description."""
+        index = BM25Index()
+        for product_id, product in self.products_by_id.items():
+            index.add(
+                product_id,
+                {field: str(product.get(field) or '') for field in LEXICAL_FIELD_WEIGHTS},
+                weights=LEXICAL_FIELD_WEIGHTS
+            )
+        index.finalize()
+        return index
+    
+    def _match_identifier(self, query: str) -> Optional[str]:
+        """
+        Find a product referenced by link, handle, product code or supplier stock code.
+        
+        Args:
+            query (str): Text query for product search
             
-            for product in self.product_catalog['products']:
-                product_id = product['id']['$oid'] if isinstance(product['id'], dict) else str(product['id'])
-                product_text = f"{product['name']} {product.get('description', '')} {product.get('category', '')}"
-                ids.append(product_id)
-                embeddings.append(self._get_text_embedding(product_text).tolist())
-                documents.append(product_text)
-                # Use the first image in image_paths if available, else fallback to image_path
-                image_paths = product.get('image_paths')
-                if image_paths and isinstance(image_paths, list) and len(image_paths) > 0:
-                    image_url = image_paths[0]
-                else:
-                    image_url = product.get('image_path', None)
-                metadatas.append({
-                    'name': product['name'],
-                    'price': product['price'],
-                    'image_path': image_url,
-                    'total_stock': product.get('total_stock', 0)
-                })
+        Returns:
+            Optional[str]: The referenced product id, if any
+        """
+        # Product links end in the handle, e.g. https://lonca.co/product/42847-blouse-green
+        for candidate in re.split(r"[\s/?#,;]+", query.casefold()):
+            candidate = candidate.strip(".!?:'\"()[]")
+            if candidate in self.identifier_index:
+                return self.identifier_index[candidate]
+        return None
+    
+    def _format_product(self, product_id: str, similarity: float, search_type: str) -> Dict:
+        """Build a search result entry from the catalog."""
+        product = self.products_by_id[product_id]
+        image_urls = get_product_image_urls(product)
+        return {
+            'product_id': product_id,
+            'name': product['name'],
+            'price': product['price'],
+            'image_path': image_urls[0] if image_urls else None,
+            'total_stock': product.get('total_stock', 0),
+            'product_link': product.get('product_link'),
+            'product_code': product.get('product_code'),
+            'supplier_stock_code': product.get('supplier_stock_code'),
+            'similarity': similarity,
+            'search_type': search_type
+        }
+    
+    def parse_filters(self, query: str) -> ProductFilters:
+        """
+        Derive attribute filters from words in the query that name a catalog color or category.
+        
+        Stock is never derived from the query: "is it available?" asks for the stock level,
+        which is part of every search result, and must not hide a sold-out product.
+        
+        Args:
+            query (str): Text query for product search
             
-            self.text_collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                documents=documents,
-                metadatas=metadatas
-            )
+        Returns:
+            ProductFilters: Filters found in the query (empty if none)
+        """
+        text = f" {' '.join(tokenize(query))} "
+        colors = {attrs['color'] for attrs in self.product_attributes.values() if attrs['color']}
+        categories = {attrs['category'] for attrs in self.product_attributes.values() if attrs['category']}
+        
+        # Prefer the longest color phrase, so "light green" wins over "green"
+        color = next((c for c in sorted(colors, key=len, reverse=True) if f" {' '.join(tokenize(c))} " in text), None)
+        category = find_category(query, categories)
+        return ProductFilters(color=color, category=category)
+    
+    def _has_identifier_term(self, product_id: str, query_terms: List[str]) -> bool:
+        """Check whether the query names a code or handle fragment of the product, e.g. "10883" of "QUS-10883"."""
+        product = self.products_by_id[product_id]
+        fragments = {token for field in IDENTIFIER_FIELDS for token in tokenize(str(product.get(field) or ''))}
+        return any(term in fragments and any(ch.isdigit() for ch in term) for term in query_terms)
+    
+    def _lexical_confidence(self, hits: List[LexicalHit], query_terms: List[str]) -> float:
+        """
+        Score how unambiguously the lexical hits identify a single product, from 0 to 1.
+        
+        A query only identifies a product lexically when it names one of its identifier
+        fragments, or when the top BM25 score clearly beats the runner-up. Plain color and
+        category words shared by many products do neither.
+        
+        Args:
+            hits (List[LexicalHit]): Lexical hits, best first
+            query_terms (List[str]): Content terms of the query
+            
+        Returns:
+            float: The top hit's coverage, scaled by its margin over the runner-up without an identifier
+        """
+        if not hits:
+            return 0.0
+        top = hits[0]
+        runner_up = hits[1] if len(hits) > 1 else None
+        if self._has_identifier_term(top.doc_id, query_terms):
+            return top.coverage if runner_up is None or runner_up.coverage < top.coverage else 0.0
+        if runner_up is None:
+            return top.coverage
+        if top.score < LEXICAL_DOMINANCE_RATIO * runner_up.score:
+            return 0.0
+        return top.coverage * (1 - runner_up.score / top.score)
     
     def search_products(self, query: str, image: Optional[Image.Image] = None, 
-                       similarity_threshold: float = 0.95) -> Tuple[Optional[Dict], List[Dict]]:
+                       similarity_threshold: float = 0.95, lexical_top_k: int = 10,
+                       filters: Optional[ProductFilters] = None) -> Tuple[Optional[Dict], List[Dict]]:
         """
-        Search products using both text and image queries.
+        Search products using lexical, text vector and image queries.
+        
+        Lexical (BM25) and vector rankings are fused with reciprocal rank fusion. When the
+        lexical index alone identifies a single product with a confidence above the similarity
+        threshold, vector search is skipped entirely. Filters are applied before ranking in every retriever; explicit
+        product links and codes bypass them.
         
         Args:
             query (str): Text query for product search
             image (Optional[Image.Image]): Optional image for visual search
             similarity_threshold (float): Threshold for considering an exact match
+            lexical_top_k (int): Number of lexical hits fused with the vector results
+            filters (Optional[ProductFilters]): Attribute filters restricting eligible products
             
         Returns:
             Tuple[Optional[Dict], List[Dict]]: (exact_match, similar_products)
         """
-        results = []
+        # 1. Check for a direct product link, handle or code match
+        if query:
+            product_id = self._match_identifier(query)
+            if product_id:
+                return self._format_product(product_id, similarity=1.0, search_type='link'), []
         
-        # 1. Check for direct product_link match
-        for product in self.product_catalog['products']:
-            if (
-                ('product_link' in product and product['product_link'] in query) or
-                ('handle' in product and product['handle'] in query) or
-                ('product_code' in product and product['product_code'] in query) or
-                ('supplier_stock_code' in product and product['supplier_stock_code'] in query)
-            ):
-                # Found a direct link match
-                product_id = product['id']['$oid'] if isinstance(product['id'], dict) else str(product['id'])
-                # Use the first image in image_paths if available, else fallback to image_path
-                image_paths = product.get('image_paths')
-                if image_paths and isinstance(image_paths, list) and len(image_paths) > 0:
-                    image_url = image_paths[0]
-                else:
-                    image_url = product.get('image_path', None)
-                exact_match = {
-                    'product_id': product_id,
-                    'name': product['name'],
-                    'price': product['price'],
-                    'image_path': image_url,
-                    'total_stock': product.get('total_stock', 0),
-                    'product_link': product['product_link'],
-                    'product_code': product['product_code'],
-                    'supplier_stock_code': product['supplier_stock_code'],
-                    'similarity': 1.0,
-                    'search_type': 'link'
-                }
-                return exact_match, []
+        allowed = self.attribute_index.mask(filters)
+        if allowed == 0:
+            print(f"[ProductSearchService] No products match filters {filters}")
+            return None, []
+        where = filters.to_chroma_where() if filters else None
+        rankings = []
+        
+        # 2. Lexical search, short-circuiting vector search when it is unambiguous
+        if query:
+            lexical_hits = self.lexical_index.search(query, k=lexical_top_k, allowed=allowed)
+            confidence = self._lexical_confidence(lexical_hits, self.lexical_index.query_terms(query))
+            if image is None and confidence >= similarity_threshold:
+                print(f"[ProductSearchService] Confident lexical match for '{query}', skipping vector search")
+                return self._format_product(lexical_hits[0].doc_id, similarity=round(confidence, 4), search_type='lexical'), []
+            rankings.append([
+                {**self._format_product(hit.doc_id, similarity=0.0, search_type='lexical'), 'lexical_coverage': hit.coverage}
+                for hit in lexical_hits
+            ])
         
-        # Perform text search
+        # 3. Text vector search
         if query:
             text_results = self.text_collection.query(
                 query_texts=[query],
-                n_results=5
+                n_results=5,
+                where=where
             )
-            
-            for i in range(len(text_results['ids'][0])):
-                product_id = text_results['ids'][0][i]
-                similarity = 1 - text_results['distances'][0][i]
-                metadata = text_results['metadatas'][0][i]
-                
-                results.append({
-                    'product_id': product_id,
-                    'name': metadata['name'],
-                    'price': metadata['price'],
-                    'image_path': metadata['image_path'],
-                    'total_stock': metadata.get('total_stock', 0),
-                    'similarity': similarity,
-                    'search_type': 'text'
-                })
-        
-        # Perform image search if image is provided
+            rankings.append([
+                {
+                    **self._format_product(product_id, similarity=1 - distance, search_type='text'),
+                    'image_path': metadata['image_path']
+                }
+                for product_id, distance, metadata in zip(
+                    text_results['ids'][0], text_results['distances'][0], text_results['metadatas'][0]
+                )
+                if product_id in self.products_by_id
+            ])
+        
+        # 4. Image search if image is provided
         if image is not None:
             exact_match, similar_products = self.image_search_service.find_products(
                 image, 
-                similarity_threshold=similarity_threshold
+                similarity_threshold=similarity_threshold,
+                where=where
             )
-            
+            image_results = []
             if exact_match:
+                image_results.append({**exact_match, 'search_type': 'image_exact'})
+            image_results.extend({**product, 'search_type': 'image_similar'} for product in similar_products)
+            for result in image_results:
                 # Get full product details including stock
-                product_details = self.get_product_details(exact_match['product_id'])
-                if product_details:
-                    exact_match['total_stock'] = product_details.get('total_stock', 0)
-                results.append({
-                    **exact_match,
-                    'search_type': 'image_exact'
-                })
-            
-            for product in similar_products:
-                # Get full product details including stock
-                product_details = self.get_product_details(product['product_id'])
+                product_details = self.products_by_id.get(result['product_id'])
                 if product_details:
-                    product['total_stock'] = product_details.get('total_stock', 0)
-                results.append({
-                    **product,
-                    'search_type': 'image_similar'
-                })
+                    result['total_stock'] = product_details.get('total_stock', 0)
+            rankings.append(image_results)
         
-        # Sort results by similarity
-        results.sort(key=lambda x: x['similarity'], reverse=True)
+        results = self._fuse_rankings(rankings)
         
         # Find exact match (if any)
-        exact_match = None
-        if results and results[0]['similarity'] >= similarity_threshold:
-            exact_match = results[0]
+        exact_match = max(results, key=lambda x: x['similarity'], default=None)
+        if exact_match and exact_match['similarity'] >= similarity_threshold:
             # If we have an exact match, don't return similar products
             return exact_match, []
         
-        # Return exact match (if any) and top 5 similar products
-        return exact_match, results[:5]
+        # Return top 5 similar products in fused order
+        return None, results[:5]
+    
+    @staticmethod
+    def _fuse_rankings(rankings: List[List[Dict]]) -> List[Dict]:
+        """
+        Merge per-retriever result lists into one list ordered by reciprocal rank fusion.
+        
+        Each product keeps the entry with the highest similarity across retrievers.
+        """
+        best: Dict[str, Dict] = {}
+        id_rankings = []
+        for ranking in rankings:
+            ids = []
+            for result in ranking:
+                product_id = result['product_id']
+                if product_id in ids:
+                    continue
+                ids.append(product_id)
+                if product_id not in best or result['similarity'] > best[product_id]['similarity']:
+                    best[product_id] = {**best.get(product_id, {}), **result}
+            id_rankings.append(ids)
+        
+        fused_scores = reciprocal_rank_fusion(id_rankings)
+        ordered = sorted(fused_scores, key=fused_scores.get, reverse=True)
+        return [{**best[product_id], 'rrf_score': round(fused_scores[product_id], 5)} for product_id in ordered]
     
     def get_product_details(self, product_id: str) -> Optional[Dict]:
         """Get detailed information about a specific product."""
-        for product in self.product_catalog['products']:
-            if str(product['id'].get('$oid', product['id'])) == product_id:
-                return product
-        return None 
\ No newline at end of file
+        return self.products_by_id.get(product_id)
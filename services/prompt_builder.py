@@ -1,13 +1,24 @@
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from .faq_service import FAQService
+from .retrieval_context import RetrievalContext
 from helpers.loader import load_text, load_json
+from helpers.prompt_budget import PromptBudget, PromptSection, get_prompt_budget
 
 class PromptBuilder:
-    def __init__(self, prompts_dir: str = "prompts", faq_service=None):
-        """Initialize the prompt builder with the prompts directory."""
+    def __init__(self, prompts_dir: str = "prompts", faq_service=None, prompt_budget: Optional[PromptBudget] = None):
+        """
+        Initialize the prompt builder with the prompts directory.
+        
+        Args:
+            prompts_dir (str): Directory of the prompt files
+            faq_service: FAQ service used for retrieval (created when not given)
+            prompt_budget (Optional[PromptBudget]): Token limits prompts are fitted into; defaults to the
+                process-wide budget
+        """
         self.prompts_dir = Path(prompts_dir)
         self.faq_service = faq_service or FAQService()
+        self.prompt_budget = prompt_budget or get_prompt_budget()
         self.system_prompt = self._load_prompt("instructions.txt")
         
     def _load_prompt(self, filename: str) -> str:
@@ -31,36 +42,58 @@ class PromptBuilder:
         """
         return load_json(self.prompts_dir / "context.json")
         
-    def build_prompt(self, user_message: str, region: Optional[str] = None, conversation_context: str = None) -> Tuple[str, str]:
+    def create_retrieval_context(self, user_message: str, region: Optional[str] = None) -> RetrievalContext:
+        """
+        Create the FAQ retrieval shared by all services handling one turn.
+        
+        Args:
+            user_message (str): The user's message
+            region (Optional[str]): Region to filter FAQs by
+            
+        Returns:
+            RetrievalContext: Lazily retrieved FAQs for the turn
+        """
+        return RetrievalContext(self.faq_service, user_message, region=region)
+        
+    def build_prompt(self, user_message: str, region: Optional[str] = None, conversation_context: str = None,
+                     retrieval: Optional[RetrievalContext] = None, call_site: str = "lonca_query") -> Tuple[str, str]:
         """
         Build the complete prompt with system instructions and relevant FAQs.
         
+        Over the call site's token limit, conversation history is cut from its oldest
+        lines first, then FAQs from the least relevant.
+        
         Args:
             user_message (str): The user's message
             region (Optional[str]): Region to filter FAQs by
             conversation_context (Optional[str]): Recent conversation history
+            retrieval (Optional[RetrievalContext]): FAQ retrieval already made for this turn
+            call_site (str): Call site whose token limit applies
             
         Returns:
             Tuple[str, str]: (system_prompt, user_prompt)
                 - system_prompt: System instructions with relevant FAQs and conversation context
                 - user_prompt: The user's message
         """
-        # Get relevant FAQs
-        print(f"[PromptBuilder] Calling get_relevant_faqs with region: {region}")
-        relevant_faqs = self.faq_service.get_relevant_faqs(user_message, region=region)
-        print(f"[PromptBuilder] Relevant FAQs for query '{user_message}' and region '{region}': {relevant_faqs}")
-        
-        # Format FAQs
-        faq_text = ""
-        if relevant_faqs:
-            faq_text = self.faq_service.format_faqs_for_prompt(relevant_faqs)
-            self.system_prompt += faq_text
-        
-        # Add conversation context if available
-        if conversation_context:
-            self.system_prompt += f"\n\n{conversation_context}"
+        # Get relevant FAQs, reusing the turn's retrieval when given
+        retrieval = retrieval or self.create_retrieval_context(user_message, region)
+        print(f"[PromptBuilder] Relevant FAQs for query '{user_message}' and region '{retrieval.region}': {retrieval.faqs}")
         
         # Build user prompt
         user_prompt = f"User message: {user_message}"
         
-        return self.system_prompt, user_prompt 
\ No newline at end of file
+        def render(texts):
+            # Start from the base instructions every turn, so FAQs and history of earlier turns do not accumulate
+            system_prompt = self.system_prompt + texts['faq_text']
+            
+            # Add conversation context if available
+            if texts['conversation_context']:
+                system_prompt += f"\n\n{texts['conversation_context']}"
+            return system_prompt, texts['user_prompt']
+        
+        sections = self.prompt_budget.fit(call_site, {
+            'user_prompt': PromptSection(user_prompt),
+            'faq_text': PromptSection(retrieval.faq_text, priority=2, keep="head"),
+            'conversation_context': PromptSection(conversation_context or "", priority=1, keep="tail"),
+        }, render)
+        return render(sections) 
\ No newline at end of file
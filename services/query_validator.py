@@ -1,8 +1,11 @@
 from typing import Tuple, Optional
 from .conversation_context import ConversationContext
+from .intent_classifier import IntentClassifier
+from helpers.prompt_budget import PromptSection
 
 class QueryValidator:
-    def __init__(self, ai_service, prompt_builder, response_builder):
+    def __init__(self, ai_service, prompt_builder, response_builder, intent_classifier: Optional[IntentClassifier] = None,
+                 classifier_model: Optional[str] = None):
         """
         Initialize the query validator with required services.
         
@@ -10,10 +13,14 @@ class QueryValidator:
             ai_service: The AI service instance
             prompt_builder: The prompt builder instance
             response_builder: The response builder instance
+            intent_classifier (Optional[IntentClassifier]): Local classifier tried before the LLM
+            classifier_model (Optional[str]): Model for the business classifier (defaults to the AI service's model)
         """
         self.ai_service = ai_service
         self.prompt_builder = prompt_builder
         self.response_builder = response_builder
+        self.intent_classifier = intent_classifier or IntentClassifier("lonca_query")
+        self.classifier_model = classifier_model
         
     async def validate_query(self, query: str, conversation_context: ConversationContext, image_description: Optional[str] = None) -> Tuple[bool, str]:
         """
@@ -30,27 +37,61 @@ class QueryValidator:
                 - response: Response message (either standard response or empty string)
                 - search_results: None for business validation
         """
-        context = self.prompt_builder._load_context()
-        conversation_context_text = conversation_context.get_conversation_context()
-        
-        system_prompt = self.prompt_builder._load_prompt("classification_prompt.txt").format(
-            business_type=context['business_type'],
-            company=context['company'],
-            valid_topics="\n".join(f"- {topic}" for topic in context['valid_topics']),
-            invalid_topics="\n".join(f"- {topic}" for topic in context['invalid_topics']),
-            conversation_context=conversation_context_text
-        )
-        
-        user_prompt = f"Current Query: {query}\n\nImage Description: {image_description}"
-        
-        response = await self.ai_service.get_response(system_prompt, user_prompt)
-        classification = response.get('choices', [{}])[0].get('message', {}).get('content', '').strip().lower()
-        
-        is_valid = classification == 'yes'
+        # Let the local classifier decide obvious cases; it sees the query but not the conversation,
+        # so after the first turn it may only accept queries and leaves rejections to the LLM
+        classifier_input = f"{query}\nImage Description: {image_description}" if image_description else query
+        follow_up = bool(conversation_context.summary) or any(message.role == 'assistant' for message in conversation_context.messages)
+        is_valid, prediction = await self.intent_classifier.decide(classifier_input, follow_up=follow_up)
+        if is_valid is None:
+            llm_decision = await self._classify_with_llm(query, conversation_context, image_description)
+            if llm_decision is not None:
+                self.intent_classifier.record_llm_decision(classifier_input, llm_decision, prediction)
+            is_valid = bool(llm_decision)
+        else:
+            print(f"[QueryValidator] Local classifier decided is_valid={is_valid} (confidence {prediction[1]:.2f})")
         
         if not is_valid:
             response = await self.response_builder.generate_response(query, conversation_context)
             return False, response
             
         return True, ""
+        
+    async def _classify_with_llm(self, query: str, conversation_context: ConversationContext, image_description: Optional[str] = None) -> Optional[bool]:
+        """
+        Ask the LLM whether the query is related to Lonca's business.
+        
+        Args:
+            query (str): The user's query
+            conversation_context (ConversationContext): The current conversation context
+            image_description (Optional[str]): Description of the image, if available
+            
+        Returns:
+            Optional[bool]: True if query is related to Lonca's business, None if the request failed
+        """
+        context = self.prompt_builder._load_context()
+        prompt_template = self.prompt_builder._load_prompt("classification_prompt.txt")
+        user_prompt = f"Current Query: {query}\n\nImage Description: {image_description}"
+        
+        def render(texts):
+            system_prompt = prompt_template.format(
+                business_type=context['business_type'],
+                company=context['company'],
+                valid_topics="\n".join(f"- {topic}" for topic in context['valid_topics']),
+                invalid_topics="\n".join(f"- {topic}" for topic in context['invalid_topics']),
+                conversation_context=texts['conversation_context']
+            )
+            return [system_prompt, texts['user_prompt']]
+        
+        # Only the conversation history is cut when the prompt exceeds its token limit
+        sections = self.prompt_builder.prompt_budget.fit("query_classification", {
+            'conversation_context': PromptSection(conversation_context.get_conversation_context(), priority=1, keep="tail"),
+            'user_prompt': PromptSection(user_prompt),
+        }, render)
+        system_prompt, _ = render(sections)
+        
+        classification = await self.ai_service.classify(system_prompt, user_prompt, model=self.classifier_model,
+                                                        cache=True, call_site="query_classification")
+        if classification is None:
+            return None
+        return classification == 'yes' 
  
\ No newline at end of file
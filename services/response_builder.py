@@ -1,5 +1,7 @@
+from typing import Tuple
 from .conversation_context import ConversationContext
 from helpers.loader import load_json
+from helpers.prompt_budget import PromptSection
 
 class ResponseBuilder:
     def __init__(self, ai_service, prompt_builder):
@@ -25,29 +27,49 @@ class ResponseBuilder:
         Returns:
             str: Generated response
         """
-        system_prompt = self.prompt_builder._load_prompt("non_lonca_query_system_prompt.txt").format(
-            conversation_context=conversation_context.get_conversation_context()
-        )
-        user_prompt = self.prompt_builder._load_prompt("non_lonca_query_user_prompt.txt").format(query=query)
-        
-        response = await self.ai_service.get_response(system_prompt, user_prompt)
+        system_prompt, user_prompt = self._build_prompts("non_lonca_query", "non_lonca_response", query, conversation_context)
+        response = await self.ai_service.get_response(system_prompt, user_prompt, call_site="non_lonca_response")
         return response.get('choices', [{}])[0].get('message', {}).get('content', '')
         
-    async def get_escalation_response(self, query: str, conversation_context: ConversationContext) -> str:
+    async def get_escalation_response(self, query: str, conversation_context: ConversationContext, use_template: bool = False) -> str:
         """
         Generate an escalation response when no relevant FAQs are found.
         
         Args:
             query (str): The user's query
             conversation_context (ConversationContext): The current conversation context
+            use_template (bool): Return the fixed escalation reply instead of generating one
             
         Returns:
             str: Escalation response
         """
-        system_prompt = self.prompt_builder._load_prompt("escalate_to_agent_system_prompt.txt").format(
-            conversation_context=conversation_context.get_conversation_context()
-        )
-        user_prompt = self.prompt_builder._load_prompt("escalate_to_agent_user_prompt.txt").format(query=query)
+        if use_template:
+            return self.responses['escalate_to_agent']['template_reply']
+        
+        system_prompt, user_prompt = self._build_prompts("escalate_to_agent", "escalation", query, conversation_context)
+        response = await self.ai_service.get_response(system_prompt, user_prompt, call_site="escalation")
+        return response.get('choices', [{}])[0].get('message', {}).get('content', '')
+        
+    def _build_prompts(self, prompt_name: str, call_site: str, query: str, conversation_context: ConversationContext) -> Tuple[str, str]:
+        """
+        Build a system and user prompt pair, cutting the oldest history over the call site's token limit.
         
-        response = await self.ai_service.get_response(system_prompt, user_prompt)
-        return response.get('choices', [{}])[0].get('message', {}).get('content', '') 
\ No newline at end of file
+        Args:
+            prompt_name (str): Prefix of the *_system_prompt.txt and *_user_prompt.txt files
+            call_site (str): Call site whose token limit applies
+            query (str): The user's query
+            conversation_context (ConversationContext): The current conversation context
+            
+        Returns:
+            Tuple[str, str]: (system_prompt, user_prompt)
+        """
+        system_template = self.prompt_builder._load_prompt(f"{prompt_name}_system_prompt.txt")
+        user_template = self.prompt_builder._load_prompt(f"{prompt_name}_user_prompt.txt")
+
+        def render(texts):
+            return system_template.format(conversation_context=texts['conversation_context']), user_template.format(query=texts['query'])
+        sections = self.prompt_builder.prompt_budget.fit(call_site, {
+            'conversation_context': PromptSection(conversation_context.get_conversation_context(), priority=1, keep="tail"),
+            'query': PromptSection(query),
+        }, render)
+        return render(sections)
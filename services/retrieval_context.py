@@ -0,0 +1,48 @@
+from typing import Dict, List, Optional
+from .faq_service import FAQService
+
+class RetrievalContext:
+    def __init__(self, faq_service: FAQService, query: str, region: Optional[str] = None,
+                 n_results: int = 3, min_relevance: float = 0.3):
+        """
+        Initialize the FAQ retrieval for one conversation turn.
+
+        FAQs are retrieved on first use and then shared by every service handling the
+        turn, so the query is embedded and searched at most once.
+
+        Args:
+            faq_service (FAQService): The FAQ service instance
+            query (str): The user's message for this turn
+            region (Optional[str]): The user's region
+            n_results (int): Number of FAQs to retrieve
+            min_relevance (float): Minimum relevance score for an FAQ to count as relevant
+        """
+        self.faq_service = faq_service
+        self.query = query
+        self.region = region
+        self.n_results = n_results
+        self.min_relevance = min_relevance
+        self._faqs: Optional[List[Dict]] = None
+
+    @property
+    def faqs(self) -> List[Dict]:
+        """Get the FAQs relevant to this turn's query, retrieving them on first access."""
+        if self._faqs is None:
+            print(f"[RetrievalContext] Retrieving FAQs for query '{self.query}' and region '{self.region}'")
+            self._faqs = self.faq_service.get_relevant_faqs(self.query, region=self.region, n_results=self.n_results)
+        return self._faqs
+
+    @property
+    def top_faq(self) -> Optional[Dict]:
+        """Get the most relevant FAQ, if any."""
+        return self.faqs[0] if self.faqs else None
+
+    @property
+    def has_relevant_faqs(self) -> bool:
+        """Check whether any retrieved FAQ reaches the relevance threshold."""
+        return any(faq['relevance'] >= self.min_relevance for faq in self.faqs)
+
+    @property
+    def faq_text(self) -> str:
+        """Get the retrieved FAQs formatted for a prompt."""
+        return self.faq_service.format_faqs_for_prompt(self.faqs)
@@ -1,7 +1,9 @@
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 from .ai_service import AIService
 from .prompt_builder import PromptBuilder
 from .conversation_context import ConversationContext
+from .retrieval_context import RetrievalContext
+from helpers.prompt_budget import PromptSection
 
 class SearchResultService:
     def __init__(self, ai_service: AIService, prompt_builder: PromptBuilder):
@@ -15,7 +17,8 @@ class SearchResultService:
         self.ai_service = ai_service
         self.prompt_builder = prompt_builder
         
-    async def handle_search_results(self, query: str, search_results: dict, conversation_context: ConversationContext, region: str) -> Tuple[Dict, ConversationContext]:
+    async def handle_search_results(self, query: str, search_results: dict, conversation_context: ConversationContext, region: str,
+                                    retrieval: Optional[RetrievalContext] = None) -> Tuple[Dict, ConversationContext]:
         """
         Handle search results and generate appropriate response.
         
@@ -23,6 +26,8 @@ class SearchResultService:
             query (str): The original user query
             search_results (dict): The search results
             conversation_context (ConversationContext): The current conversation context
+            region (str): The user's region
+            retrieval (Optional[RetrievalContext]): FAQ retrieval already made for this turn
             
         Returns:
             Tuple[Dict, ConversationContext]: The AI's response and updated conversation context
@@ -37,12 +42,9 @@ class SearchResultService:
         # Load and format the image search response prompt
         prompt_template = self.prompt_builder._load_prompt("image_search_response_prompt.txt")
 
-        relevant_faqs = self.prompt_builder.faq_service.get_relevant_faqs(query, region=region)
-
-        # Format FAQs
-        faq_text = ""
-        if relevant_faqs:
-            faq_text = self.prompt_builder.faq_service.format_faqs_for_prompt(relevant_faqs)
+        # Format FAQs, reusing the turn's retrieval when given
+        retrieval = retrieval or self.prompt_builder.create_retrieval_context(query, region)
+        faq_text = retrieval.faq_text
         
         # Format the similar products list
         similar_products_text = chr(10).join([
@@ -57,16 +59,19 @@ class SearchResultService:
             else 'None'
         )
         
-        # Format the prompt
-        system_prompt = prompt_template.format(
-            conversation_context=conversation_context.get_conversation_context(),
-            query=query,
-            faq=faq_text,
-            exact_match=exact_match_text,
-            similar_products=similar_products_text
-        )
+        # Format the prompt, trimming history, then FAQs, then similar products over the token limit
+        def render(texts):
+            return [prompt_template.format(**texts)]
+        sections = self.prompt_builder.prompt_budget.fit("search_results", {
+            'conversation_context': PromptSection(conversation_context.get_conversation_context(), priority=1, keep="tail"),
+            'query': PromptSection(query),
+            'faq': PromptSection(faq_text, priority=2, keep="head"),
+            'exact_match': PromptSection(exact_match_text),
+            'similar_products': PromptSection(similar_products_text, priority=3, keep="head"),
+        }, render)
+        system_prompt, = render(sections)
         
-        response = await self.ai_service.get_response(system_prompt, "")
+        response = await self.ai_service.get_response(system_prompt, "", call_site="search_results")
         
         # Add assistant's response to conversation context
         conversation_context.add_message(
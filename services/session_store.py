@@ -0,0 +1,354 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+from .conversation_context import ConversationContext
+from models.message import Message
+
+def _json_default(value: Any) -> Any:
+    """Encode numpy scalars (e.g. similarity scores) and other stray values in stored state."""
+    return value.item() if hasattr(value, 'item') else str(value)
+
+class SessionStore(ABC):
+    """
+    State of chat sessions: the message log, the debounce buffer and the conversation context.
+
+    Each buffered message pushes the buffer's due time forward. Any worker whose debounce
+    timer fires may claim the buffer, but the claim only succeeds once the due time has
+    passed and no other turn of the session holds the turn lease, so every batch of
+    messages is processed exactly once even when a session's requests reach several workers.
+    """
+
+    # Whether other processes can change the state, so readers should poll for new messages
+    shared = False
+
+    @abstractmethod
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session's settings ({'region', 'image_blob'}), or None for an unknown session."""
+
+    @abstractmethod
+    def create_session(self, session_id: str, region: str):
+        """Create a session unless it already exists."""
+
+    @abstractmethod
+    def set_image(self, session_id: str, image_blob: str):
+        """Remember the latest image a session uploaded."""
+
+    @abstractmethod
+    def append_message(self, session_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a message under the session's next message id and return it with the id set."""
+
+    @abstractmethod
+    def get_messages(self, session_id: str, since: int = 0) -> List[Dict[str, Any]]:
+        """Get the session's messages with an id of at least `since`."""
+
+    @abstractmethod
+    def buffer_message(self, session_id: str, text: str, due_at: float, audio_data: Optional[str] = None):
+        """Add a message to the session's debounce buffer and move its due time to due_at."""
+
+    @abstractmethod
+    def seconds_until_claimable(self, session_id: str, now: float) -> Optional[float]:
+        """Get the seconds until the buffer can be claimed, or None if it is empty."""
+
+    @abstractmethod
+    def claim_buffer(self, session_id: str, now: float, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Take the buffered messages if they are due and no turn is in progress.
+
+        Args:
+            session_id (str): Session id
+            now (float): Current wall-clock time
+            lease_seconds (float): How long the claiming worker owns the turn; a crashed
+                worker's turn is given up after this time
+
+        Returns:
+            Optional[Dict[str, Any]]: {'texts', 'audio_data'}, or None if there is nothing to claim yet
+        """
+
+    @abstractmethod
+    def restore_buffer(self, session_id: str, batch: Dict[str, Any], now: float):
+        """Put a claimed batch whose turn was cancelled back in front of the buffered messages."""
+
+    @abstractmethod
+    def finish_turn(self, session_id: str):
+        """Release the turn lease taken by claim_buffer."""
+
+    @abstractmethod
+    def is_pending(self, session_id: str, now: float) -> bool:
+        """Check whether messages are buffered or a turn is in progress."""
+
+    @abstractmethod
+    def load_context(self, session_id: str) -> ConversationContext:
+        """Get the session's conversation context (empty for a new session)."""
+
+    @abstractmethod
+    def save_context(self, session_id: str, context: ConversationContext):
+        """Store the session's conversation context after a turn."""
+
+    def apply_summary(self, session_id: str, summary: str, summarized: List[Message]) -> bool:
+        """
+        Fold messages of the stored conversation into its summary, e.g. when the summary
+        is ready only after the turn that requested it was saved.
+
+        Args:
+            session_id (str): Session id
+            summary (str): Summary covering the earlier summary and the summarized messages
+            summarized (List[Message]): The messages the summary was made from
+
+        Returns:
+            bool: Whether the summary was applied (see ConversationContext.apply_summary)
+        """
+        context = self.load_context(session_id)
+        if not context.apply_summary(summary, summarized):
+            return False
+        self.save_context(session_id, context)
+        return True
+
+class InMemorySessionStore(SessionStore):
+    def __init__(self):
+        """Initialize a session store for a single worker process."""
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.messages: Dict[str, List[Dict[str, Any]]] = {}
+        self.buffers: Dict[str, Dict[str, Any]] = {}
+        self.turn_leases: Dict[str, float] = {}
+        self.contexts: Dict[str, ConversationContext] = {}
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.sessions.get(session_id)
+
+    def create_session(self, session_id: str, region: str):
+        if session_id not in self.sessions:
+            self.sessions[session_id] = {'region': region, 'image_blob': None}
+            self.messages[session_id] = []
+
+    def set_image(self, session_id: str, image_blob: str):
+        self.sessions[session_id]['image_blob'] = image_blob
+
+    def append_message(self, session_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        messages = self.messages[session_id]
+        message = {**message, 'id': len(messages)}
+        messages.append(message)
+        return message
+
+    def get_messages(self, session_id: str, since: int = 0) -> List[Dict[str, Any]]:
+        return self.messages.get(session_id, [])[since:]
+
+    def buffer_message(self, session_id: str, text: str, due_at: float, audio_data: Optional[str] = None):
+        buffer = self.buffers.setdefault(session_id, {'texts': [], 'audio_data': None})
+        buffer['texts'].append(text)
+        buffer['due_at'] = due_at
+        if audio_data:
+            buffer['audio_data'] = audio_data
+
+    def seconds_until_claimable(self, session_id: str, now: float) -> Optional[float]:
+        buffer = self.buffers.get(session_id)
+        if buffer is None:
+            return None
+        return max(0.0, buffer['due_at'] - now, self.turn_leases.get(session_id, 0.0) - now)
+
+    def claim_buffer(self, session_id: str, now: float, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        if self.seconds_until_claimable(session_id, now) != 0.0:
+            return None
+        buffer = self.buffers.pop(session_id)
+        self.turn_leases[session_id] = now + lease_seconds
+        return {'texts': buffer['texts'], 'audio_data': buffer['audio_data']}
+
+    def restore_buffer(self, session_id: str, batch: Dict[str, Any], now: float):
+        buffer = self.buffers.setdefault(session_id, {'texts': [], 'audio_data': None, 'due_at': now})
+        buffer['texts'] = batch['texts'] + buffer['texts']
+        buffer['audio_data'] = buffer['audio_data'] or batch['audio_data']
+
+    def finish_turn(self, session_id: str):
+        self.turn_leases.pop(session_id, None)
+
+    def is_pending(self, session_id: str, now: float) -> bool:
+        return session_id in self.buffers or self.turn_leases.get(session_id, 0.0) > now
+
+    def load_context(self, session_id: str) -> ConversationContext:
+        # A copy, so a cancelled turn leaves the stored conversation untouched
+        return self.contexts.setdefault(session_id, ConversationContext()).copy()
+
+    def save_context(self, session_id: str, context: ConversationContext):
+        self.contexts[session_id] = context
+
+class SQLiteSessionStore(SessionStore):
+    shared = True
+
+    def __init__(self, db_path: str, clock: Callable[[], float] = time.time):
+        """
+        Initialize a session store in a SQLite file shared by the worker processes of one host.
+
+        Args:
+            db_path (str): SQLite database file
+            clock (Callable[[], float]): Wall-clock time source in seconds
+        """
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Autocommit mode; writes that read first use explicit IMMEDIATE transactions
+        self._db = sqlite3.connect(db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                region TEXT NOT NULL,
+                image_blob TEXT,
+                turn_lease_until REAL NOT NULL DEFAULT 0,
+                context TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (session_id, id)
+            );
+            CREATE TABLE IF NOT EXISTS buffers (
+                session_id TEXT PRIMARY KEY,
+                texts TEXT NOT NULL,
+                audio_data TEXT,
+                due_at REAL NOT NULL
+            );
+        """)
+
+    def _transaction(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run work in a write transaction that other processes cannot interleave with."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        """Run a read query."""
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT region, image_blob FROM sessions WHERE session_id = ?", (session_id,))
+        return {'region': rows[0][0], 'image_blob': rows[0][1]} if rows else None
+
+    def create_session(self, session_id: str, region: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, region, created_at) VALUES (?, ?, ?)",
+                (session_id, region, self.clock())
+            )
+
+    def set_image(self, session_id: str, image_blob: str):
+        with self._lock:
+            self._db.execute("UPDATE sessions SET image_blob = ? WHERE session_id = ?", (image_blob, session_id))
+
+    def append_message(self, session_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        def work(db):
+            next_id = db.execute(
+                "SELECT COALESCE(MAX(id) + 1, 0) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            stored = {**message, 'id': next_id}
+            db.execute(
+                "INSERT INTO messages (session_id, id, data) VALUES (?, ?, ?)",
+                (session_id, next_id, json.dumps(stored, ensure_ascii=False, default=_json_default))
+            )
+            return stored
+        return self._transaction(work)
+
+    def get_messages(self, session_id: str, since: int = 0) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT data FROM messages WHERE session_id = ? AND id >= ? ORDER BY id", (session_id, since)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def buffer_message(self, session_id: str, text: str, due_at: float, audio_data: Optional[str] = None):
+        def work(db):
+            row = db.execute("SELECT texts FROM buffers WHERE session_id = ?", (session_id,)).fetchone()
+            texts = json.loads(row[0]) if row else []
+            texts.append(text)
+            db.execute("""
+                INSERT INTO buffers (session_id, texts, audio_data, due_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET
+                    texts = excluded.texts,
+                    audio_data = COALESCE(excluded.audio_data, buffers.audio_data),
+                    due_at = excluded.due_at
+            """, (session_id, json.dumps(texts, ensure_ascii=False), audio_data, due_at))
+        self._transaction(work)
+
+    def seconds_until_claimable(self, session_id: str, now: float) -> Optional[float]:
+        rows = self._query("""
+            SELECT b.due_at, s.turn_lease_until FROM buffers b JOIN sessions s USING (session_id)
+            WHERE b.session_id = ?
+        """, (session_id,))
+        if not rows:
+            return None
+        due_at, lease_until = rows[0]
+        return max(0.0, due_at - now, lease_until - now)
+
+    def claim_buffer(self, session_id: str, now: float, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        def work(db):
+            row = db.execute("""
+                SELECT b.texts, b.audio_data FROM buffers b JOIN sessions s USING (session_id)
+                WHERE b.session_id = ? AND b.due_at <= ? AND s.turn_lease_until <= ?
+            """, (session_id, now, now)).fetchone()
+            if row is None:
+                return None
+            db.execute("DELETE FROM buffers WHERE session_id = ?", (session_id,))
+            db.execute("UPDATE sessions SET turn_lease_until = ? WHERE session_id = ?", (now + lease_seconds, session_id))
+            return {'texts': json.loads(row[0]), 'audio_data': row[1]}
+        return self._transaction(work)
+
+    def restore_buffer(self, session_id: str, batch: Dict[str, Any], now: float):
+        def work(db):
+            row = db.execute("SELECT texts FROM buffers WHERE session_id = ?", (session_id,)).fetchone()
+            texts = batch['texts'] + (json.loads(row[0]) if row else [])
+            db.execute("""
+                INSERT INTO buffers (session_id, texts, audio_data, due_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET
+                    texts = excluded.texts,
+                    audio_data = COALESCE(buffers.audio_data, excluded.audio_data)
+            """, (session_id, json.dumps(texts, ensure_ascii=False), batch['audio_data'], now))
+        self._transaction(work)
+
+    def finish_turn(self, session_id: str):
+        with self._lock:
+            self._db.execute("UPDATE sessions SET turn_lease_until = 0 WHERE session_id = ?", (session_id,))
+
+    def is_pending(self, session_id: str, now: float) -> bool:
+        rows = self._query("""
+            SELECT EXISTS (SELECT 1 FROM buffers WHERE session_id = ?)
+                OR EXISTS (SELECT 1 FROM sessions WHERE session_id = ? AND turn_lease_until > ?)
+        """, (session_id, session_id, now))
+        return bool(rows[0][0])
+
+    def load_context(self, session_id: str) -> ConversationContext:
+        rows = self._query("SELECT context FROM sessions WHERE session_id = ?", (session_id,))
+        if not rows or rows[0][0] is None:
+            return ConversationContext()
+        return ConversationContext.from_dict(json.loads(rows[0][0]))
+
+    def save_context(self, session_id: str, context: ConversationContext):
+        data = json.dumps(context.to_dict(), ensure_ascii=False, default=_json_default)
+        with self._lock:
+            self._db.execute("UPDATE sessions SET context = ? WHERE session_id = ?", (data, session_id))
+
+    def apply_summary(self, session_id: str, summary: str, summarized: List[Message]) -> bool:
+        def work(db):
+            row = db.execute("SELECT context FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if not row or row[0] is None:
+                return False
+            context = ConversationContext.from_dict(json.loads(row[0]))
+            if not context.apply_summary(summary, summarized):
+                return False
+            data = json.dumps(context.to_dict(), ensure_ascii=False, default=_json_default)
+            db.execute("UPDATE sessions SET context = ? WHERE session_id = ?", (data, session_id))
+            return True
+        return self._transaction(work)
+
+def create_session_store() -> SessionStore:
+    """Create the session store configured by the SESSION_STORE_DB env variable (in memory when unset)."""
+    db_path = os.getenv("SESSION_STORE_DB")
+    return SQLiteSessionStore(db_path) if db_path else InMemorySessionStore()
@@ -0,0 +1,99 @@
+from functools import lru_cache
+from typing import List
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+from helpers.lru_cache import LRUCache
+
+DEFAULT_TEXT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+class TextEncoder:
+    def __init__(self, model_name: str = DEFAULT_TEXT_MODEL, batch_size: int = 64, max_length: int = 256, query_cache_size: int = 2048):
+        """
+        Initialize the text encoder used for both indexing and querying product text.
+
+        Instances are also ChromaDB embedding functions, so passing one to a collection
+        makes `add(documents=...)` and `query(query_texts=...)` embed with the same model.
+
+        Args:
+            model_name (str): Hugging Face sentence-transformers model
+            batch_size (int): Number of texts per forward pass
+            max_length (int): Maximum number of tokens per text
+            query_cache_size (int): Number of single-text embeddings kept in the LRU cache
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+        self.query_cache = LRUCache(maxsize=query_cache_size)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts in batches into L2-normalized embeddings.
+
+        Texts are sorted by length before batching so each batch pads to a similar
+        length, then returned in the original order.
+
+        Args:
+            texts (List[str]): Texts to encode
+
+        Returns:
+            np.ndarray: Embedding matrix of shape (len(texts), dim)
+        """
+        if not texts:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = np.empty((len(texts), self.model.config.hidden_size), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch_indices = order[start:start + self.batch_size]
+            embeddings[batch_indices] = self._encode_batch([texts[i] for i in batch_indices])
+        return embeddings
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Run one forward pass with attention-mask-aware mean pooling."""
+        inputs = self.tokenizer(
+            texts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.max_length
+        )
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+
+        # Average only real tokens; padding positions must not dilute the embedding
+        mask = inputs['attention_mask'].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+        summed = (outputs.last_hidden_state * mask).sum(dim=1)
+        counts = mask.sum(dim=1).clamp(min=1e-9)
+        pooled = torch.nn.functional.normalize(summed / counts, p=2, dim=1)
+        return pooled.numpy()
+
+    def encode_query(self, text: str) -> List[float]:
+        """
+        Encode a single query text, reusing cached embeddings for repeated queries.
+
+        Args:
+            text (str): Query text
+
+        Returns:
+            List[float]: The query embedding
+        """
+        embedding = self.query_cache.get(text)
+        if embedding is None:
+            embedding = self.encode([text])[0].tolist()
+            self.query_cache.put(text, embedding)
+        return embedding
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts as a ChromaDB embedding function."""
+        if len(texts) == 1:
+            return [self.encode_query(texts[0])]
+        return self.encode(texts).tolist()
+
+@lru_cache(maxsize=None)
+def get_text_encoder(model_name: str = DEFAULT_TEXT_MODEL) -> TextEncoder:
+    """Get the shared text encoder so the model is loaded once per process."""
+    return TextEncoder(model_name)
@@ -0,0 +1,53 @@
+import asyncio
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from helpers.admission_control import AdmissionController
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class TestAdmissionController(unittest.IsolatedAsyncioTestCase):
+    def test_client_rate_limit(self):
+        """Clients get their burst, then wait for the sustained rate; clients are limited independently."""
+        clock = FakeClock()
+        admission = AdmissionController(client_messages_per_minute=60, client_burst=2, clock=clock)
+        self.assertIsNone(admission.check_client("a"))
+        self.assertIsNone(admission.check_client("a"))
+        self.assertEqual(admission.check_client("a"), 1.0)
+        self.assertIsNone(admission.check_client("b"))
+        clock.now = 1
+        self.assertIsNone(admission.check_client("a"))
+        self.assertEqual(admission.get_stats()['rate_limited'], 1)
+
+    async def test_bounded_concurrency_and_queue(self):
+        """Turns beyond the concurrency limit queue, and a full queue refuses new work."""
+        admission = AdmissionController(max_concurrent_turns=1, max_queued_turns=1)
+        release = asyncio.Event()
+
+        async def turn():
+            async with admission.turn_slot():
+                await release.wait()
+
+        tasks = [asyncio.ensure_future(turn()) for _ in range(2)]
+        await asyncio.sleep(0)
+        self.assertEqual((admission.running, admission.queued), (1, 1))
+        self.assertIsNotNone(admission.check_capacity())
+
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual((admission.running, admission.queued), (0, 0))
+        self.assertIsNone(admission.check_capacity())
+        self.assertEqual(admission.get_stats()['admitted_turns'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from helpers.blob_store import BlobStore, guess_content_type
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = BlobStore(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_content_addressed(self):
+        """Identical content is stored once under the same id."""
+        blob_id = self.store.put(PNG_BYTES)
+        self.assertEqual(self.store.put(PNG_BYTES), blob_id)
+        self.assertNotEqual(self.store.put(b"other"), blob_id)
+        self.assertEqual(self.store.get(blob_id), PNG_BYTES)
+        self.assertEqual(len(list(Path(self.tmp_dir.name).rglob("*"))), 4)  # Two blobs in two shard dirs
+
+    def test_unknown_and_malformed_ids(self):
+        """Unknown ids and ids that could escape the store are rejected."""
+        self.assertIsNone(self.store.get("0" * 64))
+        self.assertIsNone(self.store.get_path("../../etc/passwd"))
+
+    def test_guess_content_type(self):
+        """Image types are recognized from their signatures."""
+        self.assertEqual(guess_content_type(PNG_BYTES), "image/png")
+        self.assertEqual(guess_content_type(b"\xff\xd8\xff\xe0"), "image/jpeg")
+        self.assertEqual(guess_content_type(b"RIFF\x00\x00\x00\x00WEBPVP8 "), "image/webp")
+        self.assertEqual(guess_content_type(b"hello"), "application/octet-stream")
+
+if __name__ == '__main__':
+    unittest.main()
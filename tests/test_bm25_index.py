@@ -0,0 +1,52 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from helpers.bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+class TestBM25Index(unittest.TestCase):
+    def setUp(self):
+        """Index a few catalog-like products."""
+        self.index = BM25Index()
+        products = {
+            'p1': {'name': '42847 - Blouse - Green', 'handle': '42847-blouse-green', 'product_code': '42847'},
+            'p2': {'name': '42884 - Blouse - Black', 'handle': '42884-blouse-black', 'product_code': '42884'},
+            'p3': {'name': '20093 - Heght One Body - White', 'handle': '20093-heght-one-body-white', 'product_code': '20093'},
+        }
+        for doc_id, fields in products.items():
+            self.index.add(doc_id, fields, weights={'name': 2.0, 'product_code': 3.0})
+        self.index.finalize()
+
+    def test_tokenize_splits_handles(self):
+        """Handles and punctuation split into lowercase tokens."""
+        self.assertEqual(tokenize("42847-Blouse-GREEN!"), ["42847", "blouse", "green"])
+
+    def test_code_ranks_first(self):
+        """A product code in the query ranks its product first."""
+        hits = self.index.search("42884 blouse")
+        self.assertEqual(hits[0].doc_id, 'p2')
+        self.assertEqual(hits[0].coverage, 1.0)
+
+    def test_coverage_ignores_stopwords(self):
+        """Stopwords do not count against query coverage."""
+        hits = self.index.search("do you have a green blouse?")
+        self.assertEqual(hits[0].doc_id, 'p1')
+        self.assertEqual(hits[0].coverage, 1.0)
+        self.assertLess(hits[1].coverage, 1.0)
+
+    def test_no_match(self):
+        """Queries with unknown terms return no hits."""
+        self.assertEqual(self.index.search("denim jacket"), [])
+
+    def test_reciprocal_rank_fusion(self):
+        """Items ranked well by several retrievers win the fused ranking."""
+        fused = reciprocal_rank_fusion([['a', 'b', 'c'], ['b', 'c'], ['b']])
+        self.assertEqual(max(fused, key=fused.get), 'b')
+        self.assertGreater(fused['c'], fused['a'])
+
+if __name__ == '__main__':
+    unittest.main()
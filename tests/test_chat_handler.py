@@ -0,0 +1,77 @@
+import inspect
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.chat_handler import ChatHandler
+from services.conversation_context import ConversationContext
+from services.faq_shortcut_service import FAQShortcutService
+from tests.test_faq_shortcut import FakeRetrieval
+
+class Recorder:
+    """Stands in for a pipeline service, recording which steps ran."""
+
+    def __init__(self, calls, name, result=None):
+        self.calls = calls
+        self.name = name
+        self.result = result
+
+    async def __call__(self, *args, **kwargs):
+        self.calls.append(self.name)
+        return self.result
+
+class FakeAIService:
+    def _create_response(self, content):
+        return {'choices': [{'message': {'content': content}}]}
+
+class FakeSummarizer:
+    def schedule(self, conversation_context, session_id=None):
+        return None
+
+def create_handler(calls, relevance, faq_shortcut_relevance):
+    """Build a handler whose pipeline steps are recorders, without loading models."""
+    handler = ChatHandler.__new__(ChatHandler)
+    handler.turn_budget_seconds = None
+    handler.conversation_context = ConversationContext()
+    handler.conversation_summarizer = FakeSummarizer()
+    handler.ai_service = FakeAIService()
+    handler.prompt_builder = type('PromptBuilder', (), {'create_retrieval_context': lambda self, query, region: FakeRetrieval(region, relevance)})()
+    handler.faq_shortcut_service = FAQShortcutService(faq_shortcut_relevance) if faq_shortcut_relevance is not None else None
+    handler.follow_up_service = type('FollowUp', (), {'check_follow_up': Recorder(calls, 'follow_up')})()
+    handler.product_query_service = type('ProductQuery', (), {'check_product_query': Recorder(calls, 'product_query')})()
+    handler.query_validator = type('Validator', (), {'validate_query': Recorder(calls, 'validate', (True, ""))})()
+    answer = FakeAIService()._create_response('generated')
+    handler.lonca_query_service = type('LoncaQuery', (), {'handle_query': Recorder(calls, 'lonca_query', (answer, None))})()
+    return handler
+
+class TestFAQShortcutInPipeline(unittest.IsolatedAsyncioTestCase):
+    async def test_shortcut_is_off_by_default(self):
+        """Without an explicit threshold every turn runs the classifiers."""
+        calls = []
+        handler = create_handler(calls, relevance=0.99, faq_shortcut_relevance=None)
+        self.assertIsNone(inspect.signature(ChatHandler).parameters['faq_shortcut_relevance'].default)
+        response = await handler.process_message("How long does shipping take?", {'region': 'Europe'})
+        self.assertEqual(response['choices'][0]['message']['content'], 'generated')
+        self.assertEqual(calls, ['follow_up', 'product_query', 'validate', 'lonca_query'])
+
+    async def test_close_match_skips_classifiers(self):
+        """An enabled shortcut answers a close FAQ match without any classifier or generation."""
+        calls = []
+        handler = create_handler(calls, relevance=0.99, faq_shortcut_relevance=0.95)
+        response = await handler.process_message("How long does shipping take?", {'region': 'Europe'})
+        self.assertEqual(response['choices'][0]['message']['content'], '3-5 business days.')
+        self.assertEqual(calls, [])
+
+    async def test_loose_match_runs_classifiers(self):
+        """An enabled shortcut leaves a loosely similar query to the full pipeline."""
+        calls = []
+        handler = create_handler(calls, relevance=0.85, faq_shortcut_relevance=0.95)
+        await handler.process_message("Do you sell shipping boxes?", {'region': 'Europe'})
+        self.assertEqual(calls, ['follow_up', 'product_query', 'validate', 'lonca_query'])
+
+if __name__ == '__main__':
+    unittest.main()
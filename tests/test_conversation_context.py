@@ -0,0 +1,148 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.conversation_context import ConversationContext
+from services.conversation_summarizer import ConversationSummarizer
+from services.session_store import SQLiteSessionStore
+
+class FakeAIService:
+    """Answers every request with a fixed summary after an optional delay."""
+
+    def __init__(self, summary: str = "Customer wants red dresses.", delay: float = 0):
+        self.summary = summary
+        self.delay = delay
+        self.requests = []
+
+    async def get_response(self, system_prompt, user_prompt, image_data=None, priority=None, call_site=None):
+        self.requests.append((user_prompt, priority))
+        await asyncio.sleep(self.delay)
+        return {'choices': [{'message': {'content': self.summary}}]}
+
+class FakePromptBuilder:
+    def _load_prompt(self, filename):
+        return (project_root / "prompts" / filename).read_text(encoding="utf-8")
+
+class TestConversationContext(unittest.TestCase):
+    def test_rendering_is_cached_until_next_message(self):
+        """The rendered context is reused until a message is added."""
+        context = ConversationContext()
+        context.add_message('user', 'red dress')
+        rendered = context.get_conversation_context()
+        self.assertEqual(rendered, "Recent conversation:\nUser: red dress\n")
+        self.assertIs(context.get_conversation_context(), rendered)
+        context.add_message('assistant', 'We have 3 red dresses.')
+        self.assertIn("Assistant: We have 3 red dresses.", context.get_conversation_context())
+
+    def test_search_results_are_kept_as_references(self):
+        """Search results keep only the rendered fields and survive serialization."""
+        context = ConversationContext()
+        product = {'product_id': 'p1', 'name': 'Red Dress', 'price': 12.5, 'total_stock': 3,
+                   'image_path': 'https://example.com/p1.jpg', 'similarity': 0.9, 'search_type': 'image'}
+        context.add_search_results(product, [])
+        context.add_message('assistant', 'Red Dress is in stock.', search_results={'exact_match': product, 'similar_products': []})
+        self.assertEqual(context.last_search_results.exact_match.product_id, 'p1')
+        self.assertEqual(context.last_search_results.to_dict()['exact_match'],
+                         {'product_id': 'p1', 'name': 'Red Dress', 'price': 12.5, 'total_stock': 3, 'search_type': 'image'})
+        self.assertIn("Exact Match: Red Dress (Price: $12.5, Stock: 3 packs)\nFound via: image", context.get_conversation_context())
+
+        restored = ConversationContext.from_dict(context.to_dict())
+        self.assertEqual(restored.messages, context.messages)
+        self.assertEqual(restored.last_search_results.exact_match, context.last_search_results.exact_match)
+
+    def test_messages_get_their_own_timestamp(self):
+        """Each message is stamped when it is added."""
+        context = ConversationContext()
+        context.add_message('user', 'first')
+        time.sleep(0.001)
+        context.add_message('user', 'second')
+        self.assertLess(context.messages[0].timestamp, context.messages[1].timestamp)
+
+    def test_history_is_bounded(self):
+        """Messages beyond max_messages are dropped when nothing summarizes them."""
+        context = ConversationContext(max_recent_messages=2, max_messages=4)
+        for i in range(6):
+            context.add_message('user', f'message {i}')
+        self.assertEqual([m.content for m in context.messages], ['message 2', 'message 3', 'message 4', 'message 5'])
+        self.assertEqual([m.content for m in context.messages_to_summarize()], ['message 2', 'message 3'])
+
+    def test_summary_replaces_summarized_messages(self):
+        """An applied summary is rendered before the messages it does not cover."""
+        context = ConversationContext(max_recent_messages=1)
+        context.add_message('user', 'red dress')
+        context.add_message('user', 'in size M')
+        self.assertTrue(context.apply_summary("Wants a red dress.", context.messages_to_summarize()))
+        self.assertEqual(
+            context.get_conversation_context(),
+            "Summary of earlier conversation:\nWants a red dress.\n\nRecent conversation:\nUser: in size M\n"
+        )
+        restored = ConversationContext.from_dict(context.to_dict())
+        self.assertEqual(restored.get_conversation_context(), context.get_conversation_context())
+
+    def test_stale_summary_is_ignored(self):
+        """A summary of messages that were dropped meanwhile is not applied."""
+        context = ConversationContext(max_recent_messages=1, max_messages=2)
+        context.add_message('user', 'first')
+        context.add_message('user', 'second')
+        summarized = context.messages_to_summarize()
+        context.add_message('user', 'third')
+        self.assertFalse(context.apply_summary("About the first message.", summarized))
+        self.assertIsNone(context.summary)
+
+class TestConversationSummarizer(unittest.IsolatedAsyncioTestCase):
+    async def test_summary_is_made_in_background(self):
+        """Old messages are folded into the summary without the caller waiting."""
+        ai_service = FakeAIService(delay=0.05)
+        summarizer = ConversationSummarizer(ai_service, FakePromptBuilder(), min_messages=2)
+        context = ConversationContext(max_recent_messages=4)
+        for text in ['red dress', 'Here are red dresses.', 'size M?', 'Yes, M is in stock.']:
+            context.add_message('user', text)
+        self.assertIsNone(summarizer.schedule(context))  # Nothing has left the window yet
+
+        context.add_message('user', 'blue ones?')
+        context.add_message('user', 'price?')
+        task = summarizer.schedule(context)
+        self.assertIsNotNone(task)
+        self.assertIsNone(summarizer.schedule(context))  # One summary per conversation at a time
+        context.add_message('user', 'thanks')
+        await task
+        self.assertEqual(context.summary, "Customer wants red dresses.")
+        self.assertEqual([m.content for m in context.messages], ['size M?', 'Yes, M is in stock.', 'blue ones?', 'price?', 'thanks'])
+        self.assertIn("User: Here are red dresses.", ai_service.requests[0][0])
+
+    async def test_summary_of_stored_session_survives(self):
+        """A summary that is ready after the turn saved the conversation is saved to the store."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        store = SQLiteSessionStore(os.path.join(tmp_dir.name, "sessions.db"))
+        store.create_session("s1", "Europe")
+        ai_service = FakeAIService(delay=0.05)
+        summarizer = ConversationSummarizer(ai_service, FakePromptBuilder(), min_messages=2, session_store=store)
+
+        # First turn: two messages have left the window; the turn saves before the summary is ready
+        context = store.load_context("s1")
+        for i in range(context.max_recent_messages + 2):
+            context.add_message('user', f'message {i}')
+        task = summarizer.schedule(context, session_id="s1")
+        store.save_context("s1", context)
+
+        # Second turn loads its own copy while the summary is still running
+        second_turn = store.load_context("s1")
+        self.assertIsNone(summarizer.schedule(second_turn, session_id="s1"))
+        await task
+
+        stored = store.load_context("s1")
+        self.assertEqual(stored.summary, "Customer wants red dresses.")
+        self.assertEqual(stored.messages[0].content, 'message 2')
+        self.assertEqual(len(ai_service.requests), 1)
+
+if __name__ == '__main__':
+    unittest.main()
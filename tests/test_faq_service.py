@@ -0,0 +1,142 @@
+import unittest
+import tempfile
+import shutil
+import sys
+from pathlib import Path
+from unittest import mock
+import pandas as pd
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.faq_service import FAQService
+from helpers.semantic_cache import SemanticCache
+
+class FakeCollection:
+    def __init__(self):
+        self.metadata = {}
+        self.rows = {}
+        self.queries = []
+        self.upserted = []
+        self.deleted = []
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, include=None):
+        ids = list(self.rows)
+        return {'ids': ids, 'metadatas': [self.rows[doc_id] for doc_id in ids]}
+
+    def query(self, query_embeddings, n_results, where=None):
+        self.queries.append(where)
+        ids = [doc_id for doc_id, metadata in self.rows.items() if not where or metadata['region'] == where['region']]
+        ids = ids[:n_results]
+        return {
+            'ids': [ids],
+            'metadatas': [[self.rows[doc_id] for doc_id in ids]],
+            'distances': [[0.2] * len(ids)]
+        }
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserted.append(list(ids))
+        self.rows.update(zip(ids, metadatas))
+
+    def delete(self, ids):
+        self.deleted.append(list(ids))
+        for doc_id in ids:
+            del self.rows[doc_id]
+
+    def modify(self, metadata):
+        self.metadata = metadata
+
+class TestFAQService(unittest.TestCase):
+    def setUp(self):
+        """Create an FAQ service over a fake collection, without loading a spreadsheet or model."""
+        self.service = FAQService.__new__(FAQService)
+        self.service.collection = FakeCollection()
+        self.service.embedding_function = lambda documents: [[1.0, 0.0] for _ in documents]
+        self.service.cache = SemanticCache()
+        self.service.collection.rows = {
+            'q1_rEurope': {'question_id': 'q1', 'question': 'Can I get samples?', 'answer': 'Yes.', 'region': 'Europe'},
+            'q1_rTurkey': {'question_id': 'q1', 'question': 'Can I get samples?', 'answer': 'Evet.', 'region': 'Turkey'},
+        }
+        self.service.regions = self.service._load_regions()
+
+    def test_known_region_filters_in_chroma(self):
+        """A known region is passed to the collection as a where clause."""
+        faqs = self.service.get_relevant_faqs("Can I get samples?", region="Turkey")
+        self.assertEqual([faq['answer'] for faq in faqs], ['Evet.'])
+        self.assertEqual(self.service.collection.queries, [{'region': 'Turkey'}])
+
+    def test_unknown_region_returns_no_faqs(self):
+        """A region without answers returns no FAQs instead of querying Chroma with an empty filter."""
+        self.assertEqual(self.service.get_relevant_faqs("Can I get samples?", region="Atlantis"), [])
+        self.assertFalse(self.service.has_relevant_faqs("Can I get samples?", region="Atlantis"))
+        self.assertEqual(self.service.collection.queries, [])
+
+class TestFAQSync(unittest.TestCase):
+    def setUp(self):
+        """Sync a two-question, two-region sheet into an empty fake collection."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.service = FAQService.__new__(FAQService)
+        self.service.faq_file = Path(self.tmp_dir) / "LoncaFAQs.xlsx"
+        self.service.collection = FakeCollection()
+        self.service.embedding_function = lambda documents: [[1.0, 0.0] for _ in documents]
+        self.service.cache = SemanticCache()
+        self.sheet = pd.DataFrame({
+            'Question': ['Can I get samples?', 'How long does shipping take?'],
+            'Europe': ['Yes.', '3-5 days.'],
+            'Turkey': ['Evet.', '1-2 days.']
+        })
+        self.stats = self.sync(b"v1")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def sync(self, file_bytes):
+        """Write new spreadsheet bytes and sync the current sheet."""
+        self.service.faq_file.write_bytes(file_bytes)
+        self.service.collection.upserted.clear()
+        self.service.collection.deleted.clear()
+        with mock.patch('services.faq_service.pd.read_excel', return_value=self.sheet.copy()) as read_excel:
+            stats = self.service.sync_faqs()
+        self.read_calls = read_excel.call_count
+        return stats
+
+    def ids_for(self, question, region):
+        """Get the collection id of a question's answer in a region."""
+        return [doc_id for doc_id, metadata in self.service.collection.rows.items()
+                if metadata['question'] == question and metadata['region'] == region]
+
+    def test_initial_sync(self):
+        """Every answer is embedded once and the file digest is stored with the collection."""
+        self.assertEqual(self.stats, {'upserted': 4, 'deleted': 0, 'unchanged': 0})
+        self.assertEqual(self.service.collection.count(), 4)
+        self.assertEqual(self.service.collection.metadata['faq_file_digest'], self.service._faq_file_digest())
+        self.assertEqual(self.service.regions, ['Europe', 'Turkey'])
+
+    def test_unchanged_sheet_is_a_no_op(self):
+        """A sheet with the stored digest is neither read nor written."""
+        self.assertEqual(self.sync(b"v1"), {'upserted': 0, 'deleted': 0, 'unchanged': 4})
+        self.assertEqual(self.read_calls, 0)
+        self.assertEqual(self.service.collection.upserted, [])
+        self.assertEqual(self.service.collection.deleted, [])
+
+    def test_edited_answer_upserts_one_id(self):
+        """Only the answer whose content hash changed is re-embedded."""
+        self.sheet.loc[1, 'Turkey'] = '2-3 days.'
+        self.assertEqual(self.sync(b"v2"), {'upserted': 1, 'deleted': 0, 'unchanged': 3})
+        self.assertEqual(self.service.collection.upserted, [self.ids_for('How long does shipping take?', 'Turkey')])
+        self.assertEqual(self.service.collection.rows[self.service.collection.upserted[0][0]]['answer'], '2-3 days.')
+
+    def test_removed_region_answer_is_deleted(self):
+        """Clearing a region's answer deletes that question and region pair only."""
+        removed_ids = self.ids_for('Can I get samples?', 'Europe')
+        self.sheet.loc[0, 'Europe'] = None
+        self.assertEqual(self.sync(b"v3"), {'upserted': 0, 'deleted': 1, 'unchanged': 3})
+        self.assertEqual(self.service.collection.deleted, [removed_ids])
+        self.assertTrue(self.ids_for('Can I get samples?', 'Turkey'))
+
+if __name__ == '__main__':
+    unittest.main()
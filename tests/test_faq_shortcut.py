@@ -0,0 +1,44 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.conversation_context import ConversationContext
+from services.faq_shortcut_service import FAQShortcutService
+
+class FakeRetrieval:
+    """Retrieval whose FAQs are given instead of searched."""
+
+    def __init__(self, region, relevance):
+        self.region = region
+        self.top_faq = {'question': 'How long does shipping take?', 'answer': '3-5 business days.',
+                        'region': region, 'relevance': relevance}
+
+class TestFAQShortcutService(unittest.TestCase):
+    def setUp(self):
+        self.shortcut = FAQShortcutService(min_relevance=0.95)
+        self.context = ConversationContext()
+
+    def test_close_match_is_answered_directly(self):
+        """A regional FAQ above the threshold is answered with its stored answer."""
+        self.assertEqual(self.shortcut.try_answer(FakeRetrieval('Europe', 0.97), self.context), '3-5 business days.')
+        self.assertEqual(self.shortcut.stats()['served'], 1)
+
+    def test_loose_match_takes_full_pipeline(self):
+        """A merely similar question is not answered from the FAQ."""
+        self.assertIsNone(self.shortcut.try_answer(FakeRetrieval('Europe', 0.9), self.context))
+
+    def test_turns_needing_checks_take_full_pipeline(self):
+        """Images, an open product and an unknown region always go through the classifiers."""
+        retrieval = FakeRetrieval('Europe', 0.99)
+        self.assertIsNone(self.shortcut.try_answer(retrieval, self.context, has_image=True))
+        self.assertIsNone(self.shortcut.try_answer(FakeRetrieval(None, 0.99), self.context))
+        self.context.add_search_results({'product_id': 'p1', 'name': 'Red Dress', 'price': 12}, [])
+        self.assertIsNone(self.shortcut.try_answer(retrieval, self.context))
+        self.assertEqual(self.shortcut.stats()['served'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
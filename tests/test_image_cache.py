@@ -0,0 +1,130 @@
+import unittest
+import asyncio
+import tempfile
+import shutil
+import sys
+from pathlib import Path
+import aiohttp
+from aiohttp import web
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from helpers.image_cache import ImageCache
+
+class TestImageCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        """Start a local image server that supports ETag revalidation."""
+        self.cache_dir = tempfile.mkdtemp()
+        self.requests = []
+        self.images = {'/a': b'image-a' * 100, '/b': b'image-b' * 100, '/c': b'image-a' * 100}
+
+        async def serve(request):
+            self.requests.append(request.path)
+            body = self.images[request.path]
+            etag = f'"{hash(body)}"'
+            if request.headers.get('If-None-Match') == etag:
+                return web.Response(status=304)
+            return web.Response(body=body, headers={'ETag': etag})
+
+        app = web.Application()
+        app.router.add_get('/{name}', serve)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.session = aiohttp.ClientSession()
+
+    async def test_revalidates_unchanged_images(self):
+        """A second fetch sends a conditional request and reuses the cached bytes."""
+        cache = ImageCache(self.cache_dir)
+        first = await cache.fetch(self.session, f"{self.base_url}/a")
+        second = await cache.fetch(self.session, f"{self.base_url}/a")
+        self.assertEqual(first, second)
+        self.assertEqual(cache.stats['downloaded'], 1)
+        self.assertEqual(cache.stats['revalidated'], 1)
+
+    async def test_downloads_changed_images(self):
+        """A changed image is downloaded again and replaces the cached copy."""
+        cache = ImageCache(self.cache_dir)
+        await cache.fetch(self.session, f"{self.base_url}/a")
+        self.images['/a'] = b'changed'
+        self.assertEqual(await cache.fetch(self.session, f"{self.base_url}/a"), b'changed')
+        self.assertEqual(cache.stats['downloaded'], 2)
+
+    async def test_fresh_entries_skip_the_network(self):
+        """Entries younger than max_age_seconds are served without any request."""
+        cache = ImageCache(self.cache_dir, max_age_seconds=3600)
+        await cache.fetch(self.session, f"{self.base_url}/a")
+        await cache.fetch(self.session, f"{self.base_url}/a")
+        self.assertEqual(self.requests, ['/a'])
+
+    async def test_offline_mode(self):
+        """Offline caches serve what they have and never hit the network."""
+        await ImageCache(self.cache_dir).fetch(self.session, f"{self.base_url}/a")
+        offline_cache = ImageCache(self.cache_dir, offline=True)
+        self.assertEqual(await offline_cache.fetch(self.session, f"{self.base_url}/a"), self.images['/a'])
+        self.assertIsNone(await offline_cache.fetch(self.session, f"{self.base_url}/b"))
+        self.assertEqual(self.requests, ['/a'])
+
+    async def test_identical_content_is_stored_once(self):
+        """URLs with identical bytes share a single blob."""
+        cache = ImageCache(self.cache_dir)
+        await cache.fetch(self.session, f"{self.base_url}/a")
+        await cache.fetch(self.session, f"{self.base_url}/c")
+        blobs = [p for p in (Path(self.cache_dir) / "blobs").rglob("*") if p.is_file()]
+        self.assertEqual(len(blobs), 1)
+
+    async def test_lru_eviction(self):
+        """The least recently used image is evicted once the size bound is exceeded."""
+        cache = ImageCache(self.cache_dir, max_size_mb=0.001)
+        await cache.fetch(self.session, f"{self.base_url}/a")
+        await cache.fetch(self.session, f"{self.base_url}/b")
+        self.assertIsNone(cache.get(f"{self.base_url}/a"))
+        self.assertEqual(cache.get(f"{self.base_url}/b"), self.images['/b'])
+        self.assertEqual(cache.stats['evicted'], 1)
+
+    async def test_recently_hit_image_survives_eviction(self):
+        """Batched cache hits still count as recent use when the cache evicts."""
+        cache = ImageCache(self.cache_dir, max_size_mb=0.0015, access_flush_seconds=3600)
+        await cache.fetch(self.session, f"{self.base_url}/a")
+        await cache.fetch(self.session, f"{self.base_url}/b")
+        cache.get(f"{self.base_url}/a")
+        self.images['/d'] = b'image-d' * 100
+        await cache.fetch(self.session, f"{self.base_url}/d")
+        self.assertEqual(cache.get(f"{self.base_url}/a"), self.images['/a'])
+        self.assertIsNone(cache.get(f"{self.base_url}/b"))
+
+    async def test_size_total_follows_replaced_images(self):
+        """The running size total matches the blobs on disk after images change."""
+        cache = ImageCache(self.cache_dir)
+        await cache.fetch(self.session, f"{self.base_url}/a")
+        await cache.fetch(self.session, f"{self.base_url}/c")
+        self.images['/a'] = b'changed'
+        await cache.fetch(self.session, f"{self.base_url}/a")
+        blobs = [p for p in (Path(self.cache_dir) / "blobs").rglob("*") if p.is_file()]
+        self.assertEqual(cache._total_bytes, sum(p.stat().st_size for p in blobs))
+        self.assertEqual(ImageCache(self.cache_dir)._total_bytes, cache._total_bytes)
+
+    async def test_blob_deleted_after_lookup_is_downloaded_again(self):
+        """A blob removed by another process between lookup and read is a miss, not an error."""
+        cache = ImageCache(self.cache_dir, max_age_seconds=3600)
+        url = f"{self.base_url}/a"
+        await cache.fetch(self.session, url)
+        entry = cache._get_entry(url)
+        cache._blob_path(entry['sha256']).unlink()
+        self.assertIsNone(cache._read(url, entry))
+        self.assertEqual(await cache.fetch(self.session, url), self.images['/a'])
+        self.assertEqual(self.requests, ['/a', '/a'])
+
+    async def asyncTearDown(self):
+        """Stop the server and remove the cache."""
+        await self.session.close()
+        await self.runner.cleanup()
+        shutil.rmtree(self.cache_dir)
+
+if __name__ == '__main__':
+    unittest.main()
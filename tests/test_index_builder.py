@@ -0,0 +1,71 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from PIL import Image
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.index_builder import IndexBuilder
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class FakeImageCache:
+    """Serves the same image for every URL without the network."""
+
+    def __init__(self):
+        self.data = png_bytes()
+        self.stats = {}
+
+    async def fetch(self, session, url):
+        return self.data
+
+    def flush(self):
+        pass
+
+class FailingImageEncoder:
+    """Decodes images but fails on the first forward pass."""
+    model_name = "fake"
+
+    def to_tensor(self, image):
+        return image.size
+
+    def extract_features_batch(self, tensors):
+        raise RuntimeError("CUDA out of memory")
+
+class TestIndexBuilder(unittest.IsolatedAsyncioTestCase):
+    async def test_encoder_error_fails_build(self):
+        """An error in one stage cancels the others and fails the build instead of hanging it."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        catalog_path = os.path.join(tmp_dir.name, "catalog.json")
+        products = [{'id': str(i), 'name': f'Dress {i}', 'price': 10, 'image_path': f'https://example.com/{i}.jpg'} for i in range(50)]
+        with open(catalog_path, 'w') as f:
+            json.dump({'products': products}, f)
+
+        builder = IndexBuilder(
+            catalog_path=catalog_path,
+            index_root=os.path.join(tmp_dir.name, "index"),
+            image_encoder=FailingImageEncoder(),
+            text_embedding_function=lambda texts: [[0.0] for _ in texts],
+            image_cache=FakeImageCache(),
+            download_workers=2,
+            decode_workers=2,
+            encode_batch_size=4,
+            queue_size=2
+        )
+        with self.assertRaisesRegex(RuntimeError, "CUDA out of memory"):
+            await asyncio.wait_for(builder.build_async(), timeout=10)
+        self.assertFalse(os.path.exists(os.path.join(tmp_dir.name, "index", "current")))
+
+if __name__ == '__main__':
+    unittest.main()
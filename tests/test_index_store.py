@@ -0,0 +1,57 @@
+import unittest
+import tempfile
+import shutil
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from helpers.index_store import (
+    IMAGE_INDEX_ARTIFACT,
+    create_staging_dir,
+    get_current_index_version,
+    load_index_artifact,
+    load_index_manifest,
+    publish_index_version,
+    write_artifact,
+)
+
+class TestIndexStore(unittest.TestCase):
+    def setUp(self):
+        """Create an empty index root."""
+        self.index_root = tempfile.mkdtemp()
+
+    def _publish(self, version: str, data, keep_versions: int = 3):
+        staging_dir = create_staging_dir(version, self.index_root)
+        write_artifact(staging_dir, IMAGE_INDEX_ARTIFACT, data)
+        publish_index_version(staging_dir, version, {'version': version}, self.index_root, keep_versions)
+
+    def test_nothing_published(self):
+        """Readers see no index before the first publish."""
+        self.assertIsNone(get_current_index_version(self.index_root))
+        self.assertIsNone(load_index_artifact(IMAGE_INDEX_ARTIFACT, self.index_root))
+
+    def test_publish_switches_current_version(self):
+        """Publishing makes the new artifacts and manifest current."""
+        self._publish("v1", {'a': 1})
+        self._publish("v2", {'a': 2})
+        self.assertEqual(get_current_index_version(self.index_root), "v2")
+        self.assertEqual(load_index_artifact(IMAGE_INDEX_ARTIFACT, self.index_root), {'a': 2})
+        self.assertEqual(load_index_manifest(self.index_root)['version'], "v2")
+        self.assertFalse(any(p.name.startswith('.staging') for p in Path(self.index_root).iterdir()))
+
+    def test_old_versions_are_pruned(self):
+        """Only the newest keep_versions versions stay on disk."""
+        for version in ("v1", "v2", "v3", "v4"):
+            self._publish(version, {}, keep_versions=2)
+        versions = sorted(p.name for p in Path(self.index_root).iterdir() if p.is_dir())
+        self.assertEqual(versions, ["v3", "v4"])
+
+    def tearDown(self):
+        """Remove the index root."""
+        shutil.rmtree(self.index_root)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.conversation_context import ConversationContext
+from services.intent_classifier import IntentClassifier
+from services.query_validator import QueryValidator
+from helpers.prompt_budget import PromptBudget
+
+class FakeTextEncoder:
+    """Passes the text through as its own embedding."""
+    model_name = "fake"
+
+    def encode_query(self, text):
+        return text
+
+class FakeModel:
+    """Returns a fixed probability of "yes" per text."""
+
+    def __init__(self, probabilities):
+        self.probabilities = probabilities
+
+    def predict_proba(self, embeddings):
+        return [[1 - self.probabilities[text], self.probabilities[text]] for text in embeddings]
+
+class FakeAIService:
+    def __init__(self, answer="yes"):
+        self.answer = answer
+        self.classified = []
+
+    async def classify(self, system_prompt, user_prompt, model=None, cache=False, call_site=None):
+        self.classified.append(user_prompt)
+        return self.answer
+
+class FakePromptBuilder:
+    prompt_budget = PromptBudget(token_estimator=lambda text: len(text.split()))
+
+    def _load_context(self):
+        return {'business_type': 'wholesale fashion', 'company': 'Lonca', 'valid_topics': ['products'], 'invalid_topics': ['weather']}
+
+    def _load_prompt(self, filename):
+        return (project_root / "prompts" / filename).read_text(encoding="utf-8")
+
+class FakeResponseBuilder:
+    async def generate_response(self, query, conversation_context):
+        return "I can only help with Lonca products."
+
+class TestIntentClassifier(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.log_path = os.path.join(tmp_dir.name, "decisions.jsonl")
+
+    def create_classifier(self, probabilities, **kwargs) -> IntentClassifier:
+        classifier = IntentClassifier("lonca_query", text_encoder=FakeTextEncoder(), model_path=self.log_path + ".missing",
+                                      decision_log=self.log_path, **kwargs)
+        classifier.model = FakeModel(probabilities)
+        return classifier
+
+    async def test_confident_predictions_are_decided_locally(self):
+        """Predictions at or above the threshold skip the LLM, those below it do not."""
+        classifier = self.create_classifier({'red dress': 0.95, 'weather today': 0.02, 'shipping?': 0.85}, confidence_threshold=0.9)
+        self.assertEqual((await classifier.decide('red dress'))[0], True)
+        self.assertEqual((await classifier.decide('weather today'))[0], False)
+        decision, prediction = await classifier.decide('shipping?')
+        self.assertIsNone(decision)
+        self.assertEqual(prediction[0], True)
+        self.assertEqual(classifier.stats['local_decisions'], 2)
+
+    async def test_follow_ups_are_only_accepted_locally(self):
+        """In a running conversation a confident "no" still goes to the LLM, a confident "yes" does not."""
+        classifier = self.create_classifier({'and in blue?': 0.03, 'red dress': 0.97})
+        self.assertIsNone((await classifier.decide('and in blue?', follow_up=True))[0])
+        self.assertEqual((await classifier.decide('red dress', follow_up=True))[0], True)
+
+    async def test_shadow_mode_always_asks_the_llm(self):
+        """Shadow mode predicts but leaves every decision to the LLM."""
+        classifier = self.create_classifier({'red dress': 0.99}, shadow=True)
+        decision, prediction = await classifier.decide('red dress')
+        self.assertIsNone(decision)
+        classifier.record_llm_decision('red dress', True, prediction)
+        self.assertEqual(classifier.get_stats()['shadow_agreement_rate'], 1.0)
+
+    async def test_without_model_the_llm_decides(self):
+        """Without a trained model nothing is decided locally."""
+        classifier = IntentClassifier("lonca_query", text_encoder=FakeTextEncoder(), model_path=self.log_path + ".missing",
+                                      decision_log=self.log_path)
+        self.assertEqual(await classifier.decide('red dress'), (None, None))
+
+    def test_decision_log_is_rotated(self):
+        """The decision log is moved aside once it reaches max_log_bytes."""
+        classifier = self.create_classifier({}, max_log_bytes=200)
+        for i in range(10):
+            classifier.record_llm_decision(f'query {i}', True)
+        self.assertLess(os.path.getsize(self.log_path), 400)
+        self.assertTrue(os.path.exists(self.log_path + ".1"))
+
+class TestQueryValidator(unittest.IsolatedAsyncioTestCase):
+    def create_validator(self, probabilities, ai_service) -> QueryValidator:
+        classifier = IntentClassifier("lonca_query", text_encoder=FakeTextEncoder(), model_path="missing.pkl",
+                                      decision_log=os.devnull)
+        classifier.model = FakeModel(probabilities)
+        return QueryValidator(ai_service, FakePromptBuilder(), FakeResponseBuilder(), intent_classifier=classifier)
+
+    async def test_follow_up_rejected_locally_is_checked_by_llm(self):
+        """A follow-up the local model would reject is passed to the LLM, which sees the conversation."""
+        ai_service = FakeAIService("yes")
+        validator = self.create_validator({'and in blue?': 0.01}, ai_service)
+        context = ConversationContext()
+        context.add_message('user', 'Do you have this dress in red?')
+        context.add_message('assistant', 'Yes, the Floral Midi Dress comes in red.')
+        context.add_message('user', 'and in blue?')
+        self.assertEqual(await validator.validate_query('and in blue?', context), (True, ""))
+        self.assertEqual(len(ai_service.classified), 1)
+
+    async def test_first_message_rejected_locally(self):
+        """Without a previous turn a confident rejection skips the LLM."""
+        ai_service = FakeAIService("yes")
+        validator = self.create_validator({'weather today': 0.01}, ai_service)
+        context = ConversationContext()
+        context.add_message('user', 'weather today')
+        is_valid, response = await validator.validate_query('weather today', context)
+        self.assertFalse(is_valid)
+        self.assertEqual(ai_service.classified, [])
+
+if __name__ == '__main__':
+    unittest.main()
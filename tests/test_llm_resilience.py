@@ -0,0 +1,192 @@
+import os
+import json
+import asyncio
+import time
+import unittest
+from unittest import mock
+import sys
+from pathlib import Path
+from aiohttp import web
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from helpers.llm_resilience import CircuitBreaker, LatencyTracker, backoff_delay, parse_retry_after, remaining_turn_budget, turn_budget
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class TestResiliencePrimitives(unittest.TestCase):
+    def test_circuit_breaker(self):
+        """The circuit opens after repeated failures and closes after a successful trial."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+        clock.now = 10
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # Only one trial call at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+
+        clock.now = 20
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_backoff(self):
+        """Retry-After wins over jittered exponential backoff, both capped."""
+        self.assertEqual(backoff_delay(0, 0.5, 8.0, retry_after=3), 3)
+        self.assertEqual(backoff_delay(0, 0.5, 8.0, retry_after=60), 8.0)
+        for attempt in range(6):
+            self.assertLessEqual(backoff_delay(attempt, 0.5, 8.0), min(8.0, 0.5 * 2 ** attempt))
+        self.assertEqual(parse_retry_after("2"), 2.0)
+        self.assertIsNone(parse_retry_after("soon"))
+
+    def test_latency_percentile(self):
+        """Percentiles cover only the rolling window."""
+        tracker = LatencyTracker(window=10, min_samples=5)
+        self.assertIsNone(tracker.percentile(95))
+        for seconds in [100.0] * 10 + [float(i) for i in range(10)]:
+            tracker.record(seconds)
+        self.assertEqual(tracker.percentile(95), 9.0)
+        self.assertEqual(tracker.percentile(0), 0.0)
+
+    def test_turn_budget(self):
+        """The turn budget is visible only inside its context."""
+        self.assertIsNone(remaining_turn_budget())
+        with turn_budget(5):
+            self.assertLessEqual(remaining_turn_budget(), 5)
+        self.assertIsNone(remaining_turn_budget())
+
+class TestAIServiceRetries(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        """Start a local chat completions server that fails before answering."""
+        os.environ.setdefault("OPENAI_API_KEY", "test-key")
+        from services.ai_service import AIService
+        from helpers.llm_scheduler import LLMScheduler
+
+        self.statuses = []
+        self.delay = 0.0
+        self.abandoned_requests = 0
+        self.completions = 0
+
+        async def complete(request):
+            self.completions += 1
+            deadline = time.monotonic() + self.delay
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.02)
+                if request.transport is None or request.transport.is_closing():
+                    self.abandoned_requests += 1
+                    return web.Response()
+            if self.statuses:
+                status = self.statuses.pop(0)
+                return web.Response(status=status, headers={'Retry-After': '0'})
+            return web.json_response({'choices': [{'message': {'content': json.dumps({'label': 'yes'})}}]})
+
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', complete)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        self.ai_service = AIService(
+            max_retries=2,
+            circuit_breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60),
+            scheduler=LLMScheduler(token_estimator=len)
+        )
+        self.ai_service.api_url = f"http://127.0.0.1:{port}/v1/chat/completions"
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+
+    async def test_retries_transient_errors(self):
+        """429 and 5xx responses are retried."""
+        self.statuses = [429, 503]
+        self.assertEqual(await self.ai_service.classify("Classify", "Query: hi", cache=False), "yes")
+        self.assertEqual(self.ai_service.stats['retries'], 2)
+
+    async def test_only_classifications_are_cached(self):
+        """Identical classifications are answered from the cache, sampled responses are not."""
+        from helpers.response_cache import ResponseCache
+        self.ai_service.response_cache = ResponseCache()
+        for _ in range(2):
+            self.assertEqual(await self.ai_service.classify("Classify", "Query: hi", cache=True), "yes")
+        self.assertEqual(self.completions, 1)
+        for _ in range(2):
+            await self.ai_service.get_response("System", "User")
+        self.assertEqual(self.completions, 3)
+
+    async def test_classifications_are_not_cached_by_default(self):
+        """Classifications skip the cache unless the call site passes cache=True."""
+        from helpers.response_cache import ResponseCache
+        self.ai_service.response_cache = ResponseCache()
+        for _ in range(2):
+            self.assertEqual(await self.ai_service.classify("Classify", "Query: hi"), "yes")
+        self.assertEqual(self.completions, 2)
+        stats = self.ai_service.response_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 0))
+
+    async def test_circuit_fast_fails_to_fallback(self):
+        """Exhausted retries open the circuit, after which calls fail fast with the fallback reply."""
+        self.statuses = [500, 500, 500]
+        response = await self.ai_service.get_response("System", "User")
+        self.assertIn('error', response)
+        self.assertTrue(response['choices'][0]['message']['content'])
+
+        start = time.monotonic()
+        response = await self.ai_service.get_response("System", "User")
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(self.ai_service.stats['circuit_rejections'], 1)
+
+    async def test_client_errors_are_not_retried(self):
+        """4xx responses other than 429 fail immediately."""
+        self.statuses = [400]
+        self.assertIsNone(await self.ai_service.classify("Classify", "Query: hi", cache=False))
+        self.assertEqual(self.ai_service.stats['retries'], 0)
+        self.assertEqual(self.ai_service.circuit_breaker.state, "closed")
+
+    async def test_cancellation_closes_request(self):
+        """Cancelling a call closes its upstream request and leaves the circuit usable."""
+        self.delay = 5.0
+        self.ai_service.circuit_breaker.opened_at = -60  # Half open: the next call is the trial
+        task = asyncio.ensure_future(self.ai_service.get_response("System", "User"))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.abandoned_requests, 1)
+        self.assertTrue(self.ai_service.circuit_breaker.allow())
+
+    async def test_deadline_spent_in_queue_fails_fast(self):
+        """A request whose deadline passed while queued is not sent without a timeout."""
+        from helpers.llm_resilience import UpstreamError
+        clock = FakeClock()
+        original_acquire = self.ai_service.scheduler.acquire
+
+        async def slow_acquire(*args, **kwargs):
+            await original_acquire(*args, **kwargs)
+            clock.now += 5.0  # The whole deadline is spent waiting for the rate limiter
+
+        self.ai_service.scheduler.acquire = slow_acquire
+        payload = {'messages': [{'role': 'user', 'content': 'hi'}]}
+        with mock.patch('services.ai_service.time', mock.Mock(monotonic=clock)):
+            with self.assertRaises(UpstreamError) as error:
+                await self.ai_service._send({}, payload, timeout=1.0, priority=0)
+        self.assertFalse(error.exception.retryable)
+        self.assertEqual(self.ai_service.stats['requests'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import asyncio
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from helpers.llm_scheduler import IMAGE_TOKENS, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMScheduler, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refill(self):
+        """The bucket refills over time up to its capacity."""
+        clock = FakeClock()
+        bucket = TokenBucket(capacity=10, refill_per_second=2, clock=clock)
+        self.assertEqual(bucket.time_until_available(10), 0)
+        bucket.consume(10)
+        self.assertEqual(bucket.time_until_available(4), 2)
+        clock.now = 100
+        self.assertEqual(bucket.tokens, 0)
+        self.assertEqual(bucket.time_until_available(10), 0)
+        self.assertEqual(bucket.tokens, 10)
+
+    def test_oversized_request_waits_for_full_bucket(self):
+        """A request larger than the capacity is not starved forever."""
+        clock = FakeClock()
+        bucket = TokenBucket(capacity=10, refill_per_second=1, clock=clock)
+        self.assertEqual(bucket.time_until_available(50), 0)
+        bucket.consume(50)
+        self.assertEqual(bucket.time_until_available(50), 50)
+
+class TestLLMScheduler(unittest.IsolatedAsyncioTestCase):
+    def test_estimate_tokens(self):
+        """Estimates cover text, images and the completion limit."""
+        scheduler = LLMScheduler(token_estimator=len)
+        payload = {
+            'max_tokens': 16,
+            'messages': [
+                {'role': 'system', 'content': 'abcd'},
+                {'role': 'user', 'content': [
+                    {'type': 'text', 'text': 'ab'},
+                    {'type': 'image_url', 'image_url': {'url': 'data:'}},
+                ]},
+            ],
+        }
+        self.assertEqual(scheduler.estimate_tokens(payload), 16 + 4 + 2 + IMAGE_TOKENS)
+
+    async def test_queues_instead_of_failing(self):
+        """Requests beyond the rate limit wait for capacity."""
+        scheduler = LLMScheduler(requests_per_minute=60, tokens_per_minute=6000, token_estimator=len)
+        scheduler.requests.tokens = 1
+        await scheduler.acquire(10)
+        waiter = asyncio.ensure_future(scheduler.acquire(10))
+        await asyncio.sleep(0.1)
+        self.assertFalse(waiter.done())
+        await asyncio.wait_for(waiter, timeout=2)
+        self.assertEqual(scheduler.get_stats()['queued'], 1)
+
+    async def test_interactive_requests_go_first(self):
+        """Queued interactive requests are granted before earlier background requests."""
+        clock = FakeClock()
+        scheduler = LLMScheduler(requests_per_minute=60, tokens_per_minute=6000, token_estimator=len, clock=clock)
+        scheduler.requests.tokens = 0
+        order = []
+
+        async def request(name, priority):
+            await scheduler.acquire(10, priority)
+            order.append(name)
+
+        tasks = [
+            asyncio.ensure_future(request("background", PRIORITY_BACKGROUND)),
+            asyncio.ensure_future(request("interactive", PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        clock.now = 1
+        scheduler._dispatch()
+        await asyncio.sleep(0)
+        self.assertEqual(order, ["interactive"])
+        clock.now = 2
+        scheduler._dispatch()
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["interactive", "background"])
+
+    async def test_abandoned_waiters_are_skipped(self):
+        """A waiter that timed out does not block the queue or consume capacity."""
+        clock = FakeClock()
+        scheduler = LLMScheduler(requests_per_minute=60, tokens_per_minute=6000, token_estimator=len, clock=clock)
+        scheduler.requests.tokens = 0
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.acquire(10), timeout=0.01)
+        clock.now = 1
+        await asyncio.wait_for(scheduler.acquire(10), timeout=1)
+        self.assertEqual(scheduler.get_stats()['granted'], 1)
+        self.assertEqual(scheduler.get_stats()['queue_length'], 0)
+
+    async def test_cancelled_waiter_releases_its_grant(self):
+        """A waiter cancelled after being granted gives the capacity back to the next request."""
+        scheduler = LLMScheduler(requests_per_minute=60, tokens_per_minute=6000, token_estimator=len)
+        scheduler.requests.tokens = 0
+        first = asyncio.ensure_future(scheduler.acquire(10))
+        await asyncio.sleep(0)
+        scheduler.requests.tokens = 1
+        scheduler._dispatch()  # Grants the first waiter, which has not resumed yet
+        first.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        self.assertGreaterEqual(scheduler.requests.tokens, 1)
+        await asyncio.wait_for(scheduler.acquire(10), timeout=0.1)
+        self.assertEqual(scheduler.get_stats()['released'], 1)
+
+    async def test_close_cancels_timer_and_waiters(self):
+        """Closing stops the refill timer and cancels queued requests."""
+        scheduler = LLMScheduler(requests_per_minute=60, token_estimator=len)
+        scheduler.requests.tokens = 0
+        waiter = asyncio.ensure_future(scheduler.acquire(10))
+        await asyncio.sleep(0)
+        timer = scheduler._timer
+        self.assertIsNotNone(timer)
+        scheduler.close()
+        self.assertTrue(timer.cancelled())
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual(scheduler.get_stats()['queue_length'], 0)
+
+    def test_record_usage(self):
+        """Actual usage replaces the estimate in the token bucket."""
+        clock = FakeClock()
+        scheduler = LLMScheduler(tokens_per_minute=6000, token_estimator=len, clock=clock)
+        scheduler.tokens.consume(100)
+        scheduler.record_usage(100, 400)
+        self.assertEqual(scheduler.tokens.tokens, 5600)
+        scheduler.record_usage(100, None)
+        self.assertEqual(scheduler.tokens.tokens, 5600)
+
+if __name__ == '__main__':
+    unittest.main()
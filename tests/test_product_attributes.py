@@ -0,0 +1,78 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from helpers.product_attributes import AttributeBitmaskIndex, extract_attributes, find_category
+from models.product_filters import ProductFilters
+
+class TestProductAttributes(unittest.TestCase):
+    def setUp(self):
+        """Index a few catalog-like products."""
+        products = {
+            'p1': {'name': '42847 - Blouse - Green', 'price': 2.59, 'total_stock': 6},
+            'p2': {'name': '42884 - Blouse - Black', 'price': 2.2, 'total_stock': 0},
+            'p3': {'name': '44236 - Polo Neck Knitwear - Black', 'price': 3.5, 'total_stock': 4},
+            'p4': {'name': '42859 - Blouse - Light Green', 'price': 2.59, 'total_stock': 4},
+        }
+        self.doc_ids = list(products)
+        self.attributes = {doc_id: extract_attributes(p) for doc_id, p in products.items()}
+        self.index = AttributeBitmaskIndex(self.doc_ids, self.attributes)
+
+    def eligible(self, filters):
+        """Get the ids selected by a filter mask."""
+        mask = self.index.mask(filters)
+        return [doc_id for i, doc_id in enumerate(self.doc_ids) if (mask >> i) & 1]
+
+    def test_extract_attributes(self):
+        """Category and color come from the structured product name."""
+        attrs = self.attributes['p3']
+        self.assertEqual(attrs['category'], 'knitwear')
+        self.assertEqual(attrs['color'], 'black')
+        self.assertEqual(attrs['in_stock'], 1)
+        self.assertEqual(self.attributes['p4']['color'], 'light green')
+        self.assertEqual(self.attributes['p2']['in_stock'], 0)
+
+    def test_ambiguous_garment_words(self):
+        """'Top' is only a category with the word before it, and 'body' is stored as bodysuit."""
+        self.assertEqual(extract_attributes({'name': 'QUS10883 - Long Tank Top - Black'})['category'], 'tank top')
+        self.assertEqual(extract_attributes({'name': 'BSL10049 - Patterned Knitted Top'})['category'], 'knitted top')
+        self.assertEqual(extract_attributes({'name': '20093 - Heght One Body - White'})['category'], 'bodysuit')
+
+    def test_find_category(self):
+        """Queries name a category by the whole word or phrase, not by a shared word."""
+        categories = {'blouse', 'crop', 'tank top', 'bodysuit'}
+        self.assertIsNone(find_category("Show me your top sellers", categories))
+        self.assertIsNone(find_category("What body sizes do you have?", categories))
+        self.assertIsNone(find_category("Is the crop top available?", {'blouse', 'bodysuit'}))
+        self.assertEqual(find_category("black tank tops", categories), 'tank top')
+        self.assertEqual(find_category("Any bodysuits?", categories), 'bodysuit')
+        self.assertEqual(find_category("green blouse", categories), 'blouse')
+
+    def test_no_filters(self):
+        """Empty filters do not restrict the index."""
+        self.assertIsNone(self.index.mask(None))
+        self.assertIsNone(self.index.mask(ProductFilters()))
+
+    def test_combined_filters(self):
+        """Filters intersect across attributes."""
+        self.assertEqual(self.eligible(ProductFilters(color='black')), ['p2', 'p3'])
+        self.assertEqual(self.eligible(ProductFilters(color='black', in_stock=True)), ['p3'])
+        self.assertEqual(self.eligible(ProductFilters(category='blouse', min_price=2.5)), ['p1', 'p4'])
+        self.assertEqual(self.eligible(ProductFilters(max_price=2.59, in_stock=False)), ['p2'])
+        self.assertEqual(self.eligible(ProductFilters(color='red')), [])
+
+    def test_chroma_where(self):
+        """Filters translate to an equivalent ChromaDB where clause."""
+        self.assertEqual(ProductFilters(color='black').to_chroma_where(), {'color': 'black'})
+        self.assertEqual(
+            ProductFilters(category='blouse', max_price=3, in_stock=True).to_chroma_where(),
+            {'$and': [{'category': 'blouse'}, {'price': {'$lte': 3.0}}, {'in_stock': 1}]}
+        )
+        self.assertIsNone(ProductFilters().to_chroma_where())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.product_search_service import ProductSearchService
+from helpers.product_attributes import AttributeBitmaskIndex, extract_attributes
+
+class FakeTextCollection:
+    def __init__(self, ids):
+        self.ids = ids
+        self.queries = []
+
+    def query(self, query_texts, n_results, where=None):
+        self.queries.append(query_texts[0])
+        ids = self.ids[:n_results]
+        return {
+            'ids': [ids],
+            'distances': [[0.3] * len(ids)],
+            'metadatas': [[{'image_path': None}] * len(ids)]
+        }
+
+class TestLexicalShortCircuit(unittest.TestCase):
+    def setUp(self):
+        """Build the in-process indexes over a few catalog-like products, without ChromaDB."""
+        products = [
+            {'product_id': '45398', 'name': '45398 - Oversized Shirt - Blue', 'handle': '45398-oversized-shirt-blue',
+             'product_code': '45398', 'supplier_stock_code': 'SS-7731', 'price': 4.1, 'total_stock': 5},
+            {'product_id': '45401', 'name': '45401 - Linen Shirt - White', 'handle': '45401-linen-shirt-white',
+             'product_code': '45401', 'supplier_stock_code': 'SS-7745', 'price': 3.9, 'total_stock': 0},
+            {'product_id': '45410', 'name': '45410 - Denim Jacket - Blue', 'handle': '45410-denim-jacket-blue',
+             'product_code': '45410', 'supplier_stock_code': 'DJ-1020', 'price': 7.5, 'total_stock': 2},
+        ]
+        self.service = ProductSearchService.__new__(ProductSearchService)
+        self.service.products_by_id = {p['product_id']: p for p in products}
+        self.service.product_attributes = {p['product_id']: extract_attributes(p) for p in products}
+        self.service.identifier_index = self.service._build_identifier_index()
+        self.service.lexical_index = self.service._build_lexical_index()
+        self.service.attribute_index = AttributeBitmaskIndex(self.service.lexical_index.doc_ids, self.service.product_attributes)
+        self.service.text_collection = FakeTextCollection(list(self.service.products_by_id))
+
+    def test_color_and_category_use_vector_search(self):
+        """A single product holding every plain query word is not an exact match."""
+        exact_match, similar_products = self.service.search_products("blue shirt")
+        self.assertIsNone(exact_match)
+        self.assertEqual(self.service.text_collection.queries, ["blue shirt"])
+        self.assertEqual(similar_products[0]['product_id'], '45398')
+
+    def test_identifier_fragment_skips_vector_search(self):
+        """A code fragment naming one product short-circuits with its coverage as similarity."""
+        exact_match, _ = self.service.search_products("7731 shirt")
+        self.assertEqual(exact_match['product_id'], '45398')
+        self.assertEqual(exact_match['search_type'], 'lexical')
+        self.assertEqual(exact_match['similarity'], 1.0)
+        self.assertEqual(self.service.text_collection.queries, [])
+
+    def test_partial_identifier_match_respects_threshold(self):
+        """A lexical hit covering only part of the query stays below the similarity threshold."""
+        exact_match, _ = self.service.search_products("7731 jacket")
+        self.assertIsNone(exact_match)
+        self.assertEqual(self.service.text_collection.queries, ["7731 jacket"])
+
+    def test_availability_does_not_filter(self):
+        """Asking whether a product is available keeps sold-out products in the results."""
+        filters = self.service.parse_filters("Is the white linen shirt available?")
+        self.assertIsNone(filters.in_stock)
+        self.assertEqual((filters.color, filters.category), ('white', 'shirt'))
+
+if __name__ == '__main__':
+    unittest.main()
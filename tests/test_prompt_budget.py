@@ -0,0 +1,97 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from helpers.prompt_budget import PromptBudget, PromptSection, current_call_site, llm_call_site
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+def render_with(template: str):
+    """Render a single message from a template with a placeholder per section."""
+    return lambda texts: [template.format(**texts)]
+
+class TestPromptBudget(unittest.TestCase):
+    def setUp(self):
+        self.budget = PromptBudget({'answer': 20}, token_estimator=count_words)
+
+    def test_prompt_within_limit_is_unchanged(self):
+        """Sections are returned as they are when the prompt fits."""
+        sections = {'query': PromptSection("red dress"), 'history': PromptSection("User: hi", priority=1)}
+        self.assertEqual(self.budget.fit('answer', sections, render_with("You are an assistant.\n{history}\n{query}")),
+                         {'query': "red dress", 'history': "User: hi"})
+        self.assertEqual(self.budget.get_stats(), {})
+
+    def test_lowest_priority_section_is_trimmed_first(self):
+        """History loses its oldest lines before FAQs are touched."""
+        history = "".join(f"User: message number {i}\n" for i in range(5))  # 4 words per line
+        faq = "Q: shipping? A: 3-5 days\n"
+        sections = {
+            'query': PromptSection("do you ship to Germany"),
+            'faq': PromptSection(faq, priority=2, keep="head"),
+            'history': PromptSection(history, priority=1, keep="tail"),
+        }
+        texts = self.budget.fit('answer', sections, render_with("Answer the user.\n{faq}{history}{query}"))
+        self.assertEqual(texts['faq'], faq)
+        self.assertEqual(texts['history'], "User: message number 4\n")
+        self.assertEqual(texts['query'], "do you ship to Germany")
+        self.assertEqual(self.budget.get_stats()['answer']['trimmed_prompts'], 1)
+
+    def test_required_sections_are_never_trimmed(self):
+        """A prompt whose required sections exceed the limit is sent as it is."""
+        query = " ".join(["word"] * 30)
+        texts = self.budget.fit('answer', {'query': PromptSection(query), 'history': PromptSection("User: hi", priority=1)},
+                                render_with("{history}\n{query}"))
+        self.assertEqual(texts, {'query': query, 'history': ""})
+
+    def test_unknown_call_site_is_unbounded(self):
+        """Call sites without a limit are not counted or trimmed."""
+        text = " ".join(["word"] * 100)
+        self.assertEqual(self.budget.fit('other', {'history': PromptSection(text, priority=1)}, render_with("{history}")),
+                         {'history': text})
+
+    def test_higher_priority_section_survives(self):
+        """When only one of two sections can stay, the one with the higher priority is kept."""
+        sections = {
+            'faq': PromptSection("Q: shipping? A: 3-5 business days", priority=2),
+            'products': PromptSection("Floral Midi Dress $12 in stock", priority=1),
+        }
+        texts = self.budget.fit('answer', sections, render_with("{faq}\n{products}\n" + "word " * 10))
+        self.assertEqual(texts, {'faq': sections['faq'].text, 'products': ""})
+
+    def test_formatted_prompt_is_counted(self):
+        """Text substituted outside the sections counts against the limit, placeholders do not."""
+        valid_topics = " ".join(["topic"] * 14)
+
+        def render(texts):
+            return ["Valid topics: {valid_topics}\n{history}".format(valid_topics=valid_topics, **texts), texts['query']]
+
+        sections = {'query': PromptSection("red dress"), 'history': PromptSection("User: hi\nUser: red\n", priority=1, keep="tail")}
+        texts = self.budget.fit('answer', sections, render)
+        self.assertEqual(texts['history'], "User: red\n")
+
+    def test_static_counts_are_memoized(self):
+        """Template token counts are computed once."""
+        calls = []
+        budget = PromptBudget({}, token_estimator=lambda text: calls.append(text) or len(text))
+        for _ in range(3):
+            self.assertEqual(budget.count_static_tokens("template"), 8)
+        self.assertEqual(calls, ["template"])
+
+    def test_usage_is_recorded_per_call_site(self):
+        """Usage is added up under the call site active when the request was made."""
+        with llm_call_site('answer'):
+            self.budget.record_usage(current_call_site(), 100, 20)
+            with llm_call_site(None):
+                self.budget.record_usage(current_call_site(), 50, 10)
+        self.budget.record_usage(current_call_site(), 5, None)
+        stats = self.budget.get_stats()
+        self.assertEqual(stats['answer'], {'calls': 2, 'prompt_tokens': 150, 'completion_tokens': 30, 'trimmed_prompts': 0})
+        self.assertEqual(stats['other']['prompt_tokens'], 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import tempfile
+import shutil
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from helpers.response_cache import ResponseCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        """Create a temporary directory for the SQLite backend."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = str(Path(self.tmp_dir) / "responses.sqlite")
+        self.clock = FakeClock()
+        self.request = {
+            'model': 'gpt-4.1-mini',
+            'temperature': 0.7,
+            'messages': [{'role': 'system', 'content': 'Classify'}, {'role': 'user', 'content': 'Query: hi'}]
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_key_covers_whole_request(self):
+        """Keys ignore dict ordering but change with any parameter."""
+        reordered = dict(reversed(list(self.request.items())))
+        self.assertEqual(ResponseCache.make_key(self.request), ResponseCache.make_key(reordered))
+        self.assertNotEqual(ResponseCache.make_key(self.request), ResponseCache.make_key({**self.request, 'temperature': 0.1}))
+
+    def test_persistent_backend(self):
+        """Responses survive a new cache instance and expire after the TTL."""
+        key = ResponseCache.make_key(self.request)
+        ResponseCache(db_path=self.db_path, ttl_seconds=60, clock=self.clock).put(key, 'no')
+
+        cache = ResponseCache(db_path=self.db_path, ttl_seconds=60, clock=self.clock)
+        self.assertEqual(cache.get(key), 'no')
+        self.assertEqual(cache.get(key), 'no')
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['persistent_hits'], stats['misses']), (1, 1, 0))
+
+        self.clock.now += 61
+        self.assertIsNone(ResponseCache(db_path=self.db_path, ttl_seconds=60, clock=self.clock).get(key))
+
+    def test_memory_only(self):
+        """Without a database the cache is a bounded LRU."""
+        cache = ResponseCache(maxsize=1, clock=self.clock)
+        cache.put('a', 'yes')
+        cache.put('b', 'no')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 'no')
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
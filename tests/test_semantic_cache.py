@@ -0,0 +1,63 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from helpers.semantic_cache import SemanticCache, normalize_query
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class TestSemanticCache(unittest.TestCase):
+    def setUp(self):
+        """Create a small cache driven by a fake clock."""
+        self.clock = FakeClock()
+        self.cache = SemanticCache(maxsize=2, ttl_seconds=60, similarity_threshold=0.9, clock=self.clock)
+
+    def test_normalized_exact_hit(self):
+        """Case, whitespace and punctuation differences share one entry."""
+        self.assertEqual(normalize_query("  How do I RETURN an item?? "), "how do i return an item")
+        self.cache.put("How do I return an item?", ['faq'], scope=('Europe', 3))
+        self.assertEqual(self.cache.get("how do i  return an item", scope=('Europe', 3)), ['faq'])
+        self.assertIsNone(self.cache.get("how do i return an item", scope=('Turkey', 3)))
+
+    def test_semantic_hit(self):
+        """A close embedding in the same scope reuses the cached result."""
+        self.cache.put("shipping cost", ['shipping'], scope='Europe', embedding=[1.0, 0.0])
+        self.assertIsNone(self.cache.get("how much is delivery", scope='Europe'))
+        self.assertEqual(self.cache.get_similar([0.99, 0.1], scope='Europe'), ['shipping'])
+        self.assertIsNone(self.cache.get_similar([0.99, 0.1], scope='Turkey'))
+        self.assertIsNone(self.cache.get_similar([0.0, 1.0], scope='Europe'))
+        stats = self.cache.stats()
+        self.assertEqual(stats['semantic_hits'], 1)
+        self.assertEqual(stats['misses'], 0)
+        self.assertEqual(stats['hit_rate'], 1.0)
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted when full."""
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.cache.get("a")
+        self.cache.put("c", 3)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_ttl_expiry(self):
+        """Entries expire after their time to live, in both tiers."""
+        self.cache.put("a", 1, embedding=[1.0, 0.0])
+        self.clock.now = 61
+        self.assertIsNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get_similar([1.0, 0.0]))
+        self.assertEqual(self.cache.stats()['expirations'], 1)
+        self.assertEqual(len(self.cache), 0)
+
+if __name__ == '__main__':
+    unittest.main()
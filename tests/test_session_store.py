@@ -0,0 +1,189 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.message_service import SessionMessageBuffer
+from services.session_store import InMemorySessionStore, SQLiteSessionStore
+
+class SessionStoreTests:
+    """Behavior every session store must provide."""
+
+    def create_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.create_store()
+        self.store.create_session("s1", "Europe")
+
+    def test_messages_get_sequential_ids(self):
+        """Messages are numbered per session and can be read from a cursor."""
+        self.assertEqual(self.store.append_message("s1", {'role': 'user', 'content': 'hi'})['id'], 0)
+        self.assertEqual(self.store.append_message("s1", {'role': 'assistant', 'content': 'hello'})['id'], 1)
+        self.assertEqual([m['content'] for m in self.store.get_messages("s1", since=1)], ['hello'])
+        self.store.create_session("s1", "Turkey")  # Existing sessions are kept
+        self.assertEqual(self.store.get_session("s1")['region'], "Europe")
+        self.assertIsNone(self.store.get_session("unknown"))
+
+    def test_claim_waits_for_due_time(self):
+        """The buffer is claimed once, only after its latest due time."""
+        self.store.buffer_message("s1", "first", due_at=10)
+        self.store.buffer_message("s1", "second", due_at=20, audio_data="audio")
+        self.assertIsNone(self.store.claim_buffer("s1", now=15, lease_seconds=60))
+        self.assertEqual(self.store.seconds_until_claimable("s1", now=15), 5)
+        self.assertTrue(self.store.is_pending("s1", now=15))
+
+        batch = self.store.claim_buffer("s1", now=20, lease_seconds=60)
+        self.assertEqual(batch, {'texts': ["first", "second"], 'audio_data': "audio"})
+        self.assertIsNone(self.store.claim_buffer("s1", now=20, lease_seconds=60))
+        self.assertIsNone(self.store.seconds_until_claimable("s1", now=20))
+
+    def test_turn_lease_serializes_turns(self):
+        """A new batch is not claimed while the previous turn holds the lease."""
+        self.store.buffer_message("s1", "first", due_at=0)
+        self.store.claim_buffer("s1", now=0, lease_seconds=60)
+        self.store.buffer_message("s1", "second", due_at=1)
+        self.assertTrue(self.store.is_pending("s1", now=5))
+        self.assertIsNone(self.store.claim_buffer("s1", now=5, lease_seconds=60))
+        self.store.finish_turn("s1")
+        self.assertEqual(self.store.claim_buffer("s1", now=5, lease_seconds=60)['texts'], ["second"])
+
+    def test_context_round_trip(self):
+        """The conversation context survives being saved and loaded."""
+        context = self.store.load_context("s1")
+        context.add_message('user', 'red dress', search_results={'exact_match': None, 'similar_products': []})
+        self.store.save_context("s1", context)
+        loaded = self.store.load_context("s1")
+        self.assertEqual(loaded.messages[0].content, 'red dress')
+        self.assertEqual(loaded.messages[0].timestamp, context.messages[0].timestamp)
+
+class TestInMemorySessionStore(SessionStoreTests, unittest.TestCase):
+    def create_store(self):
+        return InMemorySessionStore()
+
+class TestSQLiteSessionStore(SessionStoreTests, unittest.TestCase):
+    def create_store(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = os.path.join(self.tmp_dir.name, "sessions.db")
+        return SQLiteSessionStore(self.db_path)
+
+    def test_state_is_shared_between_connections(self):
+        """A second connection, e.g. another worker, sees the same sessions."""
+        self.store.append_message("s1", {'role': 'user', 'content': 'hi'})
+        other = SQLiteSessionStore(self.db_path)
+        self.assertEqual(other.get_messages("s1")[0]['content'], 'hi')
+
+class TestSessionMessageBuffer(unittest.IsolatedAsyncioTestCase):
+    async def test_one_worker_processes_each_batch(self):
+        """Messages of one session sent to two workers are answered once, together."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        db_path = os.path.join(tmp_dir.name, "sessions.db")
+        processed = []
+
+        async def process(combined_message, batch):
+            processed.append(combined_message)
+
+        workers = []
+        for _ in range(2):
+            store = SQLiteSessionStore(db_path)
+            store.create_session("s1", "Europe")
+            workers.append(SessionMessageBuffer(store, "s1", process, debounce_seconds=0.1))
+
+        await workers[0].add_message("hello")
+        await asyncio.sleep(0.05)
+        await workers[1].add_message("red dress")
+        await asyncio.sleep(0.4)
+        self.assertEqual(processed, ["hello\nred dress"])
+
+    async def test_new_message_cancels_running_turn(self):
+        """A message sent during a turn cancels it and is answered together with the cancelled messages."""
+        store = InMemorySessionStore()
+        store.create_session("s1", "Europe")
+        started, answered, cancelled = [], [], []
+
+        async def process(combined_message, batch):
+            started.append(combined_message)
+            try:
+                await asyncio.sleep(0.2)
+            except asyncio.CancelledError:
+                cancelled.append(combined_message)
+                raise
+            answered.append(combined_message)
+
+        buffer = SessionMessageBuffer(store, "s1", process, debounce_seconds=0.05)
+        await buffer.add_message("red dress")
+        await asyncio.sleep(0.1)
+        await buffer.add_message("in size M")
+        await asyncio.sleep(0.4)
+        self.assertEqual(started, ["red dress", "red dress\nin size M"])
+        self.assertEqual(cancelled, ["red dress"])
+        self.assertEqual(answered, ["red dress\nin size M"])
+        self.assertFalse(store.is_pending("s1", now=0))
+
+    def create_debounced_buffer(self, processed):
+        """Buffer with a long debounce and a short one after messages that look finished."""
+        store = InMemorySessionStore()
+        store.create_session("s1", "Europe")
+
+        async def process(combined_message, batch):
+            processed.append(combined_message)
+
+        return SessionMessageBuffer(store, "s1", process, debounce_seconds=0.3, complete_debounce_seconds=0.05)
+
+    async def test_finished_message_uses_short_delay(self):
+        """A message that looks finished is answered after the short delay."""
+        processed = []
+        buffer = self.create_debounced_buffer(processed)
+        await buffer.add_message("Do you have this in red?")
+        await asyncio.sleep(0.15)
+        self.assertEqual(processed, ["Do you have this in red?"])
+
+    async def test_unfinished_message_uses_full_delay(self):
+        """A message that does not look finished waits for the full debounce time."""
+        processed = []
+        buffer = self.create_debounced_buffer(processed)
+        await buffer.add_message("do you have this in")
+        await asyncio.sleep(0.15)
+        self.assertEqual(processed, [])
+        await asyncio.sleep(0.3)
+        self.assertEqual(processed, ["do you have this in"])
+
+    async def test_new_message_resets_timer(self):
+        """Each message restarts the wait, so messages typed in a row are answered together."""
+        processed = []
+        buffer = self.create_debounced_buffer(processed)
+        await buffer.add_message("red dress")
+        await asyncio.sleep(0.2)
+        await buffer.add_message("in size M")
+        await asyncio.sleep(0.2)
+        self.assertEqual(processed, [])
+        await asyncio.sleep(0.25)
+        self.assertEqual(processed, ["red dress\nin size M"])
+
+    async def test_idle_after_batch_is_answered(self):
+        """The owner is told once the buffer has answered its batch and has nothing left to wait for."""
+        store = InMemorySessionStore()
+        store.create_session("s1", "Europe")
+        processed, idle = [], []
+
+        async def process(combined_message, batch):
+            processed.append(combined_message)
+
+        buffer = SessionMessageBuffer(store, "s1", process, debounce_seconds=0.05, on_idle=lambda: idle.append(True))
+        await buffer.add_message("red dress")
+        await asyncio.sleep(0.02)
+        self.assertEqual(idle, [])
+        await asyncio.sleep(0.1)
+        self.assertEqual(processed, ["red dress"])
+        self.assertEqual(idle, [True])
+
+if __name__ == '__main__':
+    unittest.main()
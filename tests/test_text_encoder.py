@@ -0,0 +1,80 @@
+import unittest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+import torch
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from services.text_encoder import TextEncoder
+from helpers.lru_cache import LRUCache
+
+class StubTokenizer:
+    """Tokenizes words to their lengths and pads batches to the longest text with id 0."""
+
+    def __call__(self, texts, return_tensors, padding, truncation, max_length):
+        ids = [[len(word) for word in text.split()][:max_length] for text in texts]
+        width = max(len(row) for row in ids)
+        return {
+            'input_ids': torch.tensor([row + [0] * (width - len(row)) for row in ids]),
+            'attention_mask': torch.tensor([[1] * len(row) + [0] * (width - len(row)) for row in ids])
+        }
+
+class StubModel:
+    """Embeds token id i as (i, 1, 0) and padding as a large vector that would skew an unmasked mean."""
+    config = SimpleNamespace(hidden_size=3)
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, input_ids, attention_mask):
+        self.batch_sizes.append(len(input_ids))
+        ids = input_ids.float()
+        padding = (input_ids == 0).float() * 100
+        return SimpleNamespace(last_hidden_state=torch.stack([ids, torch.ones_like(ids), padding], dim=-1))
+
+class TestTextEncoder(unittest.TestCase):
+    def setUp(self):
+        """Create an encoder around the stub tokenizer and model, without loading weights."""
+        self.encoder = TextEncoder.__new__(TextEncoder)
+        self.encoder.model_name = "stub"
+        self.encoder.batch_size = 2
+        self.encoder.max_length = 16
+        self.encoder.tokenizer = StubTokenizer()
+        self.encoder.model = StubModel()
+        self.encoder.query_cache = LRUCache(maxsize=8)
+
+    def test_mean_pooling_ignores_padding(self):
+        """A text embeds the same alone and padded inside a batch with a longer text."""
+        alone = self.encoder.encode(["ab cde"])[0]
+        batched = self.encoder.encode(["ab cde", "a bb ccc dddd eeeee"])[0]
+        np.testing.assert_allclose(alone, batched, rtol=1e-6)
+        expected = np.array([2.5, 1.0, 0.0]) / np.linalg.norm([2.5, 1.0, 0.0])
+        np.testing.assert_allclose(alone, expected, rtol=1e-6)
+
+    def test_embeddings_are_normalized(self):
+        """Every embedding has unit L2 norm."""
+        embeddings = self.encoder.encode(["a", "bb ccc", "dddd eeeee ffffff"])
+        np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), np.ones(3), rtol=1e-6)
+
+    def test_order_survives_length_sort(self):
+        """Rows follow the input order even though batches are built from length-sorted texts."""
+        texts = ["aaaa bbbbbbb cc dddddd", "a", "bbb cc", "eeeeeeeee"]
+        embeddings = self.encoder.encode(texts)
+        self.assertEqual(self.encoder.model.batch_sizes, [2, 2])
+        for i, text in enumerate(texts):
+            np.testing.assert_allclose(embeddings[i], self.encoder.encode([text])[0], rtol=1e-6)
+
+    def test_encode_query_uses_cache(self):
+        """A repeated query is answered from the cache without another forward pass."""
+        first = self.encoder.encode_query("green blouse")
+        second = self.encoder.encode_query("green blouse")
+        self.assertIs(first, second)
+        self.assertEqual(self.encoder.model.batch_sizes, [1])
+        self.assertEqual(self.encoder(["green blouse"]), [first])
+
+if __name__ == '__main__':
+    unittest.main()